@@ -0,0 +1,115 @@
+"""AWB lookup: old 12+4 pattern cascade vs the single-pass scanner.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_awb --blocks 10000
+
+Blocks without any AWB are the slowest case for the cascade (every pattern
+runs to the end of the block), so they are timed separately.
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import time
+
+from benchmarks.bench_patterns import make_meesho_block
+from home import meesho
+
+
+LEGACY_PATTERNS = [
+    r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*([A-Z]{2}\d{10,15})",
+    r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*([A-Z]{2}\d{10,13}[A-Z]{2,3})",
+    r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*([A-Z]\d{10,15})",
+    r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*(\d{13,16})",
+    r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,15})",
+    r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,13}[A-Z]{2,3})",
+    r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*([A-Z]\d{10,15})",
+    r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*(\d{13,16})",
+    r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,15})",
+    r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,13}[A-Z]{2,3})",
+    r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*([A-Z]\d{10,15})",
+    r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*(\d{13,16})",
+]
+LEGACY_STANDALONE = [
+    r"\b([A-Z]{2}\d{10,15})\b",
+    r"\b([A-Z]{2}\d{10,13}[A-Z]{2,3})\b",
+    r"\b([A-Z]\d{10,15})\b",
+    r"\b(\d{13,16})\b",
+]
+LEGACY_VALID = [
+    r"^[A-Z]{2}\d{10,15}$",
+    r"^[A-Z]{2}\d{10,13}[A-Z]{2,3}$",
+    r"^[A-Z]\d{10,15}$",
+    r"^\d{13,16}$",
+]
+
+
+def legacy_is_valid_awb(awb_code):
+    if not awb_code:
+        return False
+    awb_code = awb_code.replace(" ", "").upper()
+    if len(awb_code) < 10 or len(awb_code) > 16:
+        return False
+    return any(re.match(pattern, awb_code) for pattern in LEGACY_VALID)
+
+
+def legacy_extract_awb_number(block_text):
+    """The cascade ``extract_awb_number`` used before the scanner (minus prints)."""
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, block_text, re.IGNORECASE)
+        if match and legacy_is_valid_awb(match.group(1)):
+            return match.group(1)
+    for pattern in LEGACY_STANDALONE:
+        for match in re.findall(pattern, block_text, re.IGNORECASE):
+            if legacy_is_valid_awb(match):
+                return match
+    return ""
+
+
+def scanner_extract_awb_number(block_text):
+    """``extract_awb_number`` without its debug prints, for a fair timing."""
+    for _, code, _ in meesho.scan_awb_candidates(block_text):
+        if meesho.is_valid_awb(code):
+            return code
+    return ""
+
+
+def timed(func, blocks):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for block in blocks:
+            func(block)
+            sink.seek(0)
+            sink.truncate()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpora = {
+        "no AWB": [make_meesho_block(rng, with_awb=False) for _ in range(args.blocks)],
+        "with AWB": [make_meesho_block(rng, with_awb=True) for _ in range(args.blocks)],
+    }
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, blocks in corpora.items():
+            for block in blocks:
+                if meesho.extract_awb_number(block) != legacy_extract_awb_number(block):
+                    raise SystemExit(f"mismatch on {name} block:\n{block}")
+
+    for name, blocks in corpora.items():
+        before = timed(legacy_extract_awb_number, blocks)
+        after = timed(scanner_extract_awb_number, blocks)
+        print(f"{name}: cascade {before / len(blocks) * 1e6:.1f} us/block, "
+              f"scanner {after / len(blocks) * 1e6:.1f} us/block ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Amazon rows to a table: list of dicts + pd.DataFrame vs. ColumnarBatch.
+
+Builds a synthetic Amazon invoice set (several product rows per invoice
+page, so the page-level fields repeat), parses it with extract_amazon_page
+and times turning the rows into a DataFrame / Arrow table.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_columnar --rows 50000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.bench_patterns import make_meesho_block  # noqa: F401  (sets up Django)
+from home.amazon import AMAZON_COLUMNS, extract_amazon_page
+from home.columnar import ColumnarBatch
+
+
+def make_amazon_page(rng, product_rows):
+    order = f"{rng.randint(100, 999)}-{rng.randint(10**6, 10**7 - 1)}-{rng.randint(10**6, 10**7 - 1)}"
+    lines = [
+        f"Order Number: {order}",
+        f"Invoice Number : IN-{rng.randint(1000, 99999)}",
+        f"Order Date: {rng.randint(10, 28)}.07.2025",
+        f"Invoice Date : {rng.randint(10, 28)}.07.2025",
+        "Shipping Address :",
+        f"Customer {rng.randint(1, 50000)}",
+        f"{rng.randint(1, 300)} Main Road, Sector {rng.randint(1, 99)}",
+        f"Surat, GUJARAT, {rng.randint(100000, 999999)}",
+        "IN",
+        f"AWB {rng.randint(10**11, 10**12 - 1)}AB",
+        f"Weight {rng.randint(1, 9)}.{rng.randint(0, 9)} kg",
+        f"GST Registration No: 24ABCDE{rng.randint(1000, 9999)}F1Z5",
+    ]
+    for number in range(1, product_rows + 1):
+        price = rng.randint(100, 2000)
+        qty = rng.randint(1, 3)
+        net = price * qty
+        tax = round(net * 0.05, 2)
+        lines.append(
+            f"{number} Cotton Kurti {rng.choice(['Blue', 'Red', 'Green'])} | B0ABC{rng.randint(10000, 99999)} "
+            f"( KURTI-{rng.randint(1, 500)} ) HSN:6204 ₹{price:,}.00 {qty} ₹{net:,}.00 5% IGST ₹{tax:,.2f} ₹{net + tax:,.2f}"
+        )
+    return "\n".join(lines)
+
+
+def timed(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--rows-per-page", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    pages = [make_amazon_page(rng, args.rows_per_page) for _ in range(args.rows // args.rows_per_page)]
+    records = [record for page in pages for record in extract_amazon_page(page)]
+    print(f"rows: {len(records)} from {len(pages)} invoice pages")
+
+    legacy, legacy_time, legacy_peak = timed(lambda: pd.DataFrame([r.to_dict(AMAZON_COLUMNS) for r in records]))
+    frame, frame_time, frame_peak = timed(lambda: ColumnarBatch(AMAZON_COLUMNS).extend(records).to_pandas())
+    table, table_time, table_peak = timed(lambda: ColumnarBatch(AMAZON_COLUMNS).extend(records).to_arrow())
+    assert len(legacy) == len(frame) == table.num_rows == len(records)
+
+    mib = 2 ** 20
+    print(f"dicts -> pd.DataFrame:     {legacy_time:.2f}s, peak {legacy_peak / mib:.0f} MiB, "
+          f"frame {legacy.memory_usage(deep=True).sum() / mib:.1f} MiB (all text, untyped)")
+    print(f"ColumnarBatch -> pandas:   {frame_time:.2f}s, peak {frame_peak / mib:.0f} MiB, "
+          f"frame {frame.memory_usage(deep=True).sum() / mib:.1f} MiB (typed, categoricals)")
+    print(f"ColumnarBatch -> Arrow:    {table_time:.2f}s, peak {table_peak / mib:.0f} MiB, "
+          f"table {table.nbytes / mib:.1f} MiB (typed, dictionary encoded)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Pickup courier detection: one regex per courier vs the trie matcher.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_couriers --blocks 10000
+"""
+import argparse
+import random
+import re
+import time
+
+from benchmarks.bench_patterns import make_meesho_block
+from home.couriers import DEFAULT_COURIERS, get_courier_matcher
+
+
+def legacy_extract_pickup_partner(block_text, couriers=DEFAULT_COURIERS["meesho"]):
+    for courier in couriers:
+        if re.search(rf"\b{re.escape(courier)}\b", block_text, re.IGNORECASE):
+            return courier
+    return ""
+
+
+def timed(func, blocks):
+    start = time.perf_counter()
+    for block in blocks:
+        func(block)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with_courier = [make_meesho_block(rng) for _ in range(args.blocks)]
+    without_courier = [re.sub(r"^(Delhivery|Xpress Bees|Shadowfax|Valmo|Ecom Express)$", "", block, flags=re.M)
+                       for block in with_courier]
+    matcher = get_courier_matcher("meesho")
+
+    for name, blocks in [("courier named", with_courier), ("no courier", without_courier)]:
+        for block in blocks:
+            if legacy_extract_pickup_partner(block) != matcher.find(block):
+                raise SystemExit(f"mismatch on {name} block:\n{block}")
+        before = timed(legacy_extract_pickup_partner, blocks)
+        after = timed(matcher.find, blocks)
+        print(f"{name}: per-courier regexes {before / len(blocks) * 1e6:.1f} us/block, "
+              f"trie {after / len(blocks) * 1e6:.1f} us/block ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Cost of marketplace detection vs. a full parse with the wrong parser.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_detect --pages 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_pdftext import make_pdf  # also sets up Django
+from home.detect import detect_pdf_marketplace
+from home.flipkart import iter_flipkart_labels
+from home.pdftext import extract_page_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.pdf")
+        make_pdf(path, args.pages)
+        with open(path, "rb") as f:
+            data = f.read()
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            doc = fitz.open(stream=data, filetype="pdf")
+            marketplace = detect_pdf_marketplace(doc)
+            doc.close()
+        detect_time = (time.perf_counter() - start) / args.repeat
+
+        # What a wrong pick used to cost: the whole document, for no rows
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = list(iter_flipkart_labels(extract_page_texts(path)))
+        wrong_time = time.perf_counter() - start
+
+    print(f"pages: {args.pages}, detected: {marketplace}")
+    print(f"detection: {detect_time * 1000:.2f}ms per upload")
+    print(f"wrong parser (flipkart): {wrong_time:.2f}s for {len(rows)} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Excel export: list of dicts -> DataFrame.to_excel vs the streaming writer.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_export --rows 1000 10000 100000
+
+Every case runs in a fresh interpreter so peak RSS is measured per case.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+COLUMNS = [
+    "SKU", "Size", "Qty", "Color", "Order No.", "Order Date", "Invoice Date",
+    "GSTIN", "AWB Number", "Pickup", "Customer Address"
+]
+
+
+def iter_rows(count):
+    for number in range(count):
+        yield {
+            "SKU": f"KURTI-{number % 500}",
+            "Size": "Free Size",
+            "Qty": "1",
+            "Color": "Blue",
+            "Order No.": f"{120000000000000 + number}_1",
+            "Order Date": "11.07.2025",
+            "Invoice Date": "12.07.2025",
+            "GSTIN": "24ABCDE1234F1Z5",
+            "AWB Number": f"VL{81530070753 + number:013d}",
+            "Pickup": "Valmo",
+            "Customer Address": f"Customer {number}, {number % 999} Main Road, Surat, Gujarat, 395002",
+        }
+
+
+def run_case(mode, rows, path):
+    start = time.perf_counter()
+    if mode == "pandas":
+        import pandas as pd
+
+        extracted = list(iter_rows(rows))
+        pd.DataFrame(extracted)[COLUMNS].to_excel(path, index=False)
+    else:
+        from home.export import write_xlsx
+
+        write_xlsx(iter_rows(rows), COLUMNS, path)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux
+    peak_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"mode": mode, "rows": rows, "seconds": elapsed, "peak_rss_mib": peak_mib}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--case", choices=["pandas", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = run_case(args.case, args.rows[0], os.path.join(tmp_dir, "out.xlsx"))
+        print(json.dumps(result))
+        return
+
+    print(f"{'rows':>8} {'mode':>7} {'seconds':>8} {'peak RSS MiB':>13}")
+    for rows in args.rows:
+        for mode in ("pandas", "stream"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_export", "--case", mode, "--rows", str(rows)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{rows:>8} {mode:>7} {result['seconds']:>8.2f} {result['peak_rss_mib']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
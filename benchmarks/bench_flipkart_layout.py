@@ -0,0 +1,103 @@
+"""Flipkart labels: page text + regexes vs. word positions (layout parser).
+
+Generates a PDF of Flipkart style labels laid out like the real ones
+(address box on the left, AWB on the right, SKU table under them, print
+stamp at the bottom), reads it both ways and checks both give the same rows.
+A second run uses labels without the HBD / Sold By / GSTIN lines that end
+the address, where FLIPKART_ADDRESS_BLOCK backtracks over the whole block
+(and finds nothing).
+
+Run from the repo root:
+
+    python -m benchmarks.bench_flipkart_layout --pages 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_patterns import make_meesho_block  # noqa: F401  (sets up Django)
+from home.flipkart import iter_flipkart_labels, iter_flipkart_labels_layout
+from home.pdftext import extract_page_texts, iter_page_words
+
+
+NAMES = ["Asha Patel", "Ravi Kumar", "Meena Shah", "Imran Khan", "Priya Nair"]
+STREETS = ["12 Ring Road", "Flat 4B, Shanti Apts", "Near Bus Stand", "Sector 21, Plot 9"]
+CITIES = [("Surat", "Gujarat"), ("Pune", "Maharashtra"), ("Jaipur", "Rajasthan"), ("Indore", "Madhya Pradesh")]
+PRODUCTS = ["Blue cotton kurti", "Printed rayon kurta set", "Silk saree with blouse", "Kids denim jacket"]
+
+
+def flipkart_label_lines(rng, stops=True, filler=0):
+    """``(x, y, text)`` lines of one label, in the order a label PDF draws them."""
+    order_id = "OD" + "".join(rng.choice("0123456789") for _ in range(18))
+    city, state = rng.choice(CITIES)
+    address = [rng.choice(STREETS), f"{city} - {rng.randint(100000, 999999)}, {state}"]
+    left = [f"Name: {rng.choice(NAMES)},"] + address + [f"Landmark line {n}" for n in range(filler)]
+    lines = [(36, 40, order_id), (36, 60, "Shipping/Customer address:")]
+    lines += [(36, 72 + 12 * n, text) for n, text in enumerate(left)]
+    y = 72 + 12 * len(left) + 12
+    if stops:
+        lines += [
+            (36, y, f"HBD: {rng.randint(10, 28)} - {rng.randint(1, 12):02d} CPD: {rng.randint(10, 28)} - {rng.randint(1, 12):02d}"),
+            (36, y + 12, f"Sold By: Seller {rng.randint(1, 99)} Pvt Ltd, GSTIN: 24ABCDE{rng.randint(1000, 9999)}F1Z5"),
+        ]
+    lines += [
+        (330, 60, rng.choice(["PREPAID", "COD"])),
+        (330, 72, f"AWB No. FMPC{rng.randint(10**9, 10**10 - 1)}"),
+        (36, y + 40, "SKU ID | Description"),
+        (520, y + 40, "QTY"),
+        (524, y + 52, str(rng.randint(1, 3))),
+        (36, y + 52, f"KURTI-{rng.randint(1, 500)} | {rng.choice(PRODUCTS)}"),
+        (36, y + 80, f"Printed at {rng.randint(1000, 2359)} hrs, {rng.randint(10, 28)}/07/25"),
+    ]
+    return lines
+
+
+def make_flipkart_pdf(path, pages, seed=5, **label_options):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        for x, y, text in flipkart_label_lines(rng, **label_options):
+            page.insert_text((x, y), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def timed(read):
+    start = time.perf_counter()
+    rows = list(read())
+    return rows, time.perf_counter() - start
+
+
+def compare(path, pages, title, same_rows=True):
+    regex_rows, regex_time = timed(lambda: iter_flipkart_labels(extract_page_texts(path, parallel=False)))
+    layout_rows, layout_time = timed(lambda: iter_flipkart_labels_layout(iter_page_words(path, parallel=False)))
+    print(f"{title}: {pages} pages, {len(layout_rows)} labels")
+    if same_rows:
+        assert regex_rows == layout_rows, "the parsers disagree"
+    else:
+        found = [sum(bool(row.customer_address) for row in rows) for rows in (regex_rows, layout_rows)]
+        print(f"  addresses found: {found[0]} by the regexes, {found[1]} by the layout parser")
+    print(f"  page text + regexes: {regex_time:.2f}s ({pages / regex_time:.0f} pages/s)")
+    print(f"  words + layout:      {layout_time:.2f}s ({pages / layout_time:.0f} pages/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "labels.pdf")
+        make_flipkart_pdf(path, args.pages)
+        compare(path, args.pages, "regular labels")
+        make_flipkart_pdf(path, args.pages // 10, stops=False, filler=40)
+        compare(path, args.pages // 10, "labels without HBD / Sold By / GSTIN, long address", same_rows=False)
+
+
+if __name__ == "__main__":
+    main()
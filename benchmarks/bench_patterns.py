@@ -0,0 +1,138 @@
+"""Per-label extraction time with and without the compiled pattern registry.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_patterns --blocks 10000
+
+The "before" run swaps every entry of ``home.patterns`` for a shim that goes
+through ``re.search(pattern_string, ...)`` on each call, which is exactly what
+the extractors did before the registry existed.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "label.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from home import amazon, flipkart, meesho, myntra, patterns  # noqa: E402,F401
+
+
+COURIERS = ["Delhivery", "Xpress Bees", "Shadowfax", "Valmo", "Ecom Express"]
+
+
+def make_meesho_block(rng, with_awb=True):
+    """Build one synthetic Meesho label block."""
+    awb = ""
+    if with_awb:
+        awb = rng.choice([
+            f"VL{rng.randrange(10**12, 10**13)}",
+            f"SF{rng.randrange(10**9, 10**10)}FPL",
+            f"{rng.randrange(10**15, 10**16)}",
+        ])
+    return (
+        "Customer Address\n"
+        f"Customer {rng.randrange(10**4)}\n"
+        f"{rng.randrange(1, 999)} Main Road, Sector {rng.randrange(1, 99)}\n"
+        f"Surat, Gujarat, {rng.randrange(100000, 999999)}\n"
+        "If undelivered, return to:\n"
+        "Seller Pvt Ltd, Ring Road, Surat\n"
+        f"{rng.choice(COURIERS)}\n"
+        "Prepaid: Do not collect cash\n"
+        + (f"AWB No: {awb}\n" if awb else "")
+        + "Product Details\n"
+        "SKU\nSize\nQty\nColor\nOrder No.\n"
+        f"KURTI-{rng.randrange(1000)} Free Size 1 Blue {rng.randrange(10**14, 10**15)}_1\n"
+        "\n"
+        "TAX INVOICE\n"
+        f"GSTIN: 24ABCDE{rng.randrange(1000, 9999)}F1Z5\n"
+        f"Order Date: {rng.randrange(1, 28):02d}.07.2025\n"
+        f"Invoice Date: {rng.randrange(1, 28):02d}.07.2025\n"
+    )
+
+
+class _UncompiledPattern:
+    """Stand-in for a compiled pattern that re-resolves it on every call.
+
+    ``re.compile`` goes through the same internal cache lookup that
+    ``re.search(pattern_string, ...)`` does.
+    """
+
+    def __init__(self, compiled):
+        self.pattern = compiled.pattern
+        self.flags = compiled.flags
+
+    def __getattr__(self, name):
+        return getattr(re.compile(self.pattern, self.flags), name)
+
+
+def _uncompile(value):
+    if isinstance(value, re.Pattern):
+        return _UncompiledPattern(value)
+    if isinstance(value, list):
+        return [_uncompile(item) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_uncompile(item) for item in value)
+    return value
+
+
+@contextlib.contextmanager
+def uncompiled_registry():
+    saved = {name: value for name, value in vars(patterns).items() if name.isupper()}
+    try:
+        for name, value in saved.items():
+            setattr(patterns, name, _uncompile(value))
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(patterns, name, value)
+
+
+def parse_block(block_text):
+    meesho.extract_customer_address(block_text)
+    meesho.extract_order_date(block_text)
+    meesho.extract_invoice_date(block_text)
+    meesho.extract_gstin(block_text)
+    meesho.extract_awb_number(block_text)
+    meesho.extract_pickup_partner(block_text)
+    meesho.extract_product_info(block_text)
+
+
+def run(blocks):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()) as sink:
+        for block in blocks:
+            parse_block(block)
+            sink.seek(0)
+            sink.truncate()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    blocks = [make_meesho_block(rng, with_awb=rng.random() > 0.2) for _ in range(args.blocks)]
+
+    with uncompiled_registry():
+        before = run(blocks)
+    after = run(blocks)
+
+    print(f"blocks: {len(blocks)}")
+    print(f"before (pattern strings): {before:.3f}s  {before / len(blocks) * 1e6:.1f} us/label")
+    print(f"after  (compiled registry): {after:.3f}s  {after / len(blocks) * 1e6:.1f} us/label")
+    print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
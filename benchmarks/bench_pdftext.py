@@ -0,0 +1,58 @@
+"""Serial vs process-pool page text extraction on a generated PDF.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_pdftext --pages 2000 --workers 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+from django.test.utils import override_settings
+
+from benchmarks.bench_patterns import make_meesho_block  # also sets up Django
+from home.pdftext import extract_page_texts
+
+
+def make_pdf(path, pages, seed=7):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_text((36, 48), make_meesho_block(rng) * 2, fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "bench.pdf")
+        make_pdf(path, args.pages)
+
+        with override_settings(PDF_TEXT_WORKERS=1):
+            start = time.perf_counter()
+            serial = extract_page_texts(path)
+            serial_time = time.perf_counter() - start
+
+        with override_settings(PDF_TEXT_WORKERS=args.workers, PDF_TEXT_PARALLEL_MIN_PAGES=0):
+            extract_page_texts(path)  # start the pool outside the timing
+            start = time.perf_counter()
+            parallel = extract_page_texts(path)
+            parallel_time = time.perf_counter() - start
+
+    assert serial == parallel
+    print(f"pages: {args.pages}")
+    print(f"serial: {serial_time:.2f}s ({args.pages / serial_time:.0f} pages/s)")
+    print(f"{args.workers} workers: {parallel_time:.2f}s ({args.pages / parallel_time:.0f} pages/s)")
+
+
+if __name__ == "__main__":
+    main()
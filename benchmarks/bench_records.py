@@ -0,0 +1,61 @@
+"""Memory of extracted rows: per-label dicts vs. slotted LabelRecords.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_records --labels 100000
+"""
+import argparse
+import contextlib
+import io
+import random
+import tracemalloc
+
+from benchmarks.bench_patterns import make_meesho_block  # also sets up Django
+from home.meesho import MEESHO_COLUMNS, iter_meesho_labels
+
+
+def measure(build):
+    tracemalloc.start()
+    rows = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(rows), current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=500, help="distinct label blocks to parse")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    blocks = [make_meesho_block(rng) for _ in range(args.distinct)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed = list(iter_meesho_labels(blocks))
+
+    # Copy the strings so every row owns its values, like a real 100k-label run
+    def copy(value):
+        return (value + ".")[:-1]
+
+    def as_dicts():
+        return [{column: copy(parsed[i % len(parsed)].get(column)) for column in MEESHO_COLUMNS}
+                for i in range(args.labels)]
+
+    def as_records():
+        return [type(record).from_list([copy(v) if isinstance(v, str) else v for v in record.to_list()])
+                for record in (parsed[i % len(parsed)] for i in range(args.labels))]
+
+    dict_count, dict_bytes = measure(as_dicts)
+    record_count, record_bytes = measure(as_records)
+    print(f"labels: {dict_count}")
+    print(f"dicts:   {dict_bytes / 2**20:.1f} MiB ({dict_bytes / dict_count:.0f} B/label, values included)")
+    print(f"records: {record_bytes / 2**20:.1f} MiB ({record_bytes / record_count:.0f} B/label, values included)")
+
+    # The containers alone, all rows sharing the same value strings
+    _, dict_bytes = measure(lambda: [parsed[i % len(parsed)].to_dict(MEESHO_COLUMNS) for i in range(args.labels)])
+    _, record_bytes = measure(lambda: [type(r).from_list(r.to_list()) for r in (parsed[i % len(parsed)] for i in range(args.labels))])
+    print(f"containers only: dicts {dict_bytes / dict_count:.0f} B/label, records {record_bytes / record_count:.0f} B/label")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Amazon invoices: full page text vs. the region template (home/regions.py).
+
+Generates invoice pages laid out like Amazon's (seller and address blocks,
+order header, item table, amount in words, signature and legal text at the
+bottom), reads them both ways and checks both give the same rows. Every
+tenth invoice has a table long enough to run out of the template's item
+region, so its page falls back to the full text.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_regions --pages 1000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_patterns import make_meesho_block  # noqa: F401  (sets up Django)
+from home.amazon import iter_amazon_rows
+from home.pdftext import extract_page_texts
+from home.regions import RegionReport, iter_region_texts
+
+
+DECLARATION = (
+    "Whether tax is payable under reverse charge - No. Goods once sold are subject to the return policy of the seller. "
+    "This is a computer generated invoice and does not need a signature. Please note that this invoice is not a demand "
+    "for payment. For the terms of sale, warranty and returns see the seller's page on the marketplace."
+)
+
+
+def amazon_invoice_lines(rng, product_rows=3):
+    """``(x, y, text)`` lines of one invoice page (A4, 842pt high), in drawing order."""
+    order = f"{rng.randint(100, 999)}-{rng.randint(10**6, 10**7 - 1)}-{rng.randint(10**6, 10**7 - 1)}"
+    pincode = rng.randint(100000, 999999)
+    lines = [
+        (36, 40, "Tax Invoice/Bill of Supply/Cash Memo"),
+        (36, 52, "(Original for Recipient)"),
+        (36, 76, "Sold By :"),
+        (36, 88, f"Seller {rng.randint(1, 99)} Pvt Ltd"),
+        (36, 100, "Plot 12, GIDC Estate"),
+        (36, 112, "Surat, GUJARAT, 394210"),
+        (36, 136, "PAN No: ABCDE1234F"),
+        (36, 148, f"GST Registration No: 24ABCDE{rng.randint(1000, 9999)}F1Z5"),
+        (320, 76, "Billing Address :"),
+        (320, 88, f"Customer {rng.randint(1, 50000)}"),
+        (320, 100, f"{rng.randint(1, 300)} Main Road"),
+        (320, 112, "State/UT Code: 24"),
+        (320, 136, "Shipping Address :"),
+        (320, 148, f"Customer {rng.randint(1, 50000)}"),
+        (320, 160, f"{rng.randint(1, 300)} Main Road, Sector {rng.randint(1, 99)}"),
+        (320, 172, f"Surat, GUJARAT, {pincode}"),
+        (320, 184, "IN"),
+        (320, 196, "Place of supply: GUJARAT"),
+        (36, 250, f"Order Number: {order}"),
+        (36, 262, f"Order Date: {rng.randint(10, 28)}.07.2025"),
+        (36, 274, f"AWB {rng.randint(10**11, 10**12 - 1)}AB"),
+        (36, 286, f"Weight {rng.randint(1, 9)}.{rng.randint(0, 9)} kg"),
+        (320, 250, f"Invoice Number : IN-{rng.randint(1000, 99999)}"),
+        (320, 262, f"Invoice Date : {rng.randint(10, 28)}.07.2025"),
+        (36, 396, "Sl. No Description Unit Price Discount Qty Net Amount Tax Rate Tax Type Tax Amount Total Amount"),
+    ]
+    total = 0
+    for number in range(1, product_rows + 1):
+        price = rng.randint(100, 2000)
+        qty = rng.randint(1, 3)
+        net = price * qty
+        tax = round(net * 0.05, 2)
+        total += net + tax
+        lines.append((36, 396 + 14 * number, (
+            f"{number} Cotton Kurti {rng.choice(['Blue', 'Red', 'Green'])} | B0ABC{rng.randint(10000, 99999)} "
+            f"( KURTI-{rng.randint(1, 500)} ) HSN:6204 ₹{price:,}.00 {qty} ₹{net:,}.00 5% IGST ₹{tax:,.2f} ₹{net + tax:,.2f}"
+        )))
+    y = 396 + 14 * (product_rows + 1)
+    lines.append((36, y, f"TOTAL: ₹{total:,.2f}"))
+    lines += [(36, 730, "Amount in Words:"), (36, 742, "Rupees only"), (400, 730, "For Seller Pvt Ltd:"),
+              (400, 760, "Authorized Signatory")]
+    lines += [(36, 780 + 8 * n, DECLARATION[n * 110:(n + 1) * 110]) for n in range(len(DECLARATION) // 110 + 1)]
+    return lines
+
+
+def make_amazon_pdf(path, pages, seed=9):
+    rng = random.Random(seed)
+    # The base 14 fonts have no rupee sign; embed one that has, as invoices do
+    font = fitz.Font(script=0).buffer
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page()
+        page.insert_font(fontname="noto", fontbuffer=font)
+        # Every tenth invoice runs past the item region
+        for x, y, text in amazon_invoice_lines(rng, product_rows=26 if number % 10 == 9 else rng.randint(1, 5)):
+            page.insert_text((x, y), text, fontsize=6, fontname="noto")
+    doc.save(path)
+    doc.close()
+
+
+def timed(read):
+    start = time.perf_counter()
+    result = list(read())
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "invoices.pdf")
+        make_amazon_pdf(path, args.pages)
+        full_texts, full_read = timed(lambda: extract_page_texts(path, parallel=False))
+        report = RegionReport()
+        region_texts, region_read = timed(lambda: iter_region_texts(path, "amazon", report, parallel=False))
+
+    full_rows, full_parse = timed(lambda: iter_amazon_rows(full_texts))
+    region_rows, region_parse = timed(lambda: iter_amazon_rows(region_texts))
+    assert full_rows == region_rows, "the region template changed the rows"
+
+    full_chars = sum(map(len, full_texts))
+    region_chars = sum(map(len, region_texts))
+    print(f"pages: {args.pages}, rows: {len(full_rows)}, full-text fallbacks: {report}")
+    print(f"full page text:  read {full_read:.2f}s, parse {full_parse:.3f}s, {full_chars / 1e6:.2f}M chars")
+    print(f"region template: read {region_read:.2f}s, parse {region_parse:.3f}s, {region_chars / 1e6:.2f}M chars "
+          f"({100 * region_chars / full_chars:.0f}% of the text)")
+
+if __name__ == "__main__":
+    main()
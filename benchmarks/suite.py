@@ -0,0 +1,312 @@
+"""End to end and per stage throughput of every marketplace, with a baseline to compare against.
+
+For each marketplace and page count, a synthetic PDF (``benchmarks.synthetic``,
+cached between runs) is uploaded to the marketplace's view through Django's
+test client, with the result and page caches off, and the returned .xlsx is
+read to the end. The same PDF is then run stage by stage: page text,
+block splitting, field parsing, and the Excel export. Every case runs in a
+fresh interpreter so peak RSS is its own.
+
+Run from the repo root:
+
+    python -m benchmarks.suite --pages 10 100 1000
+    python -m benchmarks.suite --pages 10 100 1000 --save-baseline
+    python -m benchmarks.suite --pages 10 100 1000      # later: compared with the baseline
+
+Results go to ``--output`` as JSON. When ``--baseline`` exists, a case is a
+regression when its throughput drops, or its peak RSS grows, by more than
+``--tolerance``, or when it yields another number of rows; the run then
+exits with status 1. Stages shorter than ``NOISE_FLOOR_SECONDS`` are too
+noisy to compare and are only recorded.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+PDF_DIR = os.path.join(tempfile.gettempdir(), "label_bench_pdfs")
+NOISE_FLOOR_SECONDS = 0.05
+STAGES = ("text", "blocks", "parse", "export")
+URLS = {"meesho": "/meesho", "myntra": "/myntra/", "flipkart": "/flipkart", "amazon": "/amazon"}
+
+
+def pdf_path(marketplace, pages, seed):
+    """Return the path of the synthetic PDF for a case, generating it on first use."""
+    from benchmarks.synthetic import make_label_pdf
+
+    os.makedirs(PDF_DIR, exist_ok=True)
+    path = os.path.join(PDF_DIR, f"{marketplace}-{pages}-{seed}.pdf")
+    if not os.path.exists(path):
+        make_label_pdf(marketplace, path + ".part", pages, seed)
+        os.replace(path + ".part", path)
+    return path
+
+
+def peak_rss_mib():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rates(seconds, pages, labels):
+    return {
+        "seconds": round(seconds, 4),
+        "pages_per_s": round(pages / seconds, 1) if seconds else None,
+        "labels_per_s": round(labels / seconds, 1) if seconds else None,
+    }
+
+
+class _SummaryHandler:
+    """Keeps the last ``home.extraction`` summary line logged"""
+
+    def __init__(self):
+        import logging
+
+        self.summary = None
+        self.handler = logging.Handler()
+        self.handler.emit = self.emit
+
+    def emit(self, record):
+        self.summary = json.loads(record.getMessage().split(" ", 1)[1])
+
+
+def run_end_to_end(marketplace, path):
+    import logging
+
+    from django.test import Client
+    from django.urls import resolve
+
+    # Import the URLconf and views first, as a running server already has
+    resolve(URLS[marketplace])
+    captured = _SummaryHandler()
+    logging.getLogger("home.extraction").addHandler(captured.handler)
+    client = Client()
+    start = time.perf_counter()
+    with open(path, "rb") as pdf_file:
+        response = client.post(URLS[marketplace], {"pdf_file": pdf_file})
+    body = b"".join(response.streaming_content) if response.streaming else response.content
+    response.close()
+    elapsed = time.perf_counter() - start
+    logging.getLogger("home.extraction").removeHandler(captured.handler)
+    if captured.summary is None or not body.startswith(b"PK"):
+        raise RuntimeError(f"{marketplace}: the view returned no spreadsheet (status {response.status_code})")
+    return elapsed, captured.summary
+
+
+def stage_functions(marketplace):
+    """``(read_texts, split_blocks, parse_blocks, columns)`` of ``marketplace``, as its view runs them."""
+    from home import amazon, flipkart, meesho, myntra, patterns
+    from home.blocks import iter_marker_blocks, iter_pattern_blocks
+    from home.pdftext import extract_page_texts
+    from home.regions import iter_region_texts
+
+    if marketplace == "meesho":
+        return (extract_page_texts,
+                lambda texts: list(iter_marker_blocks(texts, "Customer Address")),
+                lambda blocks: [meesho.extract_meesho_label(block) for block in blocks],
+                meesho.MEESHO_COLUMNS)
+    if marketplace == "myntra":
+        return (extract_page_texts,
+                lambda texts: list(iter_marker_blocks(texts, "Customer Address")),
+                lambda blocks: [myntra.extract_myntra_label(block) for block in blocks],
+                myntra.MYNTRA_COLUMNS)
+    if marketplace == "flipkart":
+        return (extract_page_texts,
+                lambda texts: list(iter_pattern_blocks((text + "\n" for text in texts),
+                                                       patterns.FLIPKART_ORDER_ID_SPLIT)),
+                lambda blocks: [label for label in (flipkart.extract_flipkart_label(*block) for block in blocks) if label],
+                flipkart.FLIPKART_COLUMNS)
+    # Every Amazon page is one invoice, read through the region template
+    return (lambda path: list(iter_region_texts(path, "amazon")),
+            list,
+            lambda blocks: [row for block in blocks for row in amazon.extract_amazon_page(block)],
+            amazon.AMAZON_COLUMNS)
+
+
+def run_stages(marketplace, path, pages):
+    from home.export import write_xlsx
+
+    read_texts, split_blocks, parse_blocks, columns = stage_functions(marketplace)
+    timings = {}
+    start = time.perf_counter()
+    texts = read_texts(path)
+    timings["text"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blocks = split_blocks(texts)
+    timings["blocks"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = parse_blocks(blocks)
+    timings["parse"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        write_xlsx(rows, columns, os.path.join(tmp_dir, "out.xlsx"))
+        timings["export"] = time.perf_counter() - start
+
+    stages = {name: rates(seconds, pages, len(rows)) for name, seconds in timings.items()}
+    stages["blocks"]["blocks"] = len(blocks)
+    return stages, len(rows)
+
+
+def run_case(marketplace, pages, seed, workers):
+    """Run one case in this process and return its results."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "label.settings")
+    import django
+    from django.test.utils import override_settings
+
+    django.setup()
+    override_settings(
+        ALLOWED_HOSTS=["testserver"],
+        LABEL_RESULT_CACHE_MAX_BYTES=0,
+        LABEL_PAGE_CACHE_MAX_BYTES=0,
+        PDF_TEXT_WORKERS=workers,
+    ).enable()
+
+    path = pdf_path(marketplace, pages, seed)
+    startup_rss = peak_rss_mib()
+    seconds, summary = run_end_to_end(marketplace, path)
+    end_to_end = rates(seconds, summary["pages"], summary["rows"])
+    end_to_end["peak_rss_mib"] = round(peak_rss_mib(), 1)
+    end_to_end["startup_rss_mib"] = round(startup_rss, 1)
+
+    stages, stage_rows = run_stages(marketplace, path, pages)
+    if stage_rows != summary["rows"]:
+        raise RuntimeError(f"{marketplace}: the stages gave {stage_rows} rows, the view {summary['rows']}")
+    return {
+        "marketplace": marketplace,
+        "pages": pages,
+        "rows": summary["rows"],
+        "blocks": summary["blocks"],
+        "end_to_end": end_to_end,
+        "stages": stages,
+    }
+
+
+def run_case_subprocess(marketplace, pages, seed, workers):
+    # Generate the PDF here, so the child's peak RSS is only the extraction's
+    pdf_path(marketplace, pages, seed)
+    command = [sys.executable, "-m", "benchmarks.suite", "--case", marketplace, "--pages", str(pages),
+               "--seed", str(seed)]
+    if workers:
+        command += ["--workers", str(workers)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_meta(workers):
+    import fitz  # PyMuPDF
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pymupdf": fitz.VersionBind,
+        "cpus": os.cpu_count(),
+        "workers": workers,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return one message per regression of ``results`` against ``baseline``."""
+    previous = {(case["marketplace"], case["pages"]): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        base = previous.get((case["marketplace"], case["pages"]))
+        if base is None:
+            continue
+        name = f"{case['marketplace']} {case['pages']} pages"
+        if case["rows"] != base["rows"]:
+            regressions.append(f"{name}: {case['rows']} rows, baseline {base['rows']}")
+
+        timings = [("end to end", case["end_to_end"], base["end_to_end"])]
+        timings += [(stage, case["stages"][stage], base["stages"][stage])
+                    for stage in STAGES if stage in base.get("stages", {})]
+        for label, now, then in timings:
+            if max(now["seconds"], then["seconds"]) < NOISE_FLOOR_SECONDS or not then["pages_per_s"]:
+                continue
+            if now["pages_per_s"] < then["pages_per_s"] * (1 - tolerance):
+                regressions.append(f"{name}, {label}: {now['pages_per_s']} pages/s, baseline {then['pages_per_s']}")
+
+        now_rss, then_rss = case["end_to_end"]["peak_rss_mib"], base["end_to_end"]["peak_rss_mib"]
+        if now_rss > then_rss * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {now_rss} MiB, baseline {then_rss} MiB")
+    return regressions
+
+
+def print_case(case, baseline_case=None):
+    end_to_end = case["end_to_end"]
+    line = (f"{case['marketplace']:>9} {case['pages']:>6} {case['rows']:>6} {end_to_end['seconds']:>8.2f} "
+            f"{end_to_end['pages_per_s']:>8.1f} {end_to_end['labels_per_s']:>9.1f} {end_to_end['peak_rss_mib']:>8.1f}  ")
+    line += " ".join(f"{stage}={case['stages'][stage]['seconds']:.3f}s" for stage in STAGES)
+    if baseline_case:
+        then = baseline_case["end_to_end"]["pages_per_s"]
+        if then:
+            line += f"  ({100 * (end_to_end['pages_per_s'] / then - 1):+.0f}% pages/s)"
+    print(line, flush=True)
+
+
+def main():
+    from benchmarks.synthetic import MARKETPLACES
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--marketplaces", nargs="+", choices=MARKETPLACES, default=list(MARKETPLACES))
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="PDF_TEXT_WORKERS for the runs (default: the setting)")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=os.path.join(RESULTS_DIR, "baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--case", choices=MARKETPLACES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.pages[0], args.seed, args.workers)))
+        return
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    previous = {(case["marketplace"], case["pages"]): case for case in (baseline or {}).get("cases", [])}
+
+    results = {"meta": run_meta(args.workers), "cases": []}
+    print(f"{'market':>9} {'pages':>6} {'rows':>6} {'seconds':>8} {'pages/s':>8} {'labels/s':>9} {'RSS MiB':>8}  stages")
+    for pages in args.pages:
+        for marketplace in args.marketplaces:
+            case = run_case_subprocess(marketplace, pages, args.seed, args.workers)
+            results["cases"].append(case)
+            print_case(case, previous.get((marketplace, pages)))
+
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as results_file:
+            json.dump(results, results_file, indent=2)
+        print(f"results written to {path}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Synthetic label PDFs for every marketplace, laid out the way the parsers expect.
+
+Meesho and Myntra pages carry two label blocks, drawn as text; Flipkart pages
+one positioned label (``bench_flipkart_layout``); Amazon pages one invoice
+with one to five product rows (``bench_regions``).
+
+    from benchmarks.synthetic import make_label_pdf
+    make_label_pdf("myntra", "/tmp/myntra.pdf", pages=500)
+"""
+import random
+
+import fitz  # PyMuPDF
+
+from benchmarks.bench_flipkart_layout import flipkart_label_lines
+from benchmarks.bench_patterns import COURIERS, make_meesho_block  # also sets up Django
+from benchmarks.bench_regions import amazon_invoice_lines
+
+
+MARKETPLACES = ("meesho", "myntra", "flipkart", "amazon")
+
+
+def make_myntra_block(rng):
+    """Build one synthetic Myntra label block.
+
+    The product line comes right after the address: the parser takes the
+    first line of four or more words as the product.
+    """
+    return (
+        "Customer Address\n"
+        f"Customer {rng.randrange(10**4)}\n"
+        f"{rng.randrange(1, 999)} Ring Road\n"
+        f"Surat {rng.randrange(100000, 999999)}\n"
+        "SKU Size Qty Color\n"
+        f"KURTI-{rng.randrange(1000)} {rng.choice(['S', 'M', 'L', 'XL'])} {rng.randrange(1, 4)} Blue\n"
+        "If undelivered, return to:\n"
+        "Myntra Designs Pvt Ltd\n"
+        f"{rng.choice(COURIERS)}\n"
+        f"AWB No: MYN{rng.randrange(10**9, 10**10)}\n"
+        f"GSTIN: 29ABCDE{rng.randrange(1000, 9999)}F1Z5\n"
+        f"Order Date: {rng.randrange(1, 28):02d}/07/2025\n"
+        f"Invoice Date: {rng.randrange(1, 28):02d}/07/2025\n"
+    )
+
+
+def _text_pages(doc, rng, pages, make_block):
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_text((36, 48), make_block(rng), fontsize=8)
+        page.insert_text((36, 440), make_block(rng), fontsize=8)
+
+
+def _positioned_pages(doc, rng, pages, make_lines, font):
+    # One TextWriter per page with a shared Font: much faster than
+    # page.insert_text, which loads the font again for every page
+    for _ in range(pages):
+        page = doc.new_page()
+        writer = fitz.TextWriter(page.rect)
+        for x, y, text in make_lines(rng):
+            writer.append((x, y), text, font=font, fontsize=6)
+        writer.write_text(page)
+
+
+def make_label_pdf(marketplace, path, pages, seed=11):
+    """Write ``pages`` pages of ``marketplace`` labels to ``path``."""
+    rng = random.Random(seed)
+    doc = fitz.open()
+    if marketplace == "meesho":
+        _text_pages(doc, rng, pages, make_meesho_block)
+    elif marketplace == "myntra":
+        _text_pages(doc, rng, pages, make_myntra_block)
+    elif marketplace == "flipkart":
+        _positioned_pages(doc, rng, pages, flipkart_label_lines, fitz.Font("helv"))
+    elif marketplace == "amazon":
+        # The base 14 fonts have no rupee sign
+        _positioned_pages(doc, rng, pages, lambda rng: amazon_invoice_lines(rng, product_rows=rng.randint(1, 5)),
+                          fitz.Font(script=0))
+    else:
+        raise ValueError(f"Unknown marketplace '{marketplace}'")
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
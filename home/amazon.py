@@ -1,31 +1,37 @@
 from django.shortcuts import render
-from django.http import FileResponse
+from django.http import FileResponse, JsonResponse
 import fitz  # PyMuPDF
-import pandas as pd
 import re
 import os
 import tempfile
+import logging
 from datetime import datetime
+from home import instrument, patterns, regexguard
+from home.export import export_response, requested_export_format, write_xlsx
+from home.pagecache import PageReuse, iter_cached_units
+from home.jobs import requested_job_mode, submit_job
+from home.resultcache import cached_rows
+from home.instrument import ExtractionSummary
+from home.timing import StageTimer
+from home.records import LabelRecord
+from home.regions import RegionReport, iter_region_texts
+from home.uploads import PdfSource
+
+# Bump whenever a change here alters the extracted rows: it invalidates
+# the result cache entries written by older code
+EXTRACTOR_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+AMAZON_COLUMNS = [
+    "Order ID", "Order Date", "Invoice No", "Invoice Date", "Buyer Name", "Address", "Pincode",
+    "GSTIN", "AWB Number", "Pickup Partner", "Weight", "SI No", "Description", "Unit Price",
+    "Discount", "Qty", "Net Amount", "Tax Rate", "Tax Type", "Tax Amount", "Total Amount"
+]
 
 def extract_amazon_table_data(text):
     table_data = []
-    pattern = re.compile(
-        r"(\d+)\s+"  # SI No
-        r"(.*?)\s*"
-        r"\|\s*B0\w+\s*\([^)]+\)\s*"
-        r"HSN:\d+\s*"
-        r"₹([\d,]+\.\d{2})\s*"
-        r"(?:-₹([\d,]+\.\d{2})\s*)?"
-        r"(\d+)\s*"
-        r"₹([\d,]+\.\d{2})\s*"
-        r"(\d+%)\s*"
-        r"(IGST|CGST|SGST)\s*"
-        r"₹([\d,]+\.\d{2})\s*"
-        r"₹([\d,]+\.\d{2})",
-        re.DOTALL
-    )
-
-    for match in pattern.finditer(text):
+    for match in regexguard.finditer("amazon.table_row", patterns.AMAZON_TABLE_ROW, text):
         table_data.append({
             "SI No": match.group(1),
             "Description": match.group(2).replace('\n', ' ').strip(),
@@ -42,6 +48,97 @@ def extract_amazon_table_data(text):
     return table_data
 
 
+def iter_amazon_rows(page_texts):
+    """Yield one row per product line; every page is one invoice"""
+    for block in page_texts:
+        yield from extract_amazon_page(block)
+
+
+def iter_amazon_rows_cached(page_texts, report=None):
+    """Same rows as ``iter_amazon_rows``; pages seen in an earlier upload are not parsed again"""
+    units = ((text,) for text in page_texts)
+    return iter_cached_units(units, "amazon", EXTRACTOR_VERSION, lambda unit: extract_amazon_page(unit[0]), report)
+
+
+@instrument.block_parser
+@regexguard.budgeted
+def extract_amazon_page(block):
+    """Extract the invoice header and product rows of one page"""
+    order_id = invoice_no = order_date = invoice_date = ""
+    buyer_name = address = pincode = ""
+    gstin = awb_number = weight = ""
+    pickup_partner = "Amazon Transportation"
+
+    awb_match = patterns.AMAZON_AWB.search(block)
+    if awb_match:
+        awb_number = awb_match.group(1).strip()
+
+    weight_match = patterns.AMAZON_WEIGHT.search(block)
+    if weight_match:
+        weight = weight_match.group(1).strip()
+
+    order_match = patterns.AMAZON_ORDER_NUMBER.search(block)
+    if order_match:
+        order_id = order_match.group(1)
+
+    invoice_match = patterns.AMAZON_INVOICE_NUMBER.search(block)
+    if invoice_match:
+        invoice_no = invoice_match.group(1)
+
+    order_date_match = patterns.AMAZON_ORDER_DATE.search(block)
+    if order_date_match:
+        try:
+            order_date = datetime.strptime(order_date_match.group(1), "%d.%m.%Y").strftime("%d/%m/%Y")
+        except:
+            order_date = order_date_match.group(1)
+
+    invoice_date_match = patterns.AMAZON_INVOICE_DATE.search(block)
+    if invoice_date_match:
+        try:
+            invoice_date = datetime.strptime(invoice_date_match.group(1), "%d.%m.%Y").strftime("%d/%m/%Y")
+        except:
+            invoice_date = invoice_date_match.group(1)
+
+    gstin_match = patterns.AMAZON_GSTIN.search(block)
+    if gstin_match:
+        gstin = gstin_match.group(1)
+
+    ship_match = regexguard.search("amazon.shipping_address", patterns.AMAZON_SHIPPING_ADDRESS, block)
+    if ship_match:
+        lines = [l.strip() for l in ship_match.group(1).split('\n') if l.strip()]
+        if lines:
+            buyer_name = lines[0]
+            rest = "\n".join(lines[1:])
+            pin = patterns.PINCODE.search(rest)
+            if pin:
+                pincode = pin.group(1)
+                address = rest.replace(pincode, "").strip()
+
+    # Extract product rows
+    product_rows = extract_amazon_table_data(block)
+
+    return [
+        LabelRecord(
+            marketplace="amazon",
+            order_id=order_id,
+            order_date=order_date,
+            invoice_date=invoice_date,
+            customer_address=address,
+            pincode=pincode,
+            gstin=gstin,
+            awb=awb_number,
+            courier=pickup_partner,
+            description=row["Description"],
+            qty=row["Qty"],
+            extras=(
+                invoice_no, buyer_name, weight, row["SI No"], row["Unit Price"], row["Discount"],
+                row["Net Amount"], row["Tax Rate"], row["Tax Type"], row["Tax Amount"], row["Total Amount"],
+            ),
+        )
+        for row in product_rows
+    ]
+
+
 def amazonindex(request):
     message = None
     extracted_data_for_display = []
@@ -50,121 +147,63 @@ def amazonindex(request):
     if request.method == "POST" and request.FILES.get("pdf_file"):
         uploaded_file = request.FILES["pdf_file"]
 
-        # ✅ Save uploaded file to /tmp (Vercel-compatible)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf", dir="/tmp") as tmp:
-            for chunk in uploaded_file.chunks():
-                tmp.write(chunk)
-            full_file_path = tmp.name
+        # ✅ Read the upload in place (memory or Django's temp file), nothing extra in /tmp
+        source = PdfSource.from_upload(uploaded_file)
 
-        doc = None
         try:
-            doc = fitz.open(full_file_path)
-            extracted_labels = []
-
-            for page_num in range(doc.page_count):
-                page = doc.load_page(page_num)
-                block = page.get_text("text")
-
-                order_id = invoice_no = order_date = invoice_date = ""
-                buyer_name = address = pincode = ""
-                gstin = awb_number = weight = ""
-                pickup_partner = "Amazon Transportation"
-
-                awb_match = re.search(r"\bAWB\s+([A-Z0-9]{10,})", block)
-                if awb_match:
-                    awb_number = awb_match.group(1).strip()
-
-                weight_match = re.search(r"\b(?:Weight|Wt\.?)\s*[:\-]?\s*(\d+\.?\d*)\s*(?:kg|kgs)", block, re.IGNORECASE)
-                if weight_match:
-                    weight = weight_match.group(1).strip()
-
-                order_match = re.search(r"Order Number:\s*(\d{3}-\d{7}-\d{7})", block)
-                if order_match:
-                    order_id = order_match.group(1)
-
-                invoice_match = re.search(r"Invoice Number\s*:\s*([A-Z0-9\-]+)", block)
-                if invoice_match:
-                    invoice_no = invoice_match.group(1)
-
-                order_date_match = re.search(r"Order Date:\s*(\d{2}\.\d{2}\.\d{4})", block)
-                if order_date_match:
-                    try:
-                        order_date = datetime.strptime(order_date_match.group(1), "%d.%m.%Y").strftime("%d/%m/%Y")
-                    except:
-                        order_date = order_date_match.group(1)
-
-                invoice_date_match = re.search(r"Invoice Date\s*:\s*(\d{2}\.\d{2}\.\d{4})", block)
-                if invoice_date_match:
-                    try:
-                        invoice_date = datetime.strptime(invoice_date_match.group(1), "%d.%m.%Y").strftime("%d/%m/%Y")
-                    except:
-                        invoice_date = invoice_date_match.group(1)
-
-                gstin_match = re.search(r"GST Registration No:\s*([A-Z0-9]+)", block)
-                if gstin_match:
-                    gstin = gstin_match.group(1)
-
-                ship_match = re.search(r"Shipping Address\s*:\s*(.*?)(?:Place of supply:|State/UT Code:|\Z)", block, re.DOTALL)
-                if ship_match:
-                    lines = [l.strip() for l in ship_match.group(1).split('\n') if l.strip()]
-                    if lines:
-                        buyer_name = lines[0]
-                        rest = "\n".join(lines[1:])
-                        pin = re.search(r"(\d{6})", rest)
-                        if pin:
-                            pincode = pin.group(1)
-                            address = rest.replace(pincode, "").strip()
-
-                # Extract product rows
-                product_rows = extract_amazon_table_data(block)
-
-                for row in product_rows:
-                    extracted_labels.append({
-                        "Order ID": order_id,
-                        "Order Date": order_date,
-                        "Invoice No": invoice_no,
-                        "Invoice Date": invoice_date,
-                        "Buyer Name": buyer_name,
-                        "Address": address,
-                        "Pincode": pincode,
-                        "GSTIN": gstin,
-                        "AWB Number": awb_number,
-                        "Pickup Partner": pickup_partner,
-                        "Weight": weight,
-                        "SI No": row["SI No"],
-                        "Description": row["Description"],
-                        "Unit Price": row["Unit Price"],
-                        "Discount": row["Discount"],
-                        "Qty": row["Qty"],
-                        "Net Amount": row["Net Amount"],
-                        "Tax Rate": row["Tax Rate"],
-                        "Tax Type": row["Tax Type"],
-                        "Tax Amount": row["Tax Amount"],
-                        "Total Amount": row["Total Amount"]
-                    })
-
-            df = pd.DataFrame(extracted_labels)
-
-            if df.empty:
+            export_format = requested_export_format(request)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Repeat uploads of the same PDF are answered from the result cache
+            # and new pages of an overlapping manifest are the only ones parsed
+            page_reuse = PageReuse()
+            # Only the header and item table regions are read (see home/regions.py)
+            regions = RegionReport()
+            summary = ExtractionSummary("amazon")
+            # Server-Timing: time per stage (home/timing.py)
+            timer = StageTimer("amazon")
+            rows = cached_rows(source, "amazon", EXTRACTOR_VERSION,
+                               lambda source: iter_amazon_rows_cached(
+                                   summary.read(timer.iter(iter_region_texts(source, "amazon", regions), "text")), page_reuse))
+            rows = timer.iter(summary.track(rows, AMAZON_COLUMNS), "parse")
+            if requested_job_mode(request):
+                # Big uploads: extract in the background and answer with a job id right away
+                source.detach()
+                job = submit_job("amazon", rows, AMAZON_COLUMNS, export_format, f"amazon_invoice_{timestamp}")
+                return JsonResponse(job.as_dict(), status=202)
+            if export_format != "xlsx":
+                # ✅ CSV / JSONL stream row by row
+                response = export_response(rows, AMAZON_COLUMNS, export_format, f"amazon_invoice_{timestamp}",
+                                           on_close=lambda: timer.write_profile(summary))
+                if response is not None:
+                    return timer.add_header(response)
                 message = "❌ No data extracted from PDF"
-            else:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_filename = f"amazon_invoice_{timestamp}.xlsx"
-                tmp_file_path = os.path.join("/tmp", output_filename)
-                df.to_excel(tmp_file_path, index=False)
 
-                message = f"✅ {len(df)} rows extracted successfully."
-                extracted_data_for_display = df.to_dict(orient="records")
-
-                return FileResponse(open(tmp_file_path, 'rb'), as_attachment=True, filename=output_filename)
+            else:
+                # A unique file per upload: two uploads in the same second used to share one name
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp_file:
+                    tmp_file_path = tmp_file.name
+                with timer.stage("export"):
+                    row_count = write_xlsx(rows, AMAZON_COLUMNS, tmp_file_path)
+                timer.write_profile(summary)
+
+                if not row_count:
+                    os.remove(tmp_file_path)
+                    message = "❌ No data extracted from PDF"
+                else:
+                    output_filename = f"amazon_invoice_{timestamp}.xlsx"
+                    message = f"✅ {row_count} rows extracted successfully."
+
+                    response = FileResponse(open(tmp_file_path, 'rb'), as_attachment=True, filename=output_filename)
+                    if page_reuse.pages:
+                        logger.info("♻️ %s pages reused from the page cache", page_reuse)
+                        response["X-Pages-Reused"] = str(page_reuse)
+                    if regions.fallbacks:
+                        logger.info("✂️ %s pages did not fit the region template, read in full", regions)
+                        response["X-Region-Fallbacks"] = str(regions)
+                    return timer.add_header(response)
 
         except Exception as e:
             message = f"❌ Error: {str(e)}"
-        finally:
-            if doc:
-                doc.close()
-            if os.path.exists(full_file_path):
-                os.remove(full_file_path)
 
     return render(request, "upload_file.html", {
         "message": message,
@@ -0,0 +1,79 @@
+"""Split a stream of page texts into label blocks without building full_text.
+
+Blocks are yielded as soon as the next delimiter shows up, carrying partial
+blocks across page boundaries, so only the block being assembled is held in
+memory rather than the whole manifest.
+"""
+
+
+def iter_marker_blocks(page_texts, marker):
+    """Yield ``marker + block`` for every block after the first ``marker``.
+
+    Gives the same blocks as ``[marker + b for b in full_text.split(marker)[1:]]``.
+    """
+    buffer = ""
+    search_from = 0
+    in_block = False
+    for text in page_texts:
+        buffer += text
+        while True:
+            index = buffer.find(marker, search_from)
+            if index == -1:
+                break
+            if in_block:
+                yield buffer[:index]
+            buffer = buffer[index:]
+            search_from = len(marker)
+            in_block = True
+        if not in_block:
+            # Nothing before the first marker is kept, apart from a possible
+            # partial marker at the very end
+            buffer = buffer[len(buffer) - len(marker) + 1:] if len(buffer) >= len(marker) else buffer
+            search_from = 0
+        else:
+            search_from = max(search_from, len(buffer) - len(marker) + 1)
+    if in_block:
+        yield buffer
+
+
+def iter_pattern_blocks(page_texts, pattern, overlap=64):
+    """Yield ``(delimiter, content)`` for every match of ``pattern``.
+
+    Gives the same pairs as ``re.split`` with one capturing group:
+    ``zip(parts[1::2], parts[2::2])``, for delimiters that do not look behind
+    themselves. ``overlap`` is the longest possible delimiter: that much text
+    is kept back in case a delimiter is split across two pages.
+    """
+    buffer = ""
+    current = None
+    search_from = 0
+    for text in page_texts:
+        buffer += text
+        while True:
+            match = pattern.search(buffer, search_from)
+            if match is None:
+                search_from = max(0, len(buffer) - overlap)
+                break
+            if match.end() >= len(buffer):
+                # The delimiter may continue on the next page
+                search_from = match.start()
+                break
+            if current is not None:
+                yield current, buffer[:match.start()]
+            current = match.group()
+            buffer = buffer[match.end():]
+            search_from = 0
+        if current is None:
+            # Nothing before the first delimiter is kept
+            buffer = buffer[search_from:]
+            search_from = 0
+
+    # After the last page a delimiter may end the text
+    content_start = 0
+    for match in pattern.finditer(buffer, search_from):
+        if current is not None:
+            yield current, buffer[content_start:match.start()]
+        current = match.group()
+        content_start = match.end()
+    if current is not None:
+        yield current, buffer[content_start:]
@@ -0,0 +1,466 @@
+"""Chunked, resumable uploads for manifests too big to post in one go.
+
+A 200 MB manifest posted as one ``pdf_file`` over a shaky connection has to
+start over when it fails near the end. Instead a client can:
+
+1. ``POST /chunked`` with ``size`` (bytes), and optionally ``marketplace``
+   and ``sha256``: returns the upload ``id``, ``part_size`` and ``parts``.
+2. ``PUT /chunked/<id>/parts/<n>`` for every part ``n`` (0-based; every
+   part is ``part_size`` bytes but the last), in any order and as often as
+   needed. ``GET /chunked/<id>`` lists the parts still ``missing``, which is
+   what a client resumes from.
+3. ``POST /chunked/<id>/complete`` (with the usual ``format`` / ``mode``
+   fields): the marketplace view runs on the assembled file and answers as
+   for a normal upload. A 409 (parts still missing) or 400 can be retried;
+   once it has answered, the upload is gone.
+
+Parts are written straight to their offset in one file per upload in
+``LABEL_CHUNKED_UPLOAD_DIR`` (default ``media/chunked_uploads``, created
+readable by this user only), so completing assembles nothing. The state
+next to it is JSON. Uploads idle for ``LABEL_CHUNKED_TTL_SECONDS`` are
+removed. Like the upload forms, the ``POST`` and ``PUT`` requests need the
+CSRF token: an ``X-CSRFToken`` header matching the ``csrftoken`` cookie that
+``GET /upload`` sets.
+
+Reading starts before the last part is in. Whenever the parts received
+without a gap from the start have grown by ``READ_AHEAD_GROWTH``, a
+background task opens that prefix (MuPDF repairs the missing
+cross-reference table; the page tree is cut down to the page objects
+present), reads the pages past the ones it read last time with the reader
+the marketplace's view uses, and appends each result to ``pages.jsonl``
+under the page's ``page_digest``. Growing by a factor keeps the reopening
+linear in the upload size. On completion the view's page reader takes
+those results for the leading pages whose digest matches, and only reads
+the rest: a page whose objects were not all in the prefix, or changed
+since, is read again. How much this saves depends on the producer writing
+pages (and their fonts) in order, which most manifest generators do.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import fitz  # PyMuPDF
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.urls import reverse
+
+from home.detect import MARKETPLACES
+from home.pagedigest import REFERENCE, page_digest
+from home.pdftext import get_pool, page_text, page_words, reader_key, reset_pool, text_workers
+
+
+DEFAULT_PART_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 24 * 3600
+COPY_BYTES = 1024 * 1024
+# Read ahead again once the prefix is this many times the one read last
+READ_AHEAD_GROWTH = 1.25
+UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+SHA256 = re.compile(r"[0-9a-f]{64}")
+
+logger = logging.getLogger(__name__)
+
+_running = set()
+_lock = threading.Lock()
+_executor = None
+
+
+# Page readers whose results do not come back from JSON as they went in
+JSON_RESULTS = {
+    "home.pdftext.page_words": lambda words: [tuple(word) for word in words],
+    "home.regions.read_regions": tuple,
+}
+
+
+def upload_root():
+    return os.fspath(getattr(settings, "LABEL_CHUNKED_UPLOAD_DIR", None)
+                     or os.path.join(settings.BASE_DIR, "media", "chunked_uploads"))
+
+
+def _from_json(key, results):
+    """Turn the JSON of ``{page_digest: result}`` of reader ``key`` back into the reader's types."""
+    for reader, convert in JSON_RESULTS.items():
+        if key.startswith(reader):
+            return {digest: convert(result) for digest, result in results.items()}
+    return results
+
+
+class ChunkedUpload:
+    """One upload on disk: ``meta.json``, the ``data.pdf`` its parts go into, a marker per part received
+    and the pages read ahead"""
+
+    def __init__(self, upload_id, meta):
+        self.id = upload_id
+        self.size = meta["size"]
+        self.part_size = meta["part_size"]
+        self.marketplace = meta["marketplace"]
+        self.sha256 = meta["sha256"]
+        self.directory = os.path.join(upload_root(), upload_id)
+        self.data_path = os.path.join(self.directory, "data.pdf")
+        self.pages_path = os.path.join(self.directory, "pages.jsonl")
+        self.read_ahead_path = os.path.join(self.directory, "read_ahead.json")
+
+    @property
+    def part_count(self):
+        return -(-self.size // self.part_size)
+
+    def part_length(self, number):
+        return min(self.part_size, self.size - number * self.part_size)
+
+    def received_parts(self):
+        return sorted(int(name[5:]) for name in os.listdir(self.directory) if name.startswith("part-"))
+
+    def missing_parts(self):
+        received = set(self.received_parts())
+        return [number for number in range(self.part_count) if number not in received]
+
+    def prefix_bytes(self):
+        """Bytes received without a gap from the start of the file."""
+        received = set(self.received_parts())
+        number = 0
+        while number in received:
+            number += 1
+        return min(number * self.part_size, self.size)
+
+    def write_part(self, number, stream, length):
+        """Copy part ``number`` (``length`` bytes read from ``stream``) to its place in the file."""
+        if not 0 <= number < self.part_count:
+            raise ValueError(f"Part {number} out of range, this upload has parts 0 to {self.part_count - 1}")
+        expected = self.part_length(number)
+        if length != expected:
+            raise ValueError(f"Part {number} must be {expected} bytes, got {length}")
+        written = 0
+        with open(self.data_path, "r+b") as data:
+            data.seek(number * self.part_size)
+            while written < expected:
+                chunk = stream.read(min(COPY_BYTES, expected - written))
+                if not chunk:
+                    break
+                data.write(chunk)
+                written += len(chunk)
+        if written != expected:
+            raise ValueError(f"Part {number} ended after {written} of {expected} bytes, send it again")
+        # The marker goes last: a part cut off halfway stays missing
+        open(os.path.join(self.directory, f"part-{number}"), "wb").close()
+
+    def verify(self):
+        """Raise ValueError when the assembled file does not match the ``sha256`` given at init."""
+        if not self.sha256:
+            return
+        digest = hashlib.sha256()
+        with open(self.data_path, "rb") as data:
+            for chunk in iter(lambda: data.read(COPY_BYTES), b""):
+                digest.update(chunk)
+        if digest.hexdigest() != self.sha256:
+            raise ValueError("The assembled file does not match its sha256, check the parts and send them again")
+
+    def _load(self, path, default):
+        try:
+            with open(path, encoding="utf-8") as state_file:
+                return json.load(state_file)
+        except (FileNotFoundError, ValueError):
+            return default
+
+    def _store(self, path, value):
+        partial_path = path + ".part"
+        with open(partial_path, "w", encoding="utf-8") as state_file:
+            json.dump(value, state_file, ensure_ascii=False)
+        os.replace(partial_path, path)
+
+    def known_pages(self):
+        """``{reader_key: {page_digest: result}}`` of the pages read so far."""
+        pages = {}
+        try:
+            with open(self.pages_path, encoding="utf-8") as pages_file:
+                for line in pages_file:
+                    try:
+                        key, digest, result = json.loads(line)
+                    except ValueError:
+                        # A line cut off by a crash mid-write
+                        continue
+                    pages.setdefault(key, {})[digest] = result
+        except FileNotFoundError:
+            pass
+        return {key: _from_json(key, results) for key, results in pages.items()}
+
+    def read_ahead(self):
+        """How far reading ahead got, without loading the pages: ``bytes`` of prefix read,
+        ``pages`` read, and the ``reader`` and ``next_page`` to go on from."""
+        return self._load(self.read_ahead_path, {"bytes": 0, "pages": 0, "reader": None, "next_page": 0})
+
+    def save_known_pages(self, key, results, prefix_bytes, pages, next_page):
+        """Append ``results`` (``{page_digest: result}`` of reader ``key``) and move the read-ahead state on."""
+        with open(self.pages_path, "a", encoding="utf-8") as pages_file:
+            for digest, result in results.items():
+                pages_file.write(json.dumps([key, digest, result], ensure_ascii=False) + "\n")
+        self._store(self.read_ahead_path, {"bytes": prefix_bytes, "pages": pages, "reader": key, "next_page": next_page})
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def as_uploaded_file(self):
+        """The assembled file as a Django upload, for the marketplace views."""
+        return AssembledUpload(self)
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "size": self.size,
+            "part_size": self.part_size,
+            "parts": self.part_count,
+            "marketplace": self.marketplace,
+            "received": self.received_parts(),
+            "missing": self.missing_parts(),
+            "pages_read_ahead": self.read_ahead()["pages"],
+            "status_url": reverse("chunked-status", args=[self.id]),
+            "complete_url": reverse("chunked-complete", args=[self.id]),
+        }
+
+
+class AssembledUpload(UploadedFile):
+    """A chunked upload's file, handed to a view as its ``pdf_file``"""
+
+    def __init__(self, upload):
+        super().__init__(open(upload.data_path, "rb"), "upload.pdf", "application/pdf", upload.size)
+        self.path = upload.data_path
+        self.known_pages = upload.known_pages()
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def _expire_uploads():
+    """Remove uploads nobody has touched for ``LABEL_CHUNKED_TTL_SECONDS``."""
+    root = upload_root()
+    if not os.path.isdir(root):
+        return
+    ttl = getattr(settings, "LABEL_CHUNKED_TTL_SECONDS", None) or DEFAULT_TTL_SECONDS
+    cutoff = time.time() - ttl
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        try:
+            if os.path.getmtime(directory) < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+        except FileNotFoundError:
+            pass
+
+
+def create_upload(size, marketplace=None, sha256=None):
+    """Start an upload of ``size`` bytes and return it; raises ValueError on bad parameters."""
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise ValueError("size (the file size in bytes) is required") from None
+    max_bytes = getattr(settings, "LABEL_CHUNKED_MAX_BYTES", None) or DEFAULT_MAX_BYTES
+    if not 0 < size <= max_bytes:
+        raise ValueError(f"size must be between 1 and {max_bytes} bytes")
+    marketplace = (marketplace or "").lower() or None
+    if marketplace is not None and marketplace not in MARKETPLACES:
+        raise ValueError(f"Unknown marketplace '{marketplace}', use one of: {', '.join(MARKETPLACES)}")
+    sha256 = (sha256 or "").lower() or None
+    if sha256 is not None and not SHA256.fullmatch(sha256):
+        raise ValueError("sha256 must be 64 hex digits")
+
+    _expire_uploads()
+    meta = {
+        "size": size,
+        "part_size": getattr(settings, "LABEL_CHUNKED_PART_BYTES", None) or DEFAULT_PART_BYTES,
+        "marketplace": marketplace,
+        "sha256": sha256,
+    }
+    upload = ChunkedUpload(uuid.uuid4().hex, meta)
+    # Uploads are readable by this user only
+    os.makedirs(upload_root(), mode=0o700, exist_ok=True)
+    os.mkdir(upload.directory, mode=0o700)
+    with open(upload.data_path, "wb") as data:
+        data.truncate(size)
+    upload._store(os.path.join(upload.directory, "meta.json"), meta)
+    return upload
+
+
+def get_upload(upload_id):
+    """Return the upload with this id, or None."""
+    if not UPLOAD_ID.fullmatch(upload_id):
+        return None
+    try:
+        with open(os.path.join(upload_root(), upload_id, "meta.json"), encoding="utf-8") as meta_file:
+            return ChunkedUpload(upload_id, json.load(meta_file))
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return None
+
+
+def page_reader(marketplace):
+    """The page reader ``marketplace``'s view uses (page text when it is not known yet)."""
+    if marketplace == "amazon":
+        from home.regions import read_regions, region_template
+
+        template = region_template("amazon")
+        return partial(read_regions, template=template) if template else page_text
+    if marketplace == "flipkart":
+        from home.flipkart import flipkart_parser
+
+        return page_words if flipkart_parser() == "layout" else page_text
+    return page_text
+
+
+def open_prefix(data):
+    """Open the first bytes of a PDF with only the pages whose page object is there, or return None."""
+    try:
+        doc = fitz.open(stream=data, filetype="pdf")
+        if doc.is_encrypted:
+            doc.close()
+            return None
+        root = doc.xref_get_key(doc.pdf_catalog(), "Pages")
+        if root[0] != "xref":
+            doc.close()
+            return None
+        root = int(root[1].split()[0])
+        pages = _present_pages(doc, root, {root})
+        doc.xref_set_key(root, "Kids", "[" + " ".join(f"{xref} 0 R" for xref in pages) + "]")
+        doc.xref_set_key(root, "Count", str(len(pages)))
+        return doc
+    except (fitz.FileDataError, RuntimeError, ValueError):
+        return None
+
+
+def _present_pages(doc, node, seen):
+    """Page objects under page tree ``node`` that are in the document, in order."""
+    pages = []
+    for reference in REFERENCE.findall(doc.xref_get_key(node, "Kids")[1]):
+        xref = int(reference)
+        if xref in seen or not 0 < xref < doc.xref_length():
+            continue
+        seen.add(xref)
+        kind = doc.xref_get_key(xref, "Type")[1]
+        if kind == "/Page":
+            pages.append(xref)
+        elif kind == "/Pages":
+            pages.extend(_present_pages(doc, xref, seen))
+    return pages
+
+
+def read_prefix(path, length, read_page, start=0):
+    """Read the pages from ``start`` on in the first ``length`` bytes of ``path``. Runs on the text pool.
+
+    Returns ``({page_digest: read_page(page)}, pages in the prefix)``.
+    """
+    # fitz.open(stream=...) of the pinned PyMuPDF only takes bytes: one copy of the prefix
+    with open(path, "rb") as data:
+        prefix = data.read(length)
+    # MuPDF's repair can choke on an object cut off halfway: end at the last whole one
+    end = prefix.rfind(b"endobj")
+    if end < 0:
+        return {}, 0
+    prefix = prefix[:end + len(b"endobj")]
+    # A cut-off file always needs repairing, and its last objects are cut
+    # off: that is not worth a message
+    display_errors = fitz.TOOLS.mupdf_display_errors()
+    fitz.TOOLS.mupdf_display_errors(False)
+    try:
+        doc = open_prefix(prefix)
+        if doc is None:
+            return {}, 0
+        results = {}
+        memo = {}
+        try:
+            for page_num in range(start, doc.page_count):
+                page = doc.load_page(page_num)
+                results[page_digest(doc, page, memo)] = read_page(page)
+            return results, doc.page_count
+        finally:
+            doc.close()
+    finally:
+        fitz.TOOLS.mupdf_display_errors(display_errors)
+        fitz.TOOLS.mupdf_warnings()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="label-chunked")
+        return _executor
+
+
+def read_ahead(upload):
+    """Read the pages of ``upload``'s received prefix in the background, unless that is already running."""
+    if not getattr(settings, "LABEL_CHUNKED_READ_AHEAD", True):
+        return
+    with _lock:
+        if upload.id in _running:
+            return
+        _running.add(upload.id)
+    try:
+        get_executor().submit(_read_ahead, upload.id)
+    except RuntimeError:
+        with _lock:
+            _running.discard(upload.id)
+
+
+def remove_when_sent(upload, response):
+    """Remove ``upload`` once ``response`` is done with its file (streamed responses read it as they go)."""
+    if getattr(response, "streaming", False):
+        response.streaming_content = _RemovedOnClose(response.streaming_content, upload)
+    else:
+        upload.remove()
+
+
+class _RemovedOnClose:
+    """Streamed content; the upload is removed on close, which Django calls whether it was iterated or not"""
+
+    def __init__(self, chunks, upload):
+        self.chunks = iter(chunks)
+        self.upload = upload
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.chunks)
+
+    def close(self):
+        self.upload.remove()
+
+
+def _read_ahead(upload_id):
+    try:
+        # Parts keep arriving while a prefix is read: go on until it stops growing
+        while True:
+            upload = get_upload(upload_id)
+            if upload is None:
+                return
+            prefix = upload.prefix_bytes()
+            state = upload.read_ahead()
+            # The whole file is in: completing it reads the rest. Until
+            # then, wait for the prefix to grow enough to be worth reopening
+            if prefix >= upload.size or prefix <= state["bytes"] * READ_AHEAD_GROWTH:
+                return
+            reader = page_reader(upload.marketplace)
+            key = reader_key(reader)
+            start = state["next_page"] if state["reader"] == key else 0
+            read = None
+            if text_workers() > 1:
+                try:
+                    read = get_pool().submit(read_prefix, upload.data_path, prefix, reader, start).result()
+                except (OSError, BrokenProcessPool, NotImplementedError, RuntimeError):
+                    reset_pool()
+            if read is None:
+                read = read_prefix(upload.data_path, prefix, reader, start)
+            results, page_count = read
+            # The last page found is read again next time: its objects may not all have been in
+            upload.save_known_pages(key, results, prefix, page_count, max(start, page_count - 1))
+            logger.debug("Read %d pages ahead from the first %d bytes of upload %s", len(results), prefix, upload_id)
+    except Exception:
+        logger.exception("Reading ahead in upload %s failed", upload_id)
+    finally:
+        with _lock:
+            _running.discard(upload_id)
@@ -0,0 +1,135 @@
+"""Build tables column by column instead of row dict by row dict.
+
+A ``ColumnarBatch`` takes records (or dicts) and appends each value straight
+to its column. Every column is dictionary encoded while it is filled: a
+value seen before (an Amazon order id, buyer or address repeated on every
+product row of its invoice, a courier name, a date, a tax rate, ...) costs
+one int32 code. Dates, amounts and quantities are typed like the CSV/Parquet
+exports, but once per distinct value instead of once per cell, and the table
+builders hand the codes to Arrow or pandas as they are, with no per-row dict
+and no type inference.
+"""
+from array import array
+
+from home.export import FIELD_TYPES, normalize_value
+from home.records import LabelRecord, column_getter
+
+
+# A text column is handed out dictionary encoded when at most this share of
+# its values are distinct
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def arrow_type(kind):
+    import pyarrow as pa
+
+    return {"date": pa.date32(), "int": pa.int64(), "amount": pa.float64()}.get(kind, pa.string())
+
+
+def arrow_schema(columns):
+    """Return the ``pyarrow.Schema`` the typed exports use for ``columns``."""
+    import pyarrow as pa
+
+    return pa.schema([(column, arrow_type(FIELD_TYPES.get(column))) for column in columns])
+
+
+class ColumnarBatch:
+    """Rows stored as one code array plus its distinct values per column"""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.kinds = {column: FIELD_TYPES.get(column) for column in self.columns}
+        self._codes = {column: array("i") for column in self.columns}
+        self._values = {column: [] for column in self.columns}
+        self._index = {column: {} for column in self.columns}
+        self._getters = {}
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def _row_getters(self, row):
+        """Return one value getter per column, resolved once per marketplace."""
+        if isinstance(row, LabelRecord):
+            getters = self._getters.get(row.marketplace)
+            if getters is None:
+                getters = self._getters[row.marketplace] = [
+                    column_getter(row.marketplace, column) for column in self.columns
+                ]
+            return getters
+        return [lambda row, column=column: row.get(column, "") for column in self.columns]
+
+    def append(self, row):
+        """Add one record (a ``LabelRecord`` or anything with ``.get(column)``)."""
+        for column, getter in zip(self.columns, self._row_getters(row)):
+            value = getter(row)
+            if value is None:
+                value = ""
+            index = self._index[column]
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(index)
+                self._values[column].append(value)
+            self._codes[column].append(code)
+        self._length += 1
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+        return self
+
+    def distinct(self, column):
+        """Return the distinct (raw) values of a column, in first-seen order."""
+        return self._values[column]
+
+    def is_repetitive(self, column):
+        return len(self._values[column]) <= DICTIONARY_MAX_RATIO * self._length
+
+    def _dictionary(self, column):
+        """Return the distinct values of ``column`` typed as the exports type them."""
+        if self.kinds[column]:
+            return [normalize_value(column, value) for value in self._values[column]]
+        return self._values[column]
+
+    def _codes_array(self, column):
+        import numpy as np
+
+        return np.frombuffer(self._codes[column], dtype=np.int32)
+
+    def to_arrow(self, schema=None):
+        """Return a ``pyarrow.Table``.
+
+        With a ``schema``, text columns are plain strings of the schema's
+        type (what a Parquet writer with a fixed schema needs); without one,
+        repetitive text columns stay dictionary encoded.
+        """
+        import pyarrow as pa
+
+        arrays = []
+        for column in self.columns:
+            codes = pa.array(self._codes_array(column))
+            dictionary = pa.array(self._dictionary(column), type=arrow_type(self.kinds[column]))
+            if schema is None and not self.kinds[column] and self.is_repetitive(column):
+                arrays.append(pa.DictionaryArray.from_arrays(codes, dictionary))
+            else:
+                arrays.append(dictionary.take(codes))
+        if schema is not None:
+            return pa.Table.from_arrays(arrays, schema=schema)
+        return pa.Table.from_arrays(arrays, names=self.columns)
+
+    def to_pandas(self):
+        """Return a ``pandas.DataFrame``; repetitive text columns become categoricals."""
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for column in self.columns:
+            codes = self._codes_array(column)
+            if self.kinds[column]:
+                # Let pandas pick the dtype once, from the distinct values
+                data[column] = pd.Series(self._dictionary(column)).take(codes).to_numpy()
+            elif self.is_repetitive(column):
+                data[column] = pd.Categorical.from_codes(codes, categories=pd.Index(self._values[column], dtype=object))
+            else:
+                data[column] = np.array(self._values[column], dtype=object)[codes]
+        return pd.DataFrame(data, columns=self.columns)
@@ -0,0 +1,100 @@
+"""Single-scan pickup courier detection.
+
+The courier names are loaded into a trie once; the trie is compiled into one
+regex that finds every position where some courier name starts, so a block is
+scanned once no matter how many couriers are configured. Couriers are
+configurable per marketplace through ``settings.LABEL_COURIERS``.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+
+
+# Listed in priority order: when several couriers appear on a label, the
+# first one in the list wins.
+DEFAULT_COURIERS = {
+    "meesho": [
+        "Delhivery", "XpressBees", "Xpress Bees", "Ecom Express", "Shadowfax",
+        "BlueDart", "Blue Dart", "Ekart", "Valmo", "DTDC", "Amazon Transportation",
+        "Wow Express", "FedEx", "DHL", "Shiprocket", "Pickrr", "Aramex", "Gati",
+        "Professional Couriers", "DTDC Express", "India Post", "Speed Post"
+    ],
+    "myntra": ["Delhivery", "XpressBees", "Ekart", "Ecom Express", "Shadowfax", "DTDC", "Blue Dart"],
+}
+
+_END = ""
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+def _trie_regex(node):
+    """Turn a trie into a regex that matches any of its words."""
+    alternatives = [re.escape(char) + _trie_regex(child) for char, child in sorted(node.items()) if char != _END]
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+    if _END in node:
+        body = "(?:" + body + ")?"
+    return body
+
+
+class CourierMatcher:
+    """Find the highest-priority courier named in a text in one scan."""
+
+    def __init__(self, couriers):
+        self.couriers = list(couriers)
+        self.trie = {}
+        for priority, courier in enumerate(self.couriers):
+            node = self.trie
+            for char in courier.lower():
+                node = node.setdefault(char, {})
+            node.setdefault(_END, priority)
+
+        first_chars = "".join(re.escape(char) for char in sorted(self.trie))
+        # Zero-width, so overlapping names ("DTDC" / "DTDC Express") are all seen
+        self.starts = re.compile(
+            rf"(?=[{first_chars}])(?=\b{_trie_regex(self.trie)}\b)", re.IGNORECASE
+        ) if self.trie else None
+
+    def _names_at(self, text, start):
+        """Yield the priority of every courier name matching at ``start``."""
+        node = self.trie
+        for index in range(start, len(text) + 1):
+            if _END in node and (index == len(text) or not _is_word_char(text[index])):
+                yield node[_END]
+            if index == len(text):
+                break
+            node = node.get(text[index].lower())
+            if node is None:
+                break
+
+    def find(self, text):
+        """Return the first-priority courier in ``text``, or ""."""
+        if self.starts is None:
+            return ""
+        best = None
+        for match in self.starts.finditer(text):
+            for priority in self._names_at(text, match.start()):
+                if best is None or priority < best:
+                    best = priority
+            if best == 0:
+                break
+        return "" if best is None else self.couriers[best]
+
+
+@lru_cache(maxsize=None)
+def _matcher(couriers):
+    return CourierMatcher(couriers)
+
+
+def configured_couriers(marketplace):
+    """Return a marketplace's couriers from ``LABEL_COURIERS``, else its defaults."""
+    return tuple(getattr(settings, "LABEL_COURIERS", {}).get(marketplace, DEFAULT_COURIERS.get(marketplace, [])))
+
+
+def get_courier_matcher(marketplace):
+    """Return the (cached) matcher for a marketplace's configured couriers."""
+    return _matcher(configured_couriers(marketplace))
@@ -0,0 +1,78 @@
+"""Tell which marketplace a label PDF comes from, by its first page.
+
+Every marketplace has a few fingerprints (phrases or ids that its labels
+print). The first page's text is scored against all of them and the best
+scoring marketplace wins, so picking the parser costs one page of text
+extraction instead of a full parse with the wrong one.
+"""
+import re
+
+from home import patterns
+from home.uploads import PdfSource
+
+
+MARKETPLACES = ("meesho", "myntra", "flipkart", "amazon")
+
+# Only the start of the first page is scored
+DETECT_MAX_CHARS = 8192
+
+# A marketplace needs at least this score to be picked
+MIN_SCORE = 3
+
+# (marketplace, fingerprint, weight)
+FINGERPRINTS = [
+    ("meesho", re.compile(r"Customer Address"), 2),
+    ("meesho", re.compile(r"If undelivered, return to", re.IGNORECASE), 2),
+    ("meesho", re.compile(r"Product Details"), 1),
+    ("meesho", re.compile(r"\bmeesho\b", re.IGNORECASE), 3),
+    ("myntra", re.compile(r"Customer Address"), 2),
+    ("myntra", re.compile(r"\bmyntra\b", re.IGNORECASE), 4),
+    ("flipkart", patterns.FLIPKART_ORDER_ID_SPLIT, 4),
+    ("flipkart", re.compile(r"Shipping/Customer address", re.IGNORECASE), 3),
+    ("flipkart", re.compile(r"\bflipkart\b", re.IGNORECASE), 2),
+    ("amazon", patterns.AMAZON_ORDER_NUMBER, 5),
+    ("amazon", re.compile(r"Tax Invoice/Bill of Supply", re.IGNORECASE), 2),
+    ("amazon", re.compile(r"\bamazon\b", re.IGNORECASE), 1),
+]
+
+
+def score_marketplaces(text):
+    """Return ``{marketplace: score}`` for ``text``."""
+    text = text[:DETECT_MAX_CHARS]
+    scores = dict.fromkeys(MARKETPLACES, 0)
+    for marketplace, fingerprint, weight in FINGERPRINTS:
+        if fingerprint.search(text):
+            scores[marketplace] += weight
+    return scores
+
+
+def detect_text_marketplace(text):
+    """Return the best scoring marketplace for ``text``, or None when nothing is convincing."""
+    scores = score_marketplaces(text)
+    best = max(MARKETPLACES, key=scores.get)
+    ranked = sorted(scores.values(), reverse=True)
+    if ranked[0] < MIN_SCORE or ranked[0] == ranked[1]:
+        return None
+    return best
+
+
+def detect_marketplace(page_texts):
+    """Return the marketplace of a document from its page texts (only the first is needed), or None."""
+    return detect_text_marketplace(page_texts[0]) if page_texts else None
+
+
+def detect_pdf_marketplace(doc):
+    """Return the marketplace of an open ``fitz`` document, reading only its first page."""
+    if doc.page_count == 0:
+        return None
+    return detect_text_marketplace(doc.load_page(0).get_text())
+
+
+def detect_upload_marketplace(uploaded_file):
+    """Return the marketplace of an uploaded PDF, read in place, and rewind the upload for the parser."""
+    doc = PdfSource.from_upload(uploaded_file).open()
+    try:
+        return detect_pdf_marketplace(doc)
+    finally:
+        doc.close()
+        uploaded_file.seek(0)
@@ -0,0 +1,257 @@
+"""Write extracted label rows to download files as they are produced.
+
+Rows are streamed straight from the extractors into the output, so the full
+row set never exists as a DataFrame or as openpyxl cell objects. Excel keeps
+the values exactly as printed on the labels; the CSV, JSON Lines and Parquet
+outputs normalize dates to ISO format and amounts/quantities to numbers so
+downstream jobs can load them with types.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import tempfile
+from datetime import date
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+
+EXPORT_FORMATS = ("xlsx", "csv", "parquet", "jsonl")
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Column name -> value type, for every marketplace's columns. Columns that are
+# not listed stay strings.
+FIELD_TYPES = {
+    "Order Date": "date",
+    "Invoice Date": "date",
+    "Print Data": "date",
+    "Qty": "int",
+    "QTY": "int",
+    "SI No": "int",
+    "Unit Price": "amount",
+    "Discount": "amount",
+    "Net Amount": "amount",
+    "Tax Amount": "amount",
+    "Total Amount": "amount",
+    "Weight": "amount",
+    "Tax Rate": "amount",
+}
+
+DATE_VALUE = re.compile(r"^\s*(\d{1,2})[./-](\d{1,2})[./-](\d{2}|\d{4})\s*$")
+AMOUNT_NOISE = re.compile(r"[₹,%\s]")
+
+PARQUET_BATCH_ROWS = 10000
+
+
+def requested_export_format(request):
+    """Return the ``format`` asked for in the form or query string (default xlsx)."""
+    export_format = (request.POST.get("format") or request.GET.get("format") or "xlsx").lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format '{export_format}', use one of: {', '.join(EXPORT_FORMATS)}")
+    return export_format
+
+
+def write_xlsx(rows, columns, path, sheet_title="Sheet1"):
+    """Write ``rows`` (dicts) to an .xlsx file at ``path`` in ``columns`` order.
+
+    Missing keys are written as "". Returns the number of rows written.
+    """
+    return write_xlsx_sheets([(sheet_title, columns, rows)], path)
+
+
+def write_xlsx_sheets(sheets, path):
+    """Write one sheet per ``(title, columns, rows)`` to an .xlsx file at ``path``.
+
+    Returns the number of rows written over all sheets.
+    """
+    workbook = Workbook(write_only=True)
+    count = 0
+    try:
+        for sheet_title, columns, rows in sheets:
+            sheet = workbook.create_sheet(sheet_title)
+            sheet.append(columns)
+            for row in rows:
+                sheet.append([row.get(column, "") for column in columns])
+                count += 1
+        workbook.save(path)
+    except Exception:
+        workbook.close()
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return count
+
+
+def parse_date(value):
+    """Parse a day-first label date ("11.07.2025", "11/07/25", ...) or return None."""
+    match = DATE_VALUE.match(value or "")
+    if not match:
+        return None
+    day, month, year = (int(part) for part in match.groups())
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_number(value, kind):
+    """Parse "₹1,299.00" / "18%" / "2" into a float or int, or return None."""
+    cleaned = AMOUNT_NOISE.sub("", value or "")
+    if not cleaned:
+        return None
+    try:
+        return int(cleaned) if kind == "int" else float(cleaned)
+    except ValueError:
+        return None
+
+
+def normalize_value(column, value):
+    kind = FIELD_TYPES.get(column)
+    if kind == "date":
+        return parse_date(value)
+    if kind in ("int", "amount"):
+        return parse_number(value, kind)
+    return value if value is not None else ""
+
+
+def normalize_row(row, columns):
+    """Return the typed values of ``row`` in ``columns`` order."""
+    return [normalize_value(column, row.get(column, "")) for column in columns]
+
+
+def iter_csv(rows, columns):
+    """Yield CSV bytes: the header, then one chunk per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(columns)
+    yield flush()
+    for row in rows:
+        writer.writerow(["" if value is None else value.isoformat() if isinstance(value, date) else value
+                         for value in normalize_row(row, columns)])
+        yield flush()
+
+
+def iter_jsonl(rows, columns):
+    """Yield one JSON object per row, newline terminated."""
+    for row in rows:
+        values = normalize_row(row, columns)
+        record = {column: value.isoformat() if isinstance(value, date) else value
+                  for column, value in zip(columns, values)}
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def write_parquet(rows, columns, path):
+    """Write typed ``rows`` to a Parquet file in batches. Returns the row count."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError("Parquet export needs the pyarrow package installed") from exc
+    from home.columnar import ColumnarBatch, arrow_schema
+
+    schema = arrow_schema(columns)
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = ColumnarBatch(columns)
+        for row in rows:
+            batch.append(row)
+            if len(batch) == PARQUET_BATCH_ROWS:
+                writer.write_table(batch.to_arrow(schema))
+                count += len(batch)
+                batch = ColumnarBatch(columns)
+        if len(batch) or not count:
+            # An empty file still gets the schema
+            writer.write_table(batch.to_arrow(schema))
+            count += len(batch)
+    return count
+
+
+def write_export(rows, columns, export_format, path):
+    """Write ``rows`` to ``path`` in any export format. Returns the row count."""
+    if export_format == "xlsx":
+        return write_xlsx(rows, columns, path)
+    if export_format == "parquet":
+        return write_parquet(rows, columns, path)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    chunks = iter_csv(counted(), columns) if export_format == "csv" else iter_jsonl(counted(), columns)
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return count
+
+
+def remove_file(path):
+    """Delete ``path`` if it is still there."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _stream(chunks, on_close):
+    try:
+        yield from chunks
+    finally:
+        if on_close:
+            on_close()
+
+
+def export_response(rows, columns, export_format, basename, on_close=None):
+    """Serve ``rows`` as csv, jsonl or parquet.
+
+    CSV and JSON Lines are streamed, so the first bytes leave before
+    extraction finishes. Returns None when there are no rows. ``on_close``
+    is called exactly once, when the response (or the empty result) is done
+    with the upload.
+    """
+    try:
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            if on_close:
+                on_close()
+            return None
+        rows = itertools.chain([first], rows)
+
+        if export_format == "parquet":
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".parquet") as tmp_file:
+                path = tmp_file.name
+            try:
+                write_parquet(rows, columns, path)
+            except Exception:
+                os.remove(path)
+                raise
+            if on_close:
+                on_close()
+            return FileResponse(open(path, "rb"), as_attachment=True, filename=f"{basename}.parquet",
+                                content_type=CONTENT_TYPES["parquet"])
+    except Exception:
+        if on_close:
+            on_close()
+        raise
+
+    chunks = iter_csv(rows, columns) if export_format == "csv" else iter_jsonl(rows, columns)
+    response = StreamingHttpResponse(_stream(chunks, on_close), content_type=CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{basename}.{export_format}"'
+    return response
@@ -1,12 +1,36 @@
 from django.shortcuts import render
 from django.core.files.storage import default_storage
 import fitz
-import pandas as pd
+import itertools
 import re
 import os
 import tempfile 
+import logging
 from datetime import datetime
-from django.http import FileResponse
+from django.conf import settings
+from django.http import FileResponse, JsonResponse
+from home import instrument, layout, patterns, regexguard
+from home.blocks import iter_pattern_blocks
+from home.export import export_response, requested_export_format, write_xlsx
+from home.pagecache import PageReuse, iter_cached_units
+from home.jobs import requested_job_mode, submit_job
+from home.resultcache import cached_rows
+from home.instrument import ExtractionSummary
+from home.timing import StageTimer
+from home.records import LabelRecord
+from home.pdftext import iter_page_texts, iter_page_words
+from home.uploads import PdfSource
+
+# Bump whenever a change here alters the extracted rows: it invalidates
+# the result cache entries written by older code
+EXTRACTOR_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+FLIPKART_COLUMNS = [
+    "Order ID", "SKU ID", "Description", "QTY", "Print Data", "Pickup Partner",
+    "HBD", "CPD", "AWB No.", "GSTIN", "Shipping/Customer address", "Pincode"
+]
 
 def flipkartindex(request):
     message = None
@@ -14,163 +38,352 @@ def flipkartindex(request):
 
     if request.method == "POST" and request.FILES.get("pdf_file"):
         uploaded_file = request.FILES["pdf_file"]
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-            for chunk in uploaded_file.chunks():
-                tmp_file.write(chunk)
-            tmp_file.flush()
-            file_path = tmp_file.name    
+        source = PdfSource.from_upload(uploaded_file)
         try:
-            doc = fitz.open(file_path)
-            full_text = ""
-            for page in doc:
-                full_text += page.get_text("text") + "\n"
-            doc.close()
-
-            split_pattern = r"(OD\d{17,20})"
-            parts = re.split(split_pattern, full_text)
-            extracted_labels = []
-
-            for i in range(1, len(parts), 2):
-                current_order_id = parts[i].strip()
-                current_block_content = parts[i+1].strip() if (i+1) < len(parts) else ""
-                block = current_order_id + "\n" + current_block_content
-
-                order_id = current_order_id
-                sku_id = ""
-                description = ""
-                qty = ""
-                pickup_partner = "Ekart Logistics"
-                hbd = ""
-                cpd = ""
-                awb_no = ""
-                gstin = ""
-                customer_address = ""
-                pincode = ""
-                print_data = ""
-
-                # SKU and Description
-                sku_desc_match = re.search(r"SKU ID\s*\|\s*(.+?)\s*\|\s*(.+?)(?:\n|$|\s{2,})", block, re.DOTALL | re.IGNORECASE)
-                if sku_desc_match:
-                    sku_id = sku_desc_match.group(1).strip()
-                    sku_id = re.sub(r"(?i)description\s*QTY\s*\d+\s*", "", sku_id).strip()
-                    sku_id = re.sub(r"(?i)QTY\s*\d+\s*", "", sku_id).strip()
-                    description = sku_desc_match.group(2).strip().replace("\n", " ")
-                else:
-                    sku_id_match = re.search(r"SKU ID\s*[:=]\s*(.+?)(?:\||\n|\r|\s{2,})", block, re.IGNORECASE)
-                    if sku_id_match:
-                        sku_id = sku_id_match.group(1).strip()
-                        sku_id = re.sub(r"(?i)description\s*QTY\s*\d+\s*", "", sku_id).strip()
-                        sku_id = re.sub(r"(?i)QTY\s*\d+\s*", "", sku_id).strip()
-
-                    desc_match = re.search(r"(?:Description\s*[:=]?\s*|SKU ID\s*\|\s*.+?\|\s*)(.+?)(?=\n\s*QTY|\n\s*FMPC|\n\s*FMPP|\n\s*Tax|\n\s*Order\s*Id:|\n\s*AWB\s*No\.?|\n\s*HBD:|\n\s*CPD:|$)", block, re.DOTALL | re.IGNORECASE)
-                    if desc_match:
-                        description = desc_match.group(1).strip().replace("\n", " ")
-                        if sku_id and description.startswith(sku_id):
-                            description = description[len(sku_id):].strip()
-                            if description.startswith('|'):
-                                description = description[1:].strip()
-
-                qty_match = re.search(r"QTY\s*(\d+)", block, re.IGNORECASE)
-                if qty_match:
-                    qty = qty_match.group(1).strip()
-
-                hbd_match = re.search(r"HBD:\s*(\d{2}\s*-\s*\d{2})", block, re.IGNORECASE)
-                if hbd_match:
-                    hbd = hbd_match.group(1).replace(" ", "").strip()
-
-                cpd_match = re.search(r"CPD:\s*(\d{2}\s*-\s*\d{2})", block, re.IGNORECASE)
-                if cpd_match:
-                    cpd = cpd_match.group(1).replace(" ", "").strip()
-
-                awb_match = re.search(r"AWB\s*No\.?\s*([A-Z0-9]+)", block, re.IGNORECASE)
-                if awb_match:
-                    awb_no = awb_match.group(1).strip()
-
-                gstin_match = re.search(r"GSTIN:\s*([A-Z0-9]+)", block, re.IGNORECASE)
-                if gstin_match:
-                    gstin = gstin_match.group(1).strip()
-
-                printed_match = re.search(r"Printed at\s+\d{3,4}\s*hrs,\s*(\d{2}/\d{2}/\d{2})", block, re.IGNORECASE)
-                if printed_match:
-                    print_data = printed_match.group(1).strip()
-
-                address_start_pattern = r"Shipping/Customer address:\s*Name:\s*(.+?)\n"
-                address_end_patterns = r"(?:HBD:|Sold By:|GSTIN:)"
-                address_block_match = re.search(f"{address_start_pattern}(.*?)(?={address_end_patterns})", block, re.DOTALL | re.IGNORECASE)
-
-                if address_block_match:
-                    name = address_block_match.group(1).strip()
-                    address_lines_raw = address_block_match.group(2).strip()
-                    cleaned_address_lines = [line.strip() for line in address_lines_raw.split('\n') if line.strip()]
-                    full_address = f"{name}, " + ", ".join(cleaned_address_lines)
-
-                    pincode_match = re.search(r"(.*?\b(\d{6})\b)", full_address)
-                    if pincode_match:
-                        customer_address = pincode_match.group(1).strip()
-                        pincode = pincode_match.group(2)
-                    else:
-                        customer_address = full_address.strip()
-                else:
-                    simple_address_match = re.search(r"Shipping/Customer address:\s*Name:\s*(.+?)(?=\n\n|\n\s*HBD:|\n\s*Sold By:|\n\s*GSTIN:)", block, re.DOTALL | re.IGNORECASE)
-                    if simple_address_match:
-                        full_address = simple_address_match.group(1).strip().replace("\n", ", ")
-                        pincode_match = re.search(r"(.*?\b(\d{6})\b)", full_address)
-                        if pincode_match:
-                            customer_address = pincode_match.group(1).strip()
-                            pincode = pincode_match.group(2)
-                        else:
-                            customer_address = full_address.strip()
-
-                if order_id or sku_id:
-                    extracted_labels.append({
-                        "Order ID": order_id,
-                        "SKU ID": sku_id,
-                        "Description": description,
-                        "QTY": qty,
-                        "Print Data": print_data,
-                        "Pickup Partner": pickup_partner,
-                        "HBD": hbd,
-                        "CPD": cpd,
-                        "AWB No.": awb_no,
-                        "GSTIN": gstin,
-                        "Shipping/Customer address": customer_address,
-                        "Pincode": pincode
-                    })
-
-            df = pd.DataFrame(extracted_labels)
-
-            if df.empty:
+            export_format = requested_export_format(request)
+            # Repeat uploads of the same PDF are answered from the result cache
+            # and new pages of an overlapping manifest are the only ones parsed
+            page_reuse = PageReuse()
+            summary = ExtractionSummary("flipkart")
+            # Server-Timing: time per stage (home/timing.py)
+            timer = StageTimer("flipkart")
+            if flipkart_parser() == "layout":
+                rows = cached_rows(source, "flipkart", f"{EXTRACTOR_VERSION}-layout",
+                                   lambda source: iter_flipkart_labels_layout_cached(
+                                       summary.read(timer.iter(iter_page_words(source), "text")), page_reuse))
+            else:
+                rows = cached_rows(source, "flipkart", EXTRACTOR_VERSION,
+                                   lambda source: iter_flipkart_labels_cached(
+                                       summary.read(timer.iter(iter_page_texts(source), "text")), page_reuse))
+            rows = timer.iter(summary.track(rows, FLIPKART_COLUMNS), "parse")
+            if requested_job_mode(request):
+                # Big uploads: extract in the background and answer with a job id right away
+                source.detach()
+                job = submit_job("flipkart", rows, FLIPKART_COLUMNS, export_format, "flipkart_labels")
+                return JsonResponse(job.as_dict(), status=202)
+            if export_format != "xlsx":
+                # CSV / JSONL rows go out as the pages are parsed
+                response = export_response(rows, FLIPKART_COLUMNS, export_format, "flipkart_labels",
+                                           on_close=lambda: timer.write_profile(summary))
+                if response is not None:
+                    return timer.add_header(response)
                 message = "\u274c PDF se koi label data nahi nikala gaya."
+
             else:
-                columns_order = [
-                    "Order ID", "SKU ID", "Description", "QTY", "Print Data", "Pickup Partner",
-                    "HBD", "CPD", "AWB No.", "GSTIN", "Shipping/Customer address", "Pincode"
-                ]
-                df = df.reindex(columns=columns_order, fill_value="")
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_filename = "flipkart_labels_" + timestamp + ".xlsx"
-                output_filename = f"flipkart_labels_{timestamp}.xlsx"
                 with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_excel:
-                    df.to_excel(tmp_excel.name, index=False)
-                    tmp_excel.flush()
                     output_path = tmp_excel.name
-                
-                message = f"\u2705 {len(df)} labels extracted and saved to: /{output_path}"
-                extracted_data_for_display = df.to_dict(orient='records')
-                response = FileResponse(open(output_path, 'rb'), as_attachment=True, filename=os.path.basename(output_path))
-                return response
+                with timer.stage("export"):
+                    label_count = write_xlsx(rows, FLIPKART_COLUMNS, output_path)
+                timer.write_profile(summary)
+
+                if not label_count:
+                    os.remove(output_path)
+                    message = "\u274c PDF se koi label data nahi nikala gaya."
+                else:
+                    message = f"\u2705 {label_count} labels extracted and saved to: /{output_path}"
+                    response = FileResponse(open(output_path, 'rb'), as_attachment=True, filename=os.path.basename(output_path))
+                    if page_reuse.pages:
+                        logger.info("\u267b\ufe0f %s pages reused from the page cache", page_reuse)
+                        response["X-Pages-Reused"] = str(page_reuse)
+                    return timer.add_header(response)
 
         except fitz.FileDataError:
             message = "\u274c Invalid or corrupted PDF file."
         except Exception as e:
             message = f"\u274c Unexpected error: {str(e)}"
-        finally:
-            try:
-                if os.path.exists(file_path):
-                    os.unlink(file_path)
-            except:
-                pass
     return render(request, "upload_file.html", {
         "message": message,
         "extracted_data": extracted_data_for_display
     })
+
+
+def iter_flipkart_labels(page_texts):
+    """Yield one extracted row per "OD..." order id block"""
+    pages = (text + "\n" for text in page_texts)
+    for order_id, content in iter_pattern_blocks(pages, patterns.FLIPKART_ORDER_ID_SPLIT):
+        label = extract_flipkart_label(order_id, content)
+        if label:
+            yield label
+
+
+def iter_flipkart_page_units(page_texts):
+    """Yield, for every page with an order id, the texts its labels are parsed from
+
+    That is the page itself plus the following text up to the next order id,
+    since the last label on a page runs on until then. Text before the first
+    order id of a page belongs to the previous page's unit.
+    """
+    pending = None
+    for text in page_texts:
+        match = patterns.FLIPKART_ORDER_ID_SPLIT.search(text)
+        if pending is not None:
+            pending.append(text if match is None else text[:match.start()])
+        if match is None:
+            continue
+        if pending is not None:
+            yield tuple(pending)
+        pending = [text]
+    if pending is not None:
+        yield tuple(pending)
+
+
+def iter_flipkart_labels_cached(page_texts, report=None):
+    """Same rows as ``iter_flipkart_labels``; pages seen in an earlier upload are not parsed again"""
+    return iter_cached_units(iter_flipkart_page_units(page_texts), "flipkart", EXTRACTOR_VERSION,
+                             lambda unit: list(iter_flipkart_labels(unit)), report)
+
+
+@instrument.block_parser
+@regexguard.budgeted
+def extract_flipkart_label(order_id, content):
+    """Extract every field of the label block that starts at ``order_id``"""
+    order_id = order_id.strip()
+    block = order_id + "\n" + content.strip()
+    sku_id = ""
+    description = ""
+    qty = ""
+    pickup_partner = "Ekart Logistics"
+    hbd = ""
+    cpd = ""
+    awb_no = ""
+    gstin = ""
+    customer_address = ""
+    pincode = ""
+    print_data = ""
+
+    # SKU and Description
+    sku_desc_match = regexguard.search("flipkart.sku_description", patterns.FLIPKART_SKU_DESC, block)
+    if sku_desc_match:
+        sku_id = sku_desc_match.group(1).strip()
+        sku_id = patterns.FLIPKART_SKU_DESC_QTY_NOISE.sub("", sku_id).strip()
+        sku_id = patterns.FLIPKART_SKU_QTY_NOISE.sub("", sku_id).strip()
+        description = sku_desc_match.group(2).strip().replace("\n", " ")
+    else:
+        sku_id_match = patterns.FLIPKART_SKU_ID.search(block)
+        if sku_id_match:
+            sku_id = sku_id_match.group(1).strip()
+            sku_id = patterns.FLIPKART_SKU_DESC_QTY_NOISE.sub("", sku_id).strip()
+            sku_id = patterns.FLIPKART_SKU_QTY_NOISE.sub("", sku_id).strip()
+
+        desc_match = regexguard.search("flipkart.description", patterns.FLIPKART_DESCRIPTION, block)
+        if desc_match:
+            description = desc_match.group(1).strip().replace("\n", " ")
+            if sku_id and description.startswith(sku_id):
+                description = description[len(sku_id):].strip()
+                if description.startswith('|'):
+                    description = description[1:].strip()
+
+    qty_match = patterns.FLIPKART_QTY.search(block)
+    if qty_match:
+        qty = qty_match.group(1).strip()
+
+    hbd_match = patterns.FLIPKART_HBD.search(block)
+    if hbd_match:
+        hbd = hbd_match.group(1).replace(" ", "").strip()
+
+    cpd_match = patterns.FLIPKART_CPD.search(block)
+    if cpd_match:
+        cpd = cpd_match.group(1).replace(" ", "").strip()
+
+    awb_match = patterns.FLIPKART_AWB.search(block)
+    if awb_match:
+        awb_no = awb_match.group(1).strip()
+
+    gstin_match = patterns.FLIPKART_GSTIN.search(block)
+    if gstin_match:
+        gstin = gstin_match.group(1).strip()
+
+    printed_match = patterns.FLIPKART_PRINTED_AT.search(block)
+    if printed_match:
+        print_data = printed_match.group(1).strip()
+
+    address_block_match = regexguard.search("flipkart.address_block", patterns.FLIPKART_ADDRESS_BLOCK, block)
+
+    if address_block_match:
+        name = address_block_match.group(1).strip()
+        address_lines_raw = address_block_match.group(2).strip()
+        cleaned_address_lines = [line.strip() for line in address_lines_raw.split('\n') if line.strip()]
+        full_address = f"{name}, " + ", ".join(cleaned_address_lines)
+        customer_address, pincode = split_pincode(full_address)
+    else:
+        simple_address_match = regexguard.search("flipkart.address_simple", patterns.FLIPKART_ADDRESS_SIMPLE, block)
+        if simple_address_match:
+            full_address = simple_address_match.group(1).strip().replace("\n", ", ")
+            customer_address, pincode = split_pincode(full_address)
+
+    if order_id or sku_id:
+        return LabelRecord(
+            marketplace="flipkart",
+            order_id=order_id,
+            sku=sku_id,
+            description=description,
+            qty=qty,
+            awb=awb_no,
+            gstin=gstin,
+            courier=pickup_partner,
+            customer_address=customer_address,
+            pincode=pincode,
+            extras=(print_data, hbd, cpd),
+        )
+    return None
+
+
+def split_pincode(full_address):
+    """Return the address up to its pincode and the pincode ("" when there is none)"""
+    pincode_match = patterns.PINCODE_PREFIX.search(full_address)
+    if pincode_match:
+        return pincode_match.group(1).strip(), pincode_match.group(2)
+    return full_address.strip(), ""
+
+
+# ----------------- Layout parser -----------------
+# Reads the label from word positions (page.get_text("words")) rather than
+# the page text: the fields are found on their own rows and columns, so no
+# pattern ever runs across the whole block.
+
+# Words this far (in points) left of the QTY header still belong to its column
+QTY_COLUMN_SLACK = 15
+# A gap this wide (in points) between two words ends the address column
+ADDRESS_COLUMN_GAP = 24
+
+
+def flipkart_regions(rows):
+    """Split a page's rows into ``(order id, rows)``, one per distinct order id.
+
+    A repeated order id (the invoice half of an A4 label prints it again)
+    is the same label; each new one starts the next label at its row.
+    """
+    starts = []
+    seen = set()
+    for index, row in enumerate(rows):
+        if "OD" not in row.text:
+            continue
+        for word in row.words:
+            match = patterns.FLIPKART_ORDER_ID.search(word[4])
+            if match and match.group(0) not in seen:
+                seen.add(match.group(0))
+                starts.append((index, match.group(0)))
+    regions = []
+    for number, (index, order_id) in enumerate(starts):
+        first = index if number else 0
+        last = starts[number + 1][0] if number + 1 < len(starts) else len(rows)
+        regions.append((order_id, rows[first:last]))
+    return regions
+
+
+def _first_group(pattern, text):
+    match = pattern.search(text)
+    return match.group(1).strip() if match else ""
+
+
+def read_sku_table(rows, header_index):
+    """Return ``(sku, description, qty)`` from the first row of the SKU table."""
+    header = rows[header_index]
+    qty_word = header.find("QTY")
+    qty_x = qty_word[0] - QTY_COLUMN_SLACK if qty_word else None
+    qty = ""
+    # "SKU ID | <sku> | <description>" may share the header row
+    cell = patterns.FLIPKART_TABLE_HEADER.split(header.text_between(None, qty_x), 1)[-1].strip()
+    if cell.lower().startswith("description"):
+        cell = ""
+    for row in rows[header_index + (0 if cell else 1):]:
+        if qty_x is not None and not qty:
+            qty = "".join(word[4] for word in row.words if word[0] >= qty_x and word[4].isdigit())
+        cell = cell or row.text_between(None, qty_x)
+        if cell:
+            break
+    sku_id, _, description = cell.partition("|")
+    return sku_id.strip(), description.strip(), qty
+
+
+def read_address(rows, anchor_index, end=None):
+    """Return ``(customer address, pincode)`` from the address column under its heading (up to row ``end``).
+
+    Returns None when no word of the anchor row starts the heading (its text
+    is glued to another word), as the column cannot be placed then.
+    """
+    anchor_row = rows[anchor_index]
+    heading = next((word for word in anchor_row.words if word[4].lower().startswith("shipping/customer")), None)
+    if heading is None:
+        return None
+    lines = (row.run_from(heading[0] - 2, ADDRESS_COLUMN_GAP) for row in rows[anchor_index:end])
+    first = patterns.FLIPKART_ADDRESS_ANCHOR.split(next(lines), 1)[-1]
+    lines = (line for line in itertools.chain([first], lines) if line)
+    first = next(lines, "")
+    name_match = patterns.FLIPKART_NAME.match(first)
+    if not name_match:
+        return "", ""
+    address_lines = [first[name_match.end():].strip()]
+    for line in lines:
+        stop = patterns.FLIPKART_ADDRESS_STOP.search(line)
+        if stop:
+            if line[:stop.start()].strip():
+                address_lines.append(line[:stop.start()].strip())
+            break
+        address_lines.append(line)
+    return split_pincode(", ".join(address_lines))
+
+
+@instrument.block_parser
+def extract_flipkart_label_layout(order_id, rows):
+    """Extract the label of ``order_id`` from its rows of words.
+
+    A label without the SKU table or the address heading is not one this
+    parser knows the layout of: it goes to the text parser instead.
+    """
+    text = "\n".join(row.text for row in rows)
+    header_index, _ = layout.find_row(rows, patterns.FLIPKART_TABLE_HEADER)
+    anchor_index, _ = layout.find_row(rows, patterns.FLIPKART_ADDRESS_ANCHOR)
+    if header_index is None or anchor_index is None:
+        return extract_flipkart_label(order_id, text)
+    address = read_address(rows, anchor_index, header_index if header_index > anchor_index else None)
+    if address is None:
+        return extract_flipkart_label(order_id, text)
+
+    sku_id, description, qty = read_sku_table(rows, header_index)
+    customer_address, pincode = address
+    # The "Label: value" fields are short single-line patterns, with nothing to backtrack over
+    return LabelRecord(
+        marketplace="flipkart",
+        order_id=order_id,
+        sku=sku_id,
+        description=description,
+        qty=qty or _first_group(patterns.FLIPKART_QTY, text),
+        awb=_first_group(patterns.FLIPKART_AWB, text),
+        gstin=_first_group(patterns.FLIPKART_GSTIN, text),
+        courier="Ekart Logistics",
+        customer_address=customer_address,
+        pincode=pincode,
+        extras=(
+            _first_group(patterns.FLIPKART_PRINTED_AT, text),
+            _first_group(patterns.FLIPKART_HBD, text).replace(" ", ""),
+            _first_group(patterns.FLIPKART_CPD, text).replace(" ", ""),
+        ),
+    )
+
+
+def extract_flipkart_page_layout(words):
+    """Return the labels on one page, from its ``pdftext.page_words``"""
+    labels = []
+    for order_id, rows in flipkart_regions(layout.page_rows(words)):
+        label = extract_flipkart_label_layout(order_id, rows)
+        if label:
+            labels.append(label)
+    return labels
+
+
+def iter_flipkart_labels_layout(page_words):
+    """Yield the labels of every page, read by the layout parser"""
+    for words in page_words:
+        yield from extract_flipkart_page_layout(words)
+
+
+def flipkart_parser():
+    """"text" (page text + regexes) or "layout" (word positions), from ``FLIPKART_PARSER``"""
+    return getattr(settings, "FLIPKART_PARSER", None) or "text"
+
+
+def iter_flipkart_labels_layout_cached(page_words, report=None):
+    """Same rows as ``iter_flipkart_labels_layout``; pages seen in an earlier upload are not parsed again"""
+    return iter_cached_units(page_words, "flipkart", f"{EXTRACTOR_VERSION}-layout", extract_flipkart_page_layout,
+                             report, unit_texts=lambda words: (repr(words),))
@@ -0,0 +1,151 @@
+"""Logging for the extraction hot paths.
+
+Every module logs through ``logging.getLogger(__name__)`` with %-style
+arguments, so a disabled level costs one ``isEnabledFor`` check and nothing
+is formatted. Levels are set per module in ``settings.LOGGING`` (``home``
+at INFO; ``home.meesho`` at DEBUG traces every AWB lookup).
+
+Block texts are never logged for every label any more. A parser that cannot
+find a field calls ``parse_failure``, which logs the field name at DEBUG and
+the block text of one failure in ``LABEL_LOG_FAILED_BLOCKS_EVERY``, at INFO.
+
+An ``ExtractionSummary`` counts the pages read, blocks parsed, rows and empty
+fields of one upload, and logs them as one JSON line on ``home.extraction``
+once the rows have been written (and records them in ``home.metrics``).
+"""
+import functools
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from home import metrics, regexguard
+from home.records import COLUMN_FIELDS
+
+
+summary_logger = logging.getLogger("home.extraction")
+
+DEFAULT_FAILED_BLOCKS_EVERY = 100
+DEFAULT_BLOCK_CHARS = 500
+
+_failures = itertools.count()
+_local = threading.local()
+
+
+def _fields(columns):
+    """The ``LabelRecord`` fields shown in ``columns``."""
+    return [COLUMN_FIELDS[column] for column in columns if column in COLUMN_FIELDS]
+
+
+def current_summary():
+    """The ``ExtractionSummary`` whose rows this thread is producing, if any."""
+    return getattr(_local, "summary", None)
+
+
+def block_parser(parse):
+    """Decorator: count every call of ``parse`` as one block of the current summary.
+
+    A block parser falling back to another one still counts one block.
+    """
+    @functools.wraps(parse)
+    def wrapper(*args, **kwargs):
+        summary = getattr(_local, "summary", None)
+        if summary is None or getattr(_local, "in_block", False):
+            return parse(*args, **kwargs)
+        summary.blocks += 1
+        _local.in_block = True
+        try:
+            return parse(*args, **kwargs)
+        finally:
+            _local.in_block = False
+    return wrapper
+
+
+def parse_failure(logger, field, block_text):
+    """Record that ``field`` was not found in a block, dumping a sample of such blocks."""
+    logger.debug("%s not found", field)
+    every = getattr(settings, "LABEL_LOG_FAILED_BLOCKS_EVERY", DEFAULT_FAILED_BLOCKS_EVERY)
+    if every and next(_failures) % every == 0 and logger.isEnabledFor(logging.INFO):
+        chars = getattr(settings, "LABEL_LOG_BLOCK_CHARS", DEFAULT_BLOCK_CHARS)
+        logger.info("%s not found (1 in %d failures logged), block text: %r", field, every, block_text[:chars])
+
+
+class ExtractionSummary:
+    """Pages, blocks, rows and empty fields of one extraction, logged as one line"""
+
+    def __init__(self, marketplace):
+        self.marketplace = marketplace
+        self.pages = 0
+        self.blocks = 0
+        self.rows = 0
+        self.missing = Counter()
+        self.given_up = 0
+        self.started = time.perf_counter()
+
+    def read(self, page_texts):
+        """Yield ``page_texts``, counting them."""
+        for text in page_texts:
+            self.pages += 1
+            yield text
+
+    def _count_row(self, row, fields):
+        self.rows += 1
+        for field in fields:
+            if not getattr(row, field):
+                self.missing[field] += 1
+
+    def count(self, rows, columns):
+        """Count ``rows`` and their empty ``columns``."""
+        fields = _fields(columns)
+        for row in rows:
+            self._count_row(row, fields)
+
+    def track(self, rows, columns):
+        """Yield ``rows``, counting them as they are produced; logs the summary when they run out.
+
+        The summary is the thread's current one while each row is produced,
+        so ``@block_parser`` functions called on the way count their blocks.
+        """
+        fields = _fields(columns)
+        warnings = regexguard.warning_count()
+        rows = iter(rows)
+        while True:
+            previous = getattr(_local, "summary", None)
+            _local.summary = self
+            try:
+                row = next(rows, None)
+            finally:
+                _local.summary = previous
+            if row is None:
+                break
+            self._count_row(row, fields)
+            yield row
+        self.given_up += regexguard.warning_count() - warnings
+        self.finish()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "marketplace": self.marketplace,
+            "pages": self.pages,
+            "blocks": self.blocks,
+            "rows": self.rows,
+            "fields_missing": dict(self.missing),
+            "fields_given_up": self.given_up,
+            "elapsed_ms": round(self.elapsed() * 1000, 1),
+        }
+
+    def finish(self):
+        """Record the extraction in ``/metrics`` and log its summary line."""
+        metrics.observe_extraction(self)
+        self.log()
+
+    def log(self):
+        if summary_logger.isEnabledFor(logging.INFO):
+            summary_logger.info("extraction %s", json.dumps(self.as_dict()))
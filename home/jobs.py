@@ -0,0 +1,132 @@
+"""Background extraction jobs for uploads too big to finish inside a request.
+
+A view called with ``mode=job`` hands its row generator to a local thread
+pool and answers at once with a job id; the client then polls
+``/jobs/<id>`` and fetches ``/jobs/<id>/download`` when the job is done.
+No broker is involved: jobs live in this process's memory and their output
+files in ``LABEL_JOB_DIR``, so on a serverless host (Vercel) every request
+must reach the same running instance for job mode to be usable.
+"""
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.urls import reverse
+
+from home.export import remove_file, write_export
+
+
+DEFAULT_WORKERS = 2
+DEFAULT_TTL_SECONDS = 3600
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+class Job:
+    """One extraction job and where its output ends up"""
+
+    def __init__(self, marketplace, export_format, filename):
+        self.id = uuid.uuid4().hex
+        self.marketplace = marketplace
+        self.format = export_format
+        self.filename = filename
+        self.output_path = os.path.join(job_dir(), f"{self.id}.{export_format}")
+        self.status = "queued"
+        self.rows = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "marketplace": self.marketplace,
+            "format": self.format,
+            "status": self.status,
+            "rows": self.rows,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "status_url": reverse("job-status", args=[self.id]),
+            "download_url": reverse("job-download", args=[self.id]) if self.status == "done" else None,
+        }
+
+
+def requested_job_mode(request):
+    """True when the upload asked to run as a background job (``mode=job``)."""
+    return (request.POST.get("mode") or request.GET.get("mode")) == "job"
+
+
+def job_dir():
+    path = getattr(settings, "LABEL_JOB_DIR", None) or os.path.join(tempfile.gettempdir(), "label_jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_executor():
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            workers = getattr(settings, "LABEL_JOB_WORKERS", None) or DEFAULT_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="label-job")
+        return _executor
+
+
+def _run(job, rows, columns):
+    job.status = "running"
+    job.started = time.time()
+    try:
+        job.rows = write_export(rows, columns, job.format, job.output_path)
+        job.status = "done"
+    except Exception as e:
+        remove_file(job.output_path)
+        job.error = str(e)
+        job.status = "failed"
+    finally:
+        job.finished = time.time()
+        job.done.set()
+
+
+def _expire_jobs():
+    """Forget finished jobs older than ``LABEL_JOB_TTL_SECONDS`` and delete their files."""
+    ttl = getattr(settings, "LABEL_JOB_TTL_SECONDS", None) or DEFAULT_TTL_SECONDS
+    cutoff = time.time() - ttl
+    with _jobs_lock:
+        expired = [job for job in _jobs.values() if job.finished and job.finished < cutoff]
+        for job in expired:
+            del _jobs[job.id]
+    for job in expired:
+        remove_file(job.output_path)
+
+
+def submit_job(marketplace, rows, columns, export_format, basename):
+    """Run ``rows`` into a ``export_format`` file in the background and return the Job.
+
+    ``rows`` usually still reads the upload: its ``PdfSource`` must be
+    ``detach()``-ed first, as the job outlives the request.
+    """
+    _expire_jobs()
+    job = Job(marketplace, export_format, f"{basename}.{export_format}")
+    with _jobs_lock:
+        _jobs[job.id] = job
+    try:
+        get_executor().submit(_run, job, rows, columns)
+    except RuntimeError:
+        with _jobs_lock:
+            del _jobs[job.id]
+        raise
+    return job
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
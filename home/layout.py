@@ -0,0 +1,77 @@
+"""Read a page by position: its words grouped into rows.
+
+``page.get_text()`` flattens a label into one string, and the parsers then
+find their fields with DOTALL patterns that may scan the rest of the block.
+``page.get_text("words")`` keeps every word's box instead, so a parser can go
+to the row of a field label and read the value beside it, or take the words
+under a column header, without any pattern crossing a line.
+"""
+from operator import itemgetter
+
+
+# Words whose vertical centres are this close (in points) share a row
+ROW_TOLERANCE = 3.0
+
+
+class Row:
+    """Words on one visual line, left to right"""
+
+    __slots__ = ("top", "words", "text")
+
+    def __init__(self, words):
+        self.words = sorted(words, key=itemgetter(0))
+        self.top = min(word[1] for word in words)
+        self.text = " ".join(word[4] for word in self.words)
+
+    def text_between(self, x0=None, x1=None):
+        """Text of the words starting at or right of ``x0`` and left of ``x1``."""
+        return " ".join(
+            word[4] for word in self.words
+            if (x0 is None or word[0] >= x0) and (x1 is None or word[0] < x1)
+        )
+
+    def run_from(self, x0, max_gap):
+        """Text of the words from the first one at or right of ``x0``, up to a gap wider than ``max_gap``."""
+        run = []
+        for word in self.words:
+            if word[0] < x0:
+                continue
+            if run and word[0] - run[-1][2] > max_gap:
+                break
+            run.append(word)
+        return " ".join(word[4] for word in run)
+
+    def find(self, text):
+        """Return the first word equal to ``text`` (case insensitive), or None."""
+        text = text.lower()
+        return next((word for word in self.words if word[4].lower() == text), None)
+
+    def __repr__(self):
+        return f"Row({self.top:.1f}, {self.text!r})"
+
+
+def page_rows(words, tolerance=ROW_TOLERANCE):
+    """Group ``(x0, y0, x1, y1, word)`` tuples into rows, top to bottom."""
+    rows = []
+    current = []
+    centre = None
+    for word in sorted(words, key=lambda word: (word[1] + word[3], word[0])):
+        word_centre = (word[1] + word[3]) / 2
+        if current and word_centre - centre > tolerance:
+            rows.append(Row(current))
+            current = []
+        if not current:
+            centre = word_centre
+        current.append(word)
+    if current:
+        rows.append(Row(current))
+    return rows
+
+
+def find_row(rows, pattern, start=0):
+    """Return ``(index, match)`` of the first row from ``start`` whose text matches ``pattern``."""
+    for index in range(start, len(rows)):
+        match = pattern.search(rows[index].text)
+        if match:
+            return index, match
+    return None, None
@@ -0,0 +1,132 @@
+"""Extract labels from PDFs on disk, without going through the upload views.
+
+    python manage.py extract_labels /downloads/nightly/*.pdf --output labels.xlsx
+    python manage.py extract_labels /downloads/nightly --output-dir out --format csv --workers 4
+"""
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from home import regexguard
+from home.detect import MARKETPLACES, detect_marketplace
+from home.export import EXPORT_FORMATS, write_export
+from home.mixed import NORMALIZED_COLUMNS
+from home.parsers import PARSERS, parse_pages
+from home.pdftext import extract_page_texts
+
+
+# The normalized schema of home/mixed.py: the per-parser display columns
+# have aliases ("AWB Number" / "AWB No.") that read the same field
+MERGED_COLUMNS = ["Source File"] + NORMALIZED_COLUMNS
+
+
+def expand_paths(paths):
+    """Expand globs and directories (their *.pdf files) into a sorted, de-duplicated file list."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, "*.pdf")) + glob.glob(os.path.join(path, "*.PDF"))
+        elif glob.has_magic(path):
+            matches = glob.glob(path, recursive=True)
+        else:
+            matches = [path]
+        files.extend(sorted(matches))
+    return list(dict.fromkeys(files))
+
+
+def extract_file(file_path, marketplace=None):
+    """Worker: extract one PDF. Returns ``(file_path, marketplace, pages, rows, error, fields given up)``."""
+    warnings = regexguard.warning_count()
+    try:
+        # Pages are read serially: the files themselves are spread over the workers
+        page_texts = extract_page_texts(file_path, parallel=False)
+        marketplace = marketplace or detect_marketplace(page_texts)
+        if marketplace is None:
+            return file_path, None, len(page_texts), [], "marketplace not recognised", 0
+        rows = parse_pages(marketplace, page_texts)
+        return file_path, marketplace, len(page_texts), rows, None, regexguard.warning_count() - warnings
+    except Exception as e:
+        return file_path, marketplace, 0, [], str(e), 0
+
+
+class Command(BaseCommand):
+    help = "Extract label data from PDF files or globs, detecting each file's marketplace."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="PDF files, directories or glob patterns")
+        parser.add_argument("--marketplace", choices=("auto",) + MARKETPLACES, default="auto",
+                            help="Parser to use for every file (default: detect per file)")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                            help="Files extracted at the same time (default: one per CPU)")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default=None,
+                            help="Output format (default: from --output's extension, else xlsx)")
+        output = parser.add_mutually_exclusive_group(required=True)
+        output.add_argument("--output", help="Write every file's rows to this one merged file")
+        output.add_argument("--output-dir", help="Write one output file per PDF into this directory")
+
+    def handle(self, *args, **options):
+        files = expand_paths(options["paths"])
+        if not files:
+            raise CommandError("No PDF files matched.")
+        export_format = options["format"]
+        if export_format is None and options["output"]:
+            extension = os.path.splitext(options["output"])[1].lstrip(".").lower()
+            export_format = extension if extension in EXPORT_FORMATS else None
+        export_format = export_format or "xlsx"
+        marketplace = None if options["marketplace"] == "auto" else options["marketplace"]
+        workers = max(1, options["workers"])
+
+        started = time.perf_counter()
+        if workers == 1 or len(files) == 1:
+            results = (extract_file(file_path, marketplace) for file_path in files)
+            summary = self.write_results(results, options, export_format)
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(files)), initializer=django.setup) as executor:
+                results = executor.map(extract_file, files, [marketplace] * len(files))
+                summary = self.write_results(results, options, export_format)
+        elapsed = time.perf_counter() - started
+
+        pages, labels, failed = summary
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(files) - failed}/{len(files)} files, {pages} pages, {labels} labels in {elapsed:.2f}s "
+            f"({pages / elapsed:.1f} pages/s, {labels / elapsed:.1f} labels/s)"
+        ))
+        if failed == len(files):
+            raise CommandError("No file could be extracted.")
+
+    def write_results(self, results, options, export_format):
+        """Write the results as they come in. Returns ``(pages, labels, failed files)``."""
+        pages = labels = failed = 0
+        merged = []
+        for file_path, marketplace, page_count, rows, error, given_up in results:
+            pages += page_count
+            if error:
+                failed += 1
+                self.stderr.write(f"❌ {file_path}: {error}")
+                continue
+            labels += len(rows)
+            self.stdout.write(f"📄 {file_path}: {marketplace}, {page_count} pages, {len(rows)} labels")
+            if given_up:
+                self.stderr.write(f"⏱️ {file_path}: {given_up} fields given up after the regex time budget")
+            if options["output_dir"]:
+                os.makedirs(options["output_dir"], exist_ok=True)
+                stem = os.path.splitext(os.path.basename(file_path))[0]
+                output_path = os.path.join(options["output_dir"], f"{stem}.{export_format}")
+                write_export(iter(rows), PARSERS[marketplace][0], export_format, output_path)
+            else:
+                merged.append((file_path, marketplace, rows))
+
+        if options["output"]:
+            # One table for every marketplace, in the normalized schema
+            merged_rows = (
+                {"Source File": os.path.basename(file_path), **row.to_dict(NORMALIZED_COLUMNS)}
+                for file_path, marketplace, rows in merged
+                for row in rows
+            )
+            write_export(merged_rows, MERGED_COLUMNS, export_format, options["output"])
+            self.stdout.write(f"💾 {labels} rows written to {options['output']}")
+        return pages, labels, failed
@@ -1,25 +1,53 @@
 from django.shortcuts import render
 from django.core.files.storage import default_storage
 import fitz  # PyMuPDF
-import pandas as pd
-import re
 import os
 import tempfile
+import logging
 from datetime import datetime
-from django.http import FileResponse
+from django.http import FileResponse, JsonResponse
+from home import instrument, patterns, regexguard
+from home.couriers import get_courier_matcher
+from home.blocks import iter_marker_blocks
+from home.export import export_response, requested_export_format, write_xlsx
+from home.jobs import requested_job_mode, submit_job
+from home.resultcache import cached_rows
+from home.instrument import ExtractionSummary
+from home.timing import StageTimer
+from home.records import LabelRecord
+from home.pdftext import iter_page_texts, page_ranges
+from home.uploads import PdfSource
+
+# Bump whenever a change here alters the extracted rows: it invalidates
+# the result cache entries written by older code
+EXTRACTOR_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+MEESHO_COLUMNS = [
+    "SKU",
+    "Size",
+    "Qty",
+    "Color",
+    "Order No.",
+    "Order Date",
+    "Invoice Date",
+    "GSTIN",
+    "AWB Number",
+    "Pickup",
+    "Customer Address"
+]
 
 def split_pdf_chunks(file_path, pages_per_chunk=10):
-    print("Splitting PDF into chunks")
     doc = fitz.open(file_path)
     chunks = []
-    for start in range(0, len(doc), pages_per_chunk):
-        end = min(start + pages_per_chunk, len(doc))
-        print(f"Creating chunk from page {start} to {end - 1}")
+    for start, end in page_ranges(len(doc), pages_per_chunk):
+        logger.debug("Creating chunk from page %d to %d", start, end - 1)
         sub_doc = fitz.open()
         for p in range(start, end):
             sub_doc.insert_pdf(doc, from_page=p, to_page=p)
         chunks.append(sub_doc)
-    print(f"✅ Total chunks created: {len(chunks)}")
+    logger.debug("Split %s into %d chunks", file_path, len(chunks))
     return chunks
 
 
@@ -27,158 +55,135 @@ def meeshoindex(request):
     message = None
     if request.method == "POST" and request.FILES.get("pdf_file"):
         uploaded_file = request.FILES["pdf_file"]
-        temp_file_path = os.path.join(tempfile.gettempdir(), uploaded_file.name)
-
-        with open(temp_file_path, 'wb+') as temp_file: 
-            for chunk in uploaded_file.chunks(): 
-                temp_file.write(chunk) 
+        # Read the PDF where Django keeps it (in memory, or its own temp file)
+        source = PdfSource.from_upload(uploaded_file)
 
         try:
-            # Read full PDF text
-            doc = fitz.open(temp_file_path)
-            full_text = ""
-            for page in doc:
-                full_text += page.get_text()
-            doc.close()
-
-            # Split by Customer Address blocks
-            label_blocks = full_text.split("Customer Address")
-            extracted_data = []
-
-            for block in label_blocks[1:]:
-                block_text = "Customer Address" + block
-
-                # ----------------- Customer Address -----------------
-                customer_address = extract_customer_address(block_text)
-                
-                # ----------------- Order Date -----------------
-                order_date = extract_order_date(block_text)
-
-                # ----------------- Invoice Date -----------------
-                invoice_date = extract_invoice_date(block_text)
-
-                # ----------------- GSTIN -----------------
-                gstin = extract_gstin(block_text)
-
-                # ----------------- AWB Number -----------------
-                awb_number = extract_awb_number(block_text)
-
-                # ----------------- Pickup Courier Partner -----------------
-                pickup = extract_pickup_partner(block_text)
-
-                # ----------------- Product Info -----------------
-                product_info = extract_product_info(block_text)
-
-                # ----------------- Add to Extracted List -----------------
-                extracted_data.append({
-                    "SKU": product_info.get("sku", ""),
-                    "Size": product_info.get("size", ""),
-                    "Qty": product_info.get("qty", ""),
-                    "Color": product_info.get("color", ""),
-                    "Order No.": product_info.get("order_no", ""),
-                    "Order Date": order_date,
-                    "Invoice Date": invoice_date,
-                    "GSTIN": gstin,
-                    "AWB Number": awb_number,
-                    "Pickup": pickup,
-                    "Customer Address": customer_address
-                })
-
-            # ----------------- Save to Excel -----------------
-            if extracted_data:
-                df = pd.DataFrame(extracted_data)[[
-                    "SKU",
-                    "Size",
-                    "Qty",
-                    "Color",
-                    "Order No.",
-                    "Order Date",
-                    "Invoice Date",
-                    "GSTIN",
-                    "AWB Number",
-                    "Pickup",
-                    "Customer Address"
-                ]]
+            export_format = requested_export_format(request)
+            # Repeat uploads of the same PDF are answered from the result cache
+            summary = ExtractionSummary("meesho")
+            # Server-Timing: time per stage (home/timing.py)
+            timer = StageTimer("meesho")
+            rows = cached_rows(source, "meesho", EXTRACTOR_VERSION,
+                               lambda source: iter_meesho_labels(summary.read(timer.iter(iter_page_texts(source), "text"))))
+            rows = timer.iter(summary.track(rows, MEESHO_COLUMNS), "parse")
+            if requested_job_mode(request):
+                # Big uploads: extract in the background and answer with a job id right away
+                source.detach()
+                job = submit_job("meesho", rows, MEESHO_COLUMNS, export_format, "meesho_labels")
+                return JsonResponse(job.as_dict(), status=202)
+            if export_format != "xlsx":
+                # ----------------- Stream CSV / JSONL, or write Parquet -----------------
+                response = export_response(rows, MEESHO_COLUMNS, export_format, "meesho_labels",
+                                           on_close=lambda: timer.write_profile(summary))
+                if response is not None:
+                    return timer.add_header(response)
+                message = "❌ No data extracted from PDF"
 
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            else:
+                # ----------------- Parse + Save to Excel -----------------
+                # Label blocks are parsed as the pages are read and written
+                # straight into the workbook
                 with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx", dir=tempfile.gettempdir()) as tmp_file:  # ✅ NEW
-                    df.to_excel(tmp_file.name, index=False)
-                    tmp_file.flush()
                     tmp_file_path = tmp_file.name
-
-                message = f"✅ {len(extracted_data)} labels extracted and saved."
-                response = FileResponse(open(tmp_file_path, 'rb'), as_attachment=True, filename=os.path.basename(tmp_file_path))
-                return response
-            else:
-                message = "❌ No data extracted from PDF"
+                with timer.stage("export"):
+                    label_count = write_xlsx(rows, MEESHO_COLUMNS, tmp_file_path)
+                timer.write_profile(summary)
+
+                if label_count:
+                    message = f"✅ {label_count} labels extracted and saved."
+                    response = FileResponse(open(tmp_file_path, 'rb'), as_attachment=True, filename=os.path.basename(tmp_file_path))
+                    return timer.add_header(response)
+                else:
+                    os.remove(tmp_file_path)
+                    message = "❌ No data extracted from PDF"
 
         except Exception as e:
             message = f"❌ Error processing PDF: {str(e)}"
-        finally:
-            # Clean up uploaded file
-            if os.path.exists(temp_file_path):  
-                os.remove(temp_file_path)
     return render(request, "upload_file.html", {"message": message})
 
 
+def iter_meesho_labels(page_texts):
+    """Yield one extracted row per "Customer Address" label block"""
+    for block_text in iter_marker_blocks(page_texts, "Customer Address"):
+        yield extract_meesho_label(block_text)
+
+
+@instrument.block_parser
+@regexguard.budgeted
+def extract_meesho_label(block_text):
+    """Extract every field of one Meesho label block"""
+    # ----------------- Customer Address -----------------
+    customer_address = extract_customer_address(block_text)
+
+    # ----------------- Order Date -----------------
+    order_date = extract_order_date(block_text)
+
+    # ----------------- Invoice Date -----------------
+    invoice_date = extract_invoice_date(block_text)
+
+    # ----------------- GSTIN -----------------
+    gstin = extract_gstin(block_text)
+
+    # ----------------- AWB Number -----------------
+    awb_number = extract_awb_number(block_text)
+
+    # ----------------- Pickup Courier Partner -----------------
+    pickup = extract_pickup_partner(block_text)
+
+    # ----------------- Product Info -----------------
+    product_info = extract_product_info(block_text)
+
+    return LabelRecord(
+        marketplace="meesho",
+        order_id=product_info.get("order_no", ""),
+        sku=product_info.get("sku", ""),
+        size=product_info.get("size", ""),
+        color=product_info.get("color", ""),
+        qty=product_info.get("qty", ""),
+        order_date=order_date,
+        invoice_date=invoice_date,
+        gstin=gstin,
+        awb=awb_number,
+        courier=pickup,
+        customer_address=customer_address,
+    )
+
+
 def extract_customer_address(block_text):
     """Extract customer address from block text"""
+    customer_address = ""
     try:
-        match = re.search(
-            r"Customer Address\s*\n(.+?)(?:If undelivered, return to:|Prepaid|Invoice|TAX INVOICE|Order No\.|SKU|GSTIN)",
-            block_text,
-            re.DOTALL | re.IGNORECASE
-        )
+        match = regexguard.search("meesho.customer_address", patterns.MEESHO_CUSTOMER_ADDRESS, block_text)
         if match:
             address_block = match.group(1)
             address_lines = address_block.strip().split("\n")
             address_lines = [line.strip() for line in address_lines if line.strip()]
             customer_address = ", ".join(address_lines)
+        else:
+            instrument.parse_failure(logger, "customer_address", block_text)
     except Exception as e:
-        print("❌ Error extracting customer address:", e)
-        print(block_text[:500])
+        logger.warning("❌ Error extracting customer address: %s", e)
+        instrument.parse_failure(logger, "customer_address", block_text)
     return customer_address
 
 
 def extract_order_date(block_text):
     """Extract order date from block text"""
     order_date = ""
-    patterns = [
-        r"Order\s*Date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})",
-        r"Order\s*Dt\.?\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})",
-        r"Order\s*Placed\s*On\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})",
-        r"Ordered\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, block_text, re.IGNORECASE)
+    for pattern in patterns.MEESHO_ORDER_DATE_PATTERNS:
+        match = pattern.search(block_text)
         if match:
             order_date = match.group(1)
             break
     return order_date
 
-# 🔧 ADDED: If Order Date not found, try to extract "Dispatch on" date
-    if not order_date:
-        dispatch_match = re.search(r"Dispatch\s+on\s+[:\-]?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})", block_text, re.IGNORECASE)
-        if dispatch_match:
-            order_date = dispatch_match.group(1)
-
-    return order_date
-
 
 def extract_invoice_date(block_text):
     """Extract invoice date from block text"""
     invoice_date = ""
-    patterns = [
-        r"Invoice\s*Date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})",
-        r"Invoice\s*Dt\.?\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})",
-        r"Invoice\s*Generated\s*On\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})",
-        r"Inv\.\s*Date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})"
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, block_text, re.IGNORECASE)
+    for pattern in patterns.MEESHO_INVOICE_DATE_PATTERNS:
+        match = pattern.search(block_text)
         if match:
             invoice_date = match.group(1)
             break
@@ -188,77 +193,61 @@ def extract_invoice_date(block_text):
 def extract_gstin(block_text):
     """Extract GSTIN from block text"""
     gstin = ""
-    gstin_match = re.search(r"GSTIN\s*[:\-]?\s*([0-9A-Z]{15})", block_text, re.IGNORECASE)
+    gstin_match = patterns.MEESHO_GSTIN.search(block_text)
     if gstin_match:
         gstin = gstin_match.group(1)
     return gstin
 
 
+def scan_awb_candidates(block_text):
+    """Yield (family, code, labelled) AWB candidates in priority order.
+
+    Label keywords and unlabelled codes are each found in one scan of the
+    block; the order matches the old pattern cascade (labelled AWB, then
+    Tracking, then any label, then unlabelled codes by family).
+    """
+    lowered = block_text.lower()
+    if len(lowered) == len(block_text):
+        labels = [(match.group(), match.end()) for match in patterns.AWB_LABEL.finditer(lowered)]
+    else:
+        labels = [(match.group().lower(), match.end()) for match in patterns.AWB_LABEL_ANYCASE.finditer(block_text)]
+
+    for allowed, family, tail in patterns.MEESHO_AWB_LABELLED:
+        for label, end in labels:
+            if label in allowed:
+                match = tail.match(block_text, end)
+                if match:
+                    yield family, match.group(1), True
+                    break
+
+    # First valid unlabelled code of each family
+    standalone = {}
+    word_end = 0
+    for run in patterns.AWB_DIGIT_RUN.finditer(block_text):
+        start = run.start()
+        if start < word_end:
+            continue
+        while start > 0 and (block_text[start - 1].isalnum() or block_text[start - 1] == "_"):
+            start -= 1
+        word_end = patterns.WORD_TAIL.match(block_text, run.end()).end()
+        match = patterns.MEESHO_AWB_STANDALONE.fullmatch(block_text, start, word_end)
+        if match and match.lastgroup not in standalone and is_valid_awb(match.group()):
+            standalone[match.lastgroup] = match.group()
+    for family, _ in patterns.AWB_FAMILIES:
+        if family in standalone:
+            yield family, standalone[family], False
+
+
 def extract_awb_number(block_text):
     """Extract AWB number from block text"""
-    awb_number = ""
-    
-    # Debug: Print block text to see what's available
-    print("🔍 Searching for AWB in block:")
-    print(block_text[:5000])  # Print first 500 chars
-    
-    # AWB patterns based on your examples:
-    # VL0081530070753 (VL + 13 digits)
-    # SF1556751037FPL (SF + 10 digits + FPL)  
-    # 1490810673698592 (16 digits)
-    # M00831998289 (M + 11 digits)
-    
-    patterns = [
-        # Specific courier patterns
-        r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*([A-Z]{2}\d{10,15})",  # VL0081530070753
-        r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*([A-Z]{2}\d{10,13}[A-Z]{2,3})",  # SF1556751037FPL
-        r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*([A-Z]\d{10,15})",  # M00831998289
-        r"AWB\s*(?:No\.?|Number)?\s*[:\-]?\s*(\d{13,16})",  # 1490810673698592
-        
-        # Tracking patterns
-        r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,15})",
-        r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,13}[A-Z]{2,3})",
-        r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*([A-Z]\d{10,15})",
-        r"Tracking\s*(?:No\.?|ID)?\s*[:\-]?\s*(\d{13,16})",
-        
-        # General patterns for various AWB formats
-        r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,15})",
-        r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*([A-Z]{2}\d{10,13}[A-Z]{2,3})",
-        r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*([A-Z]\d{10,15})",
-        r"(?:AWB|Tracking|Waybill|Docket|LR)\s*(?:No\.?|Number|ID)?\s*[:\-]?\s*(\d{13,16})",
-    ]
-    
-    for i, pattern in enumerate(patterns):
-        match = re.search(pattern, block_text, re.IGNORECASE)
-        if match:
-            potential_awb = match.group(1)
-            # Validate AWB format
-            if is_valid_awb(potential_awb):
-                awb_number = potential_awb
-                print(f"✅ AWB found with pattern {i+1}: {awb_number}")
-                break
-    
-    # If no AWB found with labels, search for AWB patterns without labels
-    if not awb_number:
-        standalone_patterns = [
-            r"\b([A-Z]{2}\d{10,15})\b",  # VL0081530070753
-            r"\b([A-Z]{2}\d{10,13}[A-Z]{2,3})\b",  # SF1556751037FPL
-            r"\b([A-Z]\d{10,15})\b",  # M00831998289
-            r"\b(\d{13,16})\b"  # 1490810673698592
-        ]
-        
-        for pattern in standalone_patterns:
-            matches = re.findall(pattern, block_text, re.IGNORECASE)
-            for match in matches:
-                if is_valid_awb(match):
-                    awb_number = match
-                    print(f"✅ AWB found standalone: {awb_number}")
-                    break
-            if awb_number:
-                break
-    
-    print(f"📦 Final AWB Number: {awb_number}")
-    return awb_number
+    for family, code, labelled in scan_awb_candidates(block_text):
+        # Validate AWB format
+        if is_valid_awb(code):
+            logger.debug("AWB found %s (%s): %s", "with label" if labelled else "standalone", family, code)
+            return code
+
+    instrument.parse_failure(logger, "awb", block_text)
+    return ""
 
 
 def is_valid_awb(awb_code):
@@ -273,36 +262,12 @@ def is_valid_awb(awb_code):
     if len(awb_code) < 10 or len(awb_code) > 16:
         return False
     
-    # Valid AWB patterns based on your examples
-    valid_patterns = [
-        r"^[A-Z]{2}\d{10,15}$",  # VL0081530070753
-        r"^[A-Z]{2}\d{10,13}[A-Z]{2,3}$",  # SF1556751037FPL
-        r"^[A-Z]\d{10,15}$",  # M00831998289
-        r"^\d{13,16}$"  # 1490810673698592
-    ]
-    
-    for pattern in valid_patterns:
-        if re.match(pattern, awb_code):
-            return True
-    
-    return False
+    return patterns.AWB_VALID.match(awb_code) is not None
 
 
 def extract_pickup_partner(block_text):
     """Extract pickup courier partner from block text"""
-    pickup = ""
-    known_couriers = [
-        "Delhivery", "XpressBees", "Xpress Bees", "Ecom Express", "Shadowfax",
-        "BlueDart", "Blue Dart", "Ekart", "Valmo", "DTDC", "Amazon Transportation", 
-        "Wow Express", "FedEx", "DHL", "Shiprocket", "Pickrr", "Aramex", "Gati",
-        "Professional Couriers", "DTDC Express", "India Post", "Speed Post"
-    ]
-    
-    for courier in known_couriers:
-        if re.search(rf"\b{re.escape(courier)}\b", block_text, re.IGNORECASE):
-            pickup = courier
-            break
-    return pickup
+    return get_courier_matcher("meesho").find(block_text)
 
 
 def extract_product_info(block_text):
@@ -363,12 +328,9 @@ def extract_product_info(block_text):
             # If Free Size parsing failed, try alternative parsing
             if not product_info["sku"]:
                 # Look for numeric patterns that might indicate quantity
-                qty_pattern = r'^\d+$'
-                order_pattern = r'^\d{10,}$'  # Order numbers are typically long
-                
                 # Try to identify quantity and order number positions
                 for i, item in enumerate(flat_data):
-                    if re.match(qty_pattern, item) and len(item) <= 3:  # Qty is usually 1-3 digits
+                    if patterns.MEESHO_QTY.match(item) and len(item) <= 3:  # Qty is usually 1-3 digits
                         if i >= 2 and i + 2 < len(flat_data):
                             product_info["sku"] = " ".join(flat_data[:i-2])  # qty થી 2 પહેલા સુધી
                             product_info["size"] = flat_data[i-1]
@@ -392,7 +354,7 @@ def extract_product_info(block_text):
                 product_info[key] = product_info[key].strip()
 
     except Exception as e:
-        print(f"❌ Product parsing error: {e}")
-        print(f"Block text sample: {block_text[:500]}")
+        logger.warning("❌ Product parsing error: %s", e)
+        instrument.parse_failure(logger, "product_info", block_text)
 
     return product_info
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""Extraction metrics of this process, in the Prometheus text format, at ``/metrics``.
+
+No client library: a counter or histogram here is a dict of label values
+to numbers behind one lock, and ``render()`` writes the text format
+(version 0.0.4) any Prometheus-compatible scraper reads.
+
+- ``label_upload_duration_seconds``, ``label_upload_pages`` and
+  ``label_upload_labels``: histograms per marketplace, observed once per
+  upload when its last row is produced (``ExtractionSummary.finish``). The
+  duration runs from the view receiving the upload to that last row. An
+  upload answered from the result cache reads no pages and is not
+  observed in ``label_upload_pages``.
+- ``label_fields_missing_total``: rows with an empty field, per marketplace
+  and field (``awb``, ``gstin``, ``order_date``, ...).
+- ``label_fields_given_up_total``: fields left empty by the regex budget.
+- ``label_cache_lookups_total``: result cache (per upload) and page cache
+  (per page) lookups, per marketplace and hit/miss.
+
+Like ``/cache/stats`` and ``/debug/patterns`` the numbers are per process:
+each worker of a multi-process server is scraped (or summed) on its own.
+"""
+import threading
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+_metrics = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """A counter per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _metrics.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with _lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        for labelvalues, value in sorted(self.values.items()):
+            yield self.name, _label_text(self.labelnames, labelvalues), value
+
+    def clear(self):
+        self.values.clear()
+
+
+class Histogram:
+    """Cumulative buckets, sum and count per combination of label values"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self.values = {}
+        _metrics.append(self)
+
+    def observe(self, value, *labelvalues):
+        with _lock:
+            series = self.values.get(labelvalues)
+            if series is None:
+                # One count per bucket (not cumulative yet), then sum and count
+                series = self.values[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        names = self.labelnames + ("le",)
+        for labelvalues, series in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", _label_text(names, labelvalues + (_number(bound),)), cumulative
+            yield f"{self.name}_sum", _label_text(self.labelnames, labelvalues), series[-2]
+            yield f"{self.name}_count", _label_text(self.labelnames, labelvalues), series[-1]
+
+    def clear(self):
+        self.values.clear()
+
+
+UPLOAD_SECONDS = Histogram(
+    "label_upload_duration_seconds", "Time from receiving an upload to its last extracted row.",
+    ("marketplace",), (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+UPLOAD_PAGES = Histogram(
+    "label_upload_pages", "Pages read per upload.",
+    ("marketplace",), (1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+UPLOAD_LABELS = Histogram(
+    "label_upload_labels", "Rows extracted per upload.",
+    ("marketplace",), (1, 10, 50, 100, 500, 1000, 5000, 10000, 50000),
+)
+FIELDS_MISSING = Counter(
+    "label_fields_missing_total", "Extracted rows with an empty field.", ("marketplace", "field"),
+)
+FIELDS_GIVEN_UP = Counter(
+    "label_fields_given_up_total", "Fields left empty because the regex time budget ran out.", ("marketplace",),
+)
+CACHE_LOOKUPS = Counter(
+    "label_cache_lookups_total", "Result cache (per upload) and page cache (per page) lookups.",
+    ("cache", "marketplace", "result"),
+)
+
+
+def observe_extraction(summary):
+    """Record one finished ``ExtractionSummary``."""
+    marketplace = summary.marketplace
+    UPLOAD_SECONDS.observe(summary.elapsed(), marketplace)
+    if summary.pages:
+        UPLOAD_PAGES.observe(summary.pages, marketplace)
+    UPLOAD_LABELS.observe(summary.rows, marketplace)
+    for field, count in summary.missing.items():
+        FIELDS_MISSING.inc(marketplace, field, amount=count)
+    if summary.given_up:
+        FIELDS_GIVEN_UP.inc(marketplace, amount=summary.given_up)
+
+
+def render():
+    """Return every metric in the Prometheus text format."""
+    lines = []
+    with _lock:
+        for metric in _metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget every value (tests)."""
+    with _lock:
+        for metric in _metrics:
+            metric.clear()
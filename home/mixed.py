@@ -0,0 +1,132 @@
+"""Print files that merge labels from several marketplaces.
+
+Every page is classified on its own (home/detect.py); pages that match no
+fingerprint (a label running over onto a second page) go with the page
+before them. Each run of consecutive pages of one marketplace is parsed by
+that marketplace's parser, runs in parallel on the shared page text pool.
+The result is one workbook with a sheet per marketplace, or one table with
+the columns normalized across marketplaces.
+"""
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+
+from django.http import FileResponse
+from django.shortcuts import render
+
+from home.detect import MARKETPLACES, detect_text_marketplace
+from home.export import export_response, requested_export_format, write_export, write_xlsx_sheets
+from home.instrument import ExtractionSummary
+from home.parsers import PARSERS, parse_pages
+from home.pdftext import get_pool, iter_page_texts, reset_pool, text_workers
+from home.uploads import PdfSource
+
+
+LAYOUTS = ("sheets", "table")
+
+# Columns of the single normalized table: the fields every LabelRecord has
+NORMALIZED_COLUMNS = [
+    "Marketplace", "Order ID", "SKU", "Description", "Size", "Color", "Qty", "Order Date",
+    "Invoice Date", "GSTIN", "AWB Number", "Courier", "Customer Address", "Pincode",
+]
+
+
+def classify_pages(page_texts):
+    """Return the marketplace of every page; None only when no page is recognised."""
+    found = [detect_text_marketplace(text) for text in page_texts]
+    marketplaces = []
+    previous = next((marketplace for marketplace in found if marketplace), None)
+    for marketplace in found:
+        previous = marketplace or previous
+        marketplaces.append(previous)
+    return marketplaces
+
+
+def page_runs(page_texts):
+    """Split the pages into ``(marketplace, page texts)`` runs of consecutive pages."""
+    runs = []
+    for text, marketplace in zip(page_texts, classify_pages(page_texts)):
+        if marketplace is None:
+            continue
+        if runs and runs[-1][0] == marketplace:
+            runs[-1][1].append(text)
+        else:
+            runs.append((marketplace, [text]))
+    return runs
+
+
+def parse_runs(runs):
+    """Return the rows of every run, in run order; runs are parsed in parallel when possible."""
+    if len(runs) > 1 and text_workers() > 1:
+        try:
+            futures = [get_pool().submit(parse_pages, marketplace, texts) for marketplace, texts in runs]
+            return [future.result() for future in futures]
+        except (OSError, BrokenProcessPool, NotImplementedError, RuntimeError):
+            # No usable pool on this host: parse in this process
+            reset_pool()
+    return [parse_pages(marketplace, texts) for marketplace, texts in runs]
+
+
+def extract_mixed(page_texts):
+    """Return ``{marketplace: rows}`` (in page order) and ``{marketplace: page count}``."""
+    runs = page_runs(list(page_texts))
+    rows = {}
+    pages = {}
+    for (marketplace, texts), run_rows in zip(runs, parse_runs(runs)):
+        rows.setdefault(marketplace, []).extend(run_rows)
+        pages[marketplace] = pages.get(marketplace, 0) + len(texts)
+    return rows, pages
+
+
+def normalize_rows(rows_by_marketplace):
+    """Yield every record, marketplace by marketplace (they already share ``NORMALIZED_COLUMNS``)."""
+    for rows in rows_by_marketplace.values():
+        yield from rows
+
+
+def requested_layout(request):
+    layout = (request.POST.get("layout") or request.GET.get("layout") or "sheets").lower()
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unsupported layout '{layout}', use one of: {', '.join(LAYOUTS)}")
+    return layout
+
+
+def mixedindex(request):
+    message = None
+    if request.method == "POST" and request.FILES.get("pdf_file"):
+        source = PdfSource.from_upload(request.FILES["pdf_file"])
+        try:
+            export_format = requested_export_format(request)
+            layout = requested_layout(request)
+            # Every page is parsed before the response starts
+            summary = ExtractionSummary("mixed")
+            rows, pages = extract_mixed(summary.read(iter_page_texts(source)))
+            # The runs are parsed on the pool: their blocks are not counted here
+            summary.blocks = None
+            summary.count(normalize_rows(rows), NORMALIZED_COLUMNS)
+            summary.finish()
+            page_summary = "; ".join(f"{marketplace}={count}" for marketplace, count in pages.items())
+
+            if not any(rows.values()):
+                message = "❌ No data extracted from PDF"
+            elif export_format == "xlsx":
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp_excel:
+                    output_path = tmp_excel.name
+                if layout == "sheets":
+                    # ✅ One sheet per marketplace, each with its own columns
+                    write_xlsx_sheets([(marketplace, PARSERS[marketplace][0], rows[marketplace])
+                                       for marketplace in MARKETPLACES if rows.get(marketplace)], output_path)
+                else:
+                    write_export(normalize_rows(rows), NORMALIZED_COLUMNS, "xlsx", output_path)
+                response = FileResponse(open(output_path, "rb"), as_attachment=True, filename="mixed_labels.xlsx")
+                response["X-Marketplace-Pages"] = page_summary
+                return response
+            else:
+                # ✅ CSV / JSONL / Parquet are always the single normalized table
+                response = export_response(normalize_rows(rows), NORMALIZED_COLUMNS, export_format, "mixed_labels")
+                response["X-Marketplace-Pages"] = page_summary
+                return response
+
+        except Exception as e:
+            message = f"❌ Error processing PDF: {str(e)}"
+
+    return render(request, "upload_file.html", {"message": message})
@@ -1,144 +1,161 @@
 from django.shortcuts import render
 from django.core.files.storage import default_storage
 import fitz  # PyMuPDF
-import pandas as pd
 import re
 import os
 import tempfile
 from datetime import datetime
-from django.http import FileResponse
+from django.http import FileResponse, JsonResponse
+from home import instrument, patterns
+from home.couriers import get_courier_matcher
+from home.blocks import iter_marker_blocks
+from home.export import export_response, requested_export_format, write_xlsx
+from home.jobs import requested_job_mode, submit_job
+from home.resultcache import cached_rows
+from home.instrument import ExtractionSummary
+from home.timing import StageTimer
+from home.records import LabelRecord
+from home.pdftext import iter_page_texts
+from home.uploads import PdfSource
+
+# Bump whenever a change here alters the extracted rows: it invalidates
+# the result cache entries written by older code
+EXTRACTOR_VERSION = 2
+
+MYNTRA_COLUMNS = [
+    "SKU", "Size", "Qty", "Color", "Order No.", "Order Date", "Invoice Date",
+    "GSTIN", "AWB Number", "Pickup", "Customer Address"
+]
 
 def myntraindex(request):
     message = None
     if request.method == "POST" and request.FILES.get("pdf_file"):
         uploaded_file = request.FILES["pdf_file"]
-        temp_file_path = os.path.join(tempfile.gettempdir(), uploaded_file.name)
-
-        # ✅ PDF Temporary Save
-        with open(temp_file_path, 'wb+') as temp_file:
-            for chunk in uploaded_file.chunks():
-                temp_file.write(chunk)
+        # ✅ Read the PDF where Django keeps it, no temporary copy
+        source = PdfSource.from_upload(uploaded_file)
 
         try:
-            # ✅ PDF Read
-            doc = fitz.open(temp_file_path)
-            full_text = ""
-            for page in doc:
-                full_text += page.get_text()
-            doc.close()
-            print("Extracted Data:", extracted_data)
-            print("Full Text Sample:", full_text[:2000])
-
-
-            # ✅ Extract Data
-            extracted_data = extract_myntra_labels(full_text)
-
-            if extracted_data:
-                df = pd.DataFrame(extracted_data)
+            export_format = requested_export_format(request)
+            # Repeat uploads of the same PDF are answered from the result cache
+            summary = ExtractionSummary("myntra")
+            # Server-Timing: time per stage (home/timing.py)
+            timer = StageTimer("myntra")
+            rows = cached_rows(source, "myntra", EXTRACTOR_VERSION,
+                               lambda source: iter_myntra_labels(summary.read(timer.iter(iter_page_texts(source), "text"))))
+            rows = timer.iter(summary.track(rows, MYNTRA_COLUMNS), "parse")
+            if requested_job_mode(request):
+                # Big uploads: extract in the background and answer with a job id right away
+                source.detach()
+                job = submit_job("myntra", rows, MYNTRA_COLUMNS, export_format, "myntra_labels")
+                return JsonResponse(job.as_dict(), status=202)
+            if export_format != "xlsx":
+                # ✅ CSV / JSONL stream while the PDF is still being read
+                response = export_response(rows, MYNTRA_COLUMNS, export_format, "myntra_labels",
+                                           on_close=lambda: timer.write_profile(summary))
+                if response is not None:
+                    return timer.add_header(response)
+                message = "❌ No label data found in PDF."
 
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            else:
+                # ✅ PDF Read + Extract Data, block by block, straight into Excel
                 with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx", dir=tempfile.gettempdir()) as tmp_file:
-                    df.to_excel(tmp_file.name, index=False)
-                    tmp_file.flush()
                     tmp_file_path = tmp_file.name
+                with timer.stage("export"):
+                    label_count = write_xlsx(rows, MYNTRA_COLUMNS, tmp_file_path)
+                timer.write_profile(summary)
 
-                message = f"✅ {len(extracted_data)} labels extracted successfully."
-                return FileResponse(open(tmp_file_path, 'rb'), as_attachment=True, filename="myntra_labels.xlsx")
+                if label_count:
+                    message = f"✅ {label_count} labels extracted successfully."
+                    response = FileResponse(open(tmp_file_path, 'rb'), as_attachment=True, filename="myntra_labels.xlsx")
+                    return timer.add_header(response)
 
-            else:
-                message = "❌ No label data found in PDF."
+                else:
+                    os.remove(tmp_file_path)
+                    message = "❌ No label data found in PDF."
 
         except Exception as e:
             message = f"❌ Error: {str(e)}"
 
-        finally:
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-
     return render(request, "upload_file.html", {"message": message})
 
 
 def extract_myntra_labels(full_text):
-    """📦 Extract Myntra label details"""
-    label_blocks = full_text.split("Customer Address")
-    extracted = []
-
-    for block in label_blocks[1:]:
-        block_text = "Customer Address" + block
-
-        # ✅ Extract Fields
-        customer_address = extract_customer_address(block_text)
-        order_date = extract_order_date(block_text)
-        invoice_date = extract_invoice_date(block_text)
-        gstin = extract_gstin(block_text)
-        awb = extract_awb(block_text)
-        pickup = extract_pickup(block_text)
-        product_info = extract_product_info(block_text)
-
-        extracted.append({
-            "SKU": product_info.get("sku", ""),
-            "Size": product_info.get("size", ""),
-            "Qty": product_info.get("qty", ""),
-            "Color": product_info.get("color", ""),
-            "Order No.": product_info.get("order_no", ""),
-            "Order Date": order_date,
-            "Invoice Date": invoice_date,
-            "GSTIN": gstin,
-            "AWB Number": awb,
-            "Pickup": pickup,
-            "Customer Address": customer_address
-        })
-
-    return extracted
+    """📦 Extract Myntra label details
+
+    ``full_text`` is the document text, or an iterable of page texts.
+    """
+    return list(iter_myntra_labels([full_text] if isinstance(full_text, str) else full_text))
+
+
+def iter_myntra_labels(page_texts):
+    """Yield one extracted row per "Customer Address" label block"""
+    for block_text in iter_marker_blocks(page_texts, "Customer Address"):
+        yield extract_myntra_label(block_text)
+
+
+@instrument.block_parser
+def extract_myntra_label(block_text):
+    """Extract every field of one Myntra label block"""
+    # ✅ Extract Fields
+    customer_address = extract_customer_address(block_text)
+    order_date = extract_order_date(block_text)
+    invoice_date = extract_invoice_date(block_text)
+    gstin = extract_gstin(block_text)
+    awb = extract_awb(block_text)
+    pickup = extract_pickup(block_text)
+    product_info = extract_product_info(block_text)
+
+    return LabelRecord(
+        marketplace="myntra",
+        order_id=product_info.get("order_no", ""),
+        sku=product_info.get("sku", ""),
+        size=product_info.get("size", ""),
+        color=product_info.get("color", ""),
+        qty=product_info.get("qty", ""),
+        order_date=order_date,
+        invoice_date=invoice_date,
+        gstin=gstin,
+        awb=awb,
+        courier=pickup,
+        customer_address=customer_address,
+    )
 
 
 # ✅ Helper Functions (Same as Meesho)
 def extract_customer_address(text):
-    match = re.search(
-        r"Customer Address\s*\n(.+?)(?:If undelivered|Prepaid|Invoice|Order|SKU)",
-        text, re.DOTALL | re.IGNORECASE
-    )
+    match = patterns.MYNTRA_CUSTOMER_ADDRESS.search(text)
     if match:
         lines = [l.strip() for l in match.group(1).strip().split("\n") if l.strip()]
         return ", ".join(lines)
     return ""
 
 def extract_order_date(text):
-    patterns = [
-        r"Order\s*Date\s*[:\-]?\s*(\d{2}/\d{2}/\d{4})",
-        r"Dispatch\s*on\s*(\d{2}-\d{2}-\d{4})"
-    ]
-    for p in patterns:
-        m = re.search(p, text, re.IGNORECASE)
+    for p in patterns.MYNTRA_ORDER_DATE_PATTERNS:
+        m = p.search(text)
         if m:
             return m.group(1)
     return ""
 
 def extract_invoice_date(text):
-    patterns = [r"Invoice\s*Date\s*[:\-]?\s*(\d{2}/\d{2}/\d{4})"]
-    for p in patterns:
-        m = re.search(p, text, re.IGNORECASE)
+    for p in patterns.MYNTRA_INVOICE_DATE_PATTERNS:
+        m = p.search(text)
         if m:
             return m.group(1)
     return ""
 
 
 def extract_gstin(text):
-    m = re.search(r"GSTIN\s*[:\-]?\s*([0-9A-Z]{15})", text)
+    m = patterns.MYNTRA_GSTIN.search(text)
     return m.group(1) if m else ""
 
 
 def extract_awb(text):
-    m = re.search(r"(?:AWB|Tracking)\s*(?:No\.?|Number)?[:\-]?\s*([A-Z0-9]{8,20})", text, re.IGNORECASE)
+    m = patterns.MYNTRA_AWB.search(text)
     return m.group(1) if m else ""
 
 
 def extract_pickup(text):
-    couriers = ["Delhivery", "XpressBees", "Ekart", "Ecom Express", "Shadowfax", "DTDC", "Blue Dart"]
-    for c in couriers:
-        if re.search(rf"\b{c}\b", text, re.IGNORECASE):
-            return c
-    return ""
+    return get_courier_matcher("myntra").find(text)
 
 
 def extract_product_info(text):
@@ -146,9 +163,9 @@ def extract_product_info(text):
     lines = text.splitlines()
 
     for line in lines:
-        if re.search(r"SKU.*Size.*Qty", line, re.IGNORECASE):
+        if patterns.MYNTRA_PRODUCT_HEADER.search(line):
             continue
-        if re.match(r"\S+", line) and len(line.split()) >= 4:
+        if patterns.MYNTRA_PRODUCT_LINE.match(line) and len(line.split()) >= 4:
             parts = line.split()
             sku = " ".join(parts[:-3])  # SKUમાં આખું value
             size, qty, color = parts[-3:]
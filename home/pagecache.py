@@ -0,0 +1,144 @@
+"""Page level cache of parsed label rows, for manifests that overlap.
+
+Today's manifest often repeats pages of yesterday's, which the whole-file
+result cache (home/resultcache.py) cannot see. Here each page is a "unit":
+the texts its rows are parsed from (the page itself, plus whatever following
+text a label on it runs into). Units are keyed on the SHA-256 of those texts,
+the marketplace and its extractor version, and the parsed rows are kept in a
+SQLite file bounded to ``LABEL_PAGE_CACHE_MAX_BYTES``; the least recently
+used units are evicted first.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+
+from home import metrics, regexguard
+from home.records import LabelRecord
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+UNIT_SEPARATOR = "\x1e"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_rows (
+    key TEXT PRIMARY KEY,
+    rows TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS page_rows_used ON page_rows (used);
+"""
+
+
+class PageReuse:
+    """How many pages of one request were parsed, and how many of those came from the cache"""
+
+    def __init__(self):
+        self.pages = 0
+        self.reused = 0
+
+    def __str__(self):
+        return f"{self.reused}/{self.pages}"
+
+
+def cache_path():
+    return getattr(settings, "LABEL_PAGE_CACHE_PATH", None) or os.path.join(tempfile.gettempdir(), "label_page_cache.sqlite3")
+
+
+def max_bytes():
+    value = getattr(settings, "LABEL_PAGE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+    return DEFAULT_MAX_BYTES if value is None else value
+
+
+def unit_key(unit, marketplace, version):
+    digest = hashlib.sha256(UNIT_SEPARATOR.join(unit).encode("utf-8", "surrogatepass")).hexdigest()
+    return f"{marketplace}-v{version}-{digest}"
+
+
+def connect():
+    path = cache_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30)
+    # WAL keeps readers unblocked and makes the per-page commits cheap
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def evict(connection, limit):
+    """Delete least recently used units until the cache fits in ``limit`` bytes."""
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM page_rows").fetchone()[0]
+    if total <= limit:
+        return
+    cursor = connection.execute("SELECT key, size FROM page_rows ORDER BY used")
+    stale = []
+    for key, size in cursor:
+        if total <= limit:
+            break
+        stale.append((key,))
+        total -= size
+    connection.executemany("DELETE FROM page_rows WHERE key = ?", stale)
+
+
+def iter_cached_units(units, marketplace, version, parse, report=None, unit_texts=None):
+    """Yield the rows of every unit, parsing only units not seen before.
+
+    ``units`` yields tuples of texts and ``parse(unit)`` returns that unit's
+    ``LabelRecord`` rows as a list. Units of another kind need ``unit_texts(unit)``,
+    the tuple of texts to key them on. ``report`` (a ``PageReuse``) is updated
+    as units go by. A ``LABEL_PAGE_CACHE_MAX_BYTES`` of 0 turns the cache off.
+    """
+    report = report if report is not None else PageReuse()
+    limit = max_bytes()
+    if not limit:
+        for unit in units:
+            report.pages += 1
+            yield from parse(unit)
+        return
+
+    connection = connect()
+    try:
+        for unit in units:
+            report.pages += 1
+            key = unit_key(unit if unit_texts is None else unit_texts(unit), marketplace, version)
+            now = time.time()
+            found = connection.execute("SELECT rows FROM page_rows WHERE key = ?", (key,)).fetchone()
+            metrics.CACHE_LOOKUPS.inc("page", marketplace, "miss" if found is None else "hit")
+            if found is not None:
+                report.reused += 1
+                connection.execute("UPDATE page_rows SET used = ? WHERE key = ?", (now, key))
+                rows = [LabelRecord.from_list(values) for values in json.loads(found[0])]
+            else:
+                warnings = regexguard.warning_count()
+                rows = parse(unit)
+                # A unit where a field was given up on is parsed again next time
+                if regexguard.warning_count() == warnings:
+                    encoded = json.dumps([row.to_list() for row in rows], ensure_ascii=False)
+                    connection.execute(
+                        "INSERT OR REPLACE INTO page_rows (key, rows, size, used) VALUES (?, ?, ?, ?)",
+                        (key, encoded, len(encoded) + len(key), now),
+                    )
+            # Commit before handing the rows out, so no lock is held while
+            # the caller writes them
+            connection.commit()
+            yield from rows
+        evict(connection, limit)
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def clear_cache():
+    """Remove every cached unit."""
+    connection = connect()
+    try:
+        connection.execute("DELETE FROM page_rows")
+        connection.commit()
+    finally:
+        connection.close()
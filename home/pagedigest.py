@@ -0,0 +1,71 @@
+"""A digest of everything a page's text depends on.
+
+The text MuPDF reads from a page is a function of the page object, the
+objects it references (content streams, resources, fonts, their
+ToUnicode maps, form XObjects, ...) and the attributes it inherits (page
+box, rotation). ``page_digest`` hashes exactly those: each object's source
+and raw stream bytes, recursively, leaving out the back references
+(``/Parent``, ``/P``) that would pull in the whole document.
+
+Two pages with the same digest give the same text, whichever file they
+were read from. That is what lets pages read from the first parts of a
+chunked upload (home/chunked.py) be reused once the whole file is there:
+a page whose objects were cut off, missing, or replaced by a later
+incremental update gets another digest and is read again.
+"""
+import hashlib
+import re
+
+
+REFERENCE = re.compile(r"(\d+) 0 R")
+BACK_REFERENCE = re.compile(r"/(?:Parent|P)\s+\d+\s+0\s+R")
+MISSING = b"missing"
+# Page tree levels searched for inherited resources (guards against a cycle)
+MAX_TREE_DEPTH = 32
+
+
+def object_digest(doc, xref, memo):
+    """Digest of object ``xref`` and everything it references; ``memo`` is shared per document."""
+    digest = memo.get(xref)
+    if digest is not None:
+        return digest
+    # Guard against reference cycles: an object met again while hashing is
+    # only counted by number
+    memo[xref] = str(xref).encode()
+    if not 0 < xref < doc.xref_length():
+        memo[xref] = MISSING
+        return MISSING
+    try:
+        source = doc.xref_object(xref, compressed=True)
+        stream = doc.xref_stream_raw(xref) if doc.xref_is_stream(xref) else None
+    except (RuntimeError, ValueError):
+        memo[xref] = MISSING
+        return MISSING
+    h = hashlib.sha256(source.encode("utf-8", "surrogatepass"))
+    if stream is not None:
+        h.update(stream)
+    for reference in REFERENCE.findall(BACK_REFERENCE.sub("", source)):
+        h.update(object_digest(doc, int(reference), memo))
+    digest = memo[xref] = h.digest()
+    return digest
+
+
+def page_digest(doc, page, memo):
+    """Hex digest of ``page``: its object closure plus its inherited box and rotation."""
+    h = hashlib.sha256(object_digest(doc, page.xref, memo))
+    h.update(repr((tuple(page.rect), tuple(page.cropbox), page.rotation)).encode())
+    # Resources can be inherited from the page tree
+    if doc.xref_get_key(page.xref, "Resources")[0] == "null":
+        parent = doc.xref_get_key(page.xref, "Parent")
+        for _ in range(MAX_TREE_DEPTH):
+            if parent[0] != "xref":
+                break
+            xref = int(parent[1].split()[0])
+            resources = doc.xref_get_key(xref, "Resources")
+            if resources[0] != "null":
+                h.update(resources[1].encode())
+                for reference in REFERENCE.findall(resources[1]):
+                    h.update(object_digest(doc, int(reference), memo))
+                break
+            parent = doc.xref_get_key(xref, "Parent")
+    return h.hexdigest()
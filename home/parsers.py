@@ -0,0 +1,32 @@
+"""The parser and output columns of every marketplace, for code that picks one at run time."""
+from home.amazon import AMAZON_COLUMNS, iter_amazon_rows
+from home.flipkart import FLIPKART_COLUMNS, iter_flipkart_labels
+from home.meesho import MEESHO_COLUMNS, iter_meesho_labels
+from home.myntra import MYNTRA_COLUMNS, extract_myntra_labels
+
+
+def parse_meesho(page_texts):
+    return list(iter_meesho_labels(page_texts))
+
+
+def parse_flipkart(page_texts):
+    return list(iter_flipkart_labels(page_texts))
+
+
+def parse_amazon(page_texts):
+    # Every page is one invoice; its product rows come from extract_amazon_table_data
+    return list(iter_amazon_rows(page_texts))
+
+
+# Marketplace -> (columns, parser from a list of page texts to a list of rows)
+PARSERS = {
+    "meesho": (MEESHO_COLUMNS, parse_meesho),
+    "myntra": (MYNTRA_COLUMNS, extract_myntra_labels),
+    "flipkart": (FLIPKART_COLUMNS, parse_flipkart),
+    "amazon": (AMAZON_COLUMNS, parse_amazon),
+}
+
+
+def parse_pages(marketplace, page_texts):
+    """Return the rows of ``page_texts`` parsed as ``marketplace`` labels."""
+    return PARSERS[marketplace][1](page_texts)
@@ -0,0 +1,161 @@
+"""Compiled regex registry shared by every marketplace extractor.
+
+Every pattern is compiled once at import so the per-label hot paths never go
+through ``re``'s small internal cache (which a big manifest keeps evicting).
+"""
+import re
+
+
+# ----------------- Common -----------------
+PINCODE = re.compile(r"(\d{6})")
+PINCODE_PREFIX = re.compile(r"(.*?\b(\d{6})\b)")
+
+
+# ----------------- Meesho -----------------
+MEESHO_CUSTOMER_ADDRESS = re.compile(
+    r"Customer Address\s*\n(.+?)(?:If undelivered, return to:|Prepaid|Invoice|TAX INVOICE|Order No\.|SKU|GSTIN)",
+    re.DOTALL | re.IGNORECASE
+)
+
+MEESHO_ORDER_DATE_PATTERNS = [
+    re.compile(r"Order\s*Date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+    re.compile(r"Order\s*Dt\.?\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+    re.compile(r"Order\s*Placed\s*On\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+    re.compile(r"Ordered\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+]
+
+MEESHO_INVOICE_DATE_PATTERNS = [
+    re.compile(r"Invoice\s*Date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+    re.compile(r"Invoice\s*Dt\.?\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+    re.compile(r"Invoice\s*Generated\s*On\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+    re.compile(r"Inv\.\s*Date\s*[:\-]?\s*(\d{1,2}[./-]\d{1,2}[./-]\d{2,4})", re.IGNORECASE),
+]
+
+MEESHO_GSTIN = re.compile(r"GSTIN\s*[:\-]?\s*([0-9A-Z]{15})", re.IGNORECASE)
+
+# AWB shapes based on the label examples, in priority order:
+# VL0081530070753 (VL + 13 digits)
+# SF1556751037FPL (SF + 10 digits + FPL)
+# M00831998289 (M + 11 digits)
+# 1490810673698592 (16 digits)
+AWB_FAMILIES = [
+    ("VL", r"[A-Z]{2}\d{10,15}"),
+    ("SF", r"[A-Z]{2}\d{10,13}[A-Z]{2,3}"),
+    ("M", r"[A-Z]\d{10,15}"),
+    ("numeric", r"\d{13,16}"),
+]
+
+# Every AWB label keyword, found in a single scan of the lower-cased block
+# (a case-sensitive scan is several times faster than an IGNORECASE one)
+AWB_LABEL = re.compile(r"awb|tracking|waybill|docket|lr")
+AWB_LABEL_ANYCASE = re.compile(r"AWB|Tracking|Waybill|Docket|LR", re.IGNORECASE)
+
+# Anchored "label tail + code" matchers tried right after a label keyword.
+# Entries are (label keywords allowed, family, tail pattern) in priority order:
+# AWB labels first, then Tracking labels, then any label keyword.
+MEESHO_AWB_LABELLED = [
+    (labels, family, re.compile(rf"\s*(?:{suffixes})?\s*[:\-]?\s*({shape})", re.IGNORECASE))
+    for labels, suffixes in [
+        ({"awb"}, r"No\.?|Number"),
+        ({"tracking"}, r"No\.?|ID"),
+        ({"awb", "tracking", "waybill", "docket", "lr"}, r"No\.?|Number|ID"),
+    ]
+    for family, shape in AWB_FAMILIES
+]
+
+# Unlabelled AWB codes: every family holds a run of 10+ digits, so only the
+# words around such runs are classified. Each alternative has to cover the
+# whole word, so the families cannot overlap.
+AWB_DIGIT_RUN = re.compile(r"\d{10,}")
+WORD_TAIL = re.compile(r"\w*")
+MEESHO_AWB_STANDALONE = re.compile(
+    "|".join(f"(?P<{family}>{shape})" for family, shape in AWB_FAMILIES),
+    re.IGNORECASE
+)
+
+AWB_VALID = re.compile(r"^(?:" + "|".join(shape for _, shape in AWB_FAMILIES) + r")$")
+
+MEESHO_QTY = re.compile(r'^\d+$')
+
+# ----------------- Myntra -----------------
+MYNTRA_CUSTOMER_ADDRESS = re.compile(
+    r"Customer Address\s*\n(.+?)(?:If undelivered|Prepaid|Invoice|Order|SKU)",
+    re.DOTALL | re.IGNORECASE
+)
+
+MYNTRA_ORDER_DATE_PATTERNS = [
+    re.compile(r"Order\s*Date\s*[:\-]?\s*(\d{2}/\d{2}/\d{4})", re.IGNORECASE),
+    re.compile(r"Dispatch\s*on\s*(\d{2}-\d{2}-\d{4})", re.IGNORECASE),
+]
+
+MYNTRA_INVOICE_DATE_PATTERNS = [
+    re.compile(r"Invoice\s*Date\s*[:\-]?\s*(\d{2}/\d{2}/\d{4})", re.IGNORECASE),
+]
+
+MYNTRA_GSTIN = re.compile(r"GSTIN\s*[:\-]?\s*([0-9A-Z]{15})")
+
+MYNTRA_AWB = re.compile(r"(?:AWB|Tracking)\s*(?:No\.?|Number)?[:\-]?\s*([A-Z0-9]{8,20})", re.IGNORECASE)
+
+MYNTRA_PRODUCT_HEADER = re.compile(r"SKU.*Size.*Qty", re.IGNORECASE)
+MYNTRA_PRODUCT_LINE = re.compile(r"\S+")
+
+
+# ----------------- Amazon -----------------
+AMAZON_TABLE_ROW = re.compile(
+    r"(\d+)\s+"  # SI No
+    r"(.*?)\s*"
+    r"\|\s*B0\w+\s*\([^)]+\)\s*"
+    r"HSN:\d+\s*"
+    r"₹([\d,]+\.\d{2})\s*"
+    r"(?:-₹([\d,]+\.\d{2})\s*)?"
+    r"(\d+)\s*"
+    r"₹([\d,]+\.\d{2})\s*"
+    r"(\d+%)\s*"
+    r"(IGST|CGST|SGST)\s*"
+    r"₹([\d,]+\.\d{2})\s*"
+    r"₹([\d,]+\.\d{2})",
+    re.DOTALL
+)
+
+AMAZON_AWB = re.compile(r"\bAWB\s+([A-Z0-9]{10,})")
+AMAZON_WEIGHT = re.compile(r"\b(?:Weight|Wt\.?)\s*[:\-]?\s*(\d+\.?\d*)\s*(?:kg|kgs)", re.IGNORECASE)
+AMAZON_ORDER_NUMBER = re.compile(r"Order Number:\s*(\d{3}-\d{7}-\d{7})")
+AMAZON_INVOICE_NUMBER = re.compile(r"Invoice Number\s*:\s*([A-Z0-9\-]+)")
+AMAZON_ORDER_DATE = re.compile(r"Order Date:\s*(\d{2}\.\d{2}\.\d{4})")
+AMAZON_INVOICE_DATE = re.compile(r"Invoice Date\s*:\s*(\d{2}\.\d{2}\.\d{4})")
+AMAZON_GSTIN = re.compile(r"GST Registration No:\s*([A-Z0-9]+)")
+AMAZON_SHIPPING_ADDRESS = re.compile(r"Shipping Address\s*:\s*(.*?)(?:Place of supply:|State/UT Code:|\Z)", re.DOTALL)
+
+
+# ----------------- Flipkart -----------------
+FLIPKART_ORDER_ID_SPLIT = re.compile(r"(OD\d{17,20})")
+
+FLIPKART_SKU_DESC = re.compile(r"SKU ID\s*\|\s*(.+?)\s*\|\s*(.+?)(?:\n|$|\s{2,})", re.DOTALL | re.IGNORECASE)
+FLIPKART_SKU_ID = re.compile(r"SKU ID\s*[:=]\s*(.+?)(?:\||\n|\r|\s{2,})", re.IGNORECASE)
+FLIPKART_SKU_DESC_QTY_NOISE = re.compile(r"(?i)description\s*QTY\s*\d+\s*")
+FLIPKART_SKU_QTY_NOISE = re.compile(r"(?i)QTY\s*\d+\s*")
+FLIPKART_DESCRIPTION = re.compile(
+    r"(?:Description\s*[:=]?\s*|SKU ID\s*\|\s*.+?\|\s*)(.+?)(?=\n\s*QTY|\n\s*FMPC|\n\s*FMPP|\n\s*Tax|\n\s*Order\s*Id:|\n\s*AWB\s*No\.?|\n\s*HBD:|\n\s*CPD:|$)",
+    re.DOTALL | re.IGNORECASE
+)
+FLIPKART_QTY = re.compile(r"QTY\s*(\d+)", re.IGNORECASE)
+FLIPKART_HBD = re.compile(r"HBD:\s*(\d{2}\s*-\s*\d{2})", re.IGNORECASE)
+FLIPKART_CPD = re.compile(r"CPD:\s*(\d{2}\s*-\s*\d{2})", re.IGNORECASE)
+FLIPKART_AWB = re.compile(r"AWB\s*No\.?\s*([A-Z0-9]+)", re.IGNORECASE)
+FLIPKART_GSTIN = re.compile(r"GSTIN:\s*([A-Z0-9]+)", re.IGNORECASE)
+FLIPKART_PRINTED_AT = re.compile(r"Printed at\s+\d{3,4}\s*hrs,\s*(\d{2}/\d{2}/\d{2})", re.IGNORECASE)
+FLIPKART_ADDRESS_BLOCK = re.compile(
+    r"Shipping/Customer address:\s*Name:\s*(.+?)\n(.*?)(?=(?:HBD:|Sold By:|GSTIN:))",
+    re.DOTALL | re.IGNORECASE
+)
+FLIPKART_ADDRESS_SIMPLE = re.compile(
+    r"Shipping/Customer address:\s*Name:\s*(.+?)(?=\n\n|\n\s*HBD:|\n\s*Sold By:|\n\s*GSTIN:)",
+    re.DOTALL | re.IGNORECASE
+)
+
+# Layout parser (home/flipkart.py): matched against single rows of words only
+FLIPKART_ORDER_ID = re.compile(r"OD\d{17,20}")
+FLIPKART_TABLE_HEADER = re.compile(r"SKU ID\s*\|", re.IGNORECASE)
+FLIPKART_ADDRESS_ANCHOR = re.compile(r"Shipping/Customer address:\s*", re.IGNORECASE)
+FLIPKART_NAME = re.compile(r"Name:\s*", re.IGNORECASE)
+FLIPKART_ADDRESS_STOP = re.compile(r"HBD:|Sold By:|GSTIN:", re.IGNORECASE)
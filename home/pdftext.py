@@ -0,0 +1,164 @@
+"""PDF page text extraction shared by the marketplace views.
+
+Big documents are split into page ranges that run on a process pool; every
+worker opens (memory-maps) the file itself, so only the path and the page
+texts (or words) cross the process boundary. An upload Django kept in
+memory has no path and goes over as bytes. Small documents (or hosts where a
+pool cannot be started) are read serially in the calling process.
+"""
+import os
+import threading
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from home import timing
+from home.pagedigest import page_digest
+from home.uploads import PdfSource, open_pdf
+
+
+DEFAULT_PARALLEL_MIN_PAGES = 50
+DEFAULT_PAGES_PER_CHUNK = 25
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def page_ranges(page_count, pages_per_chunk):
+    """Split ``range(page_count)`` into ``(start, end)`` chunks."""
+    return [(start, min(start + pages_per_chunk, page_count)) for start in range(0, page_count, pages_per_chunk)]
+
+
+def page_text(page):
+    return page.get_text()
+
+
+def page_words(page):
+    """``(x0, y0, x1, y1, word, ...)`` for every word of the page, for layout-aware parsers."""
+    return page.get_text("words")
+
+
+def _extract_range(source, start, end, read_page=page_text):
+    """Worker: open the PDF and return ``read_page`` of pages ``start``..``end - 1``."""
+    doc = open_pdf(source)
+    try:
+        return [read_page(doc.load_page(page_num)) for page_num in range(start, end)]
+    finally:
+        doc.close()
+
+
+def text_workers():
+    return getattr(settings, "PDF_TEXT_WORKERS", None) or os.cpu_count() or 1
+
+
+def get_pool():
+    """Return the shared process pool, starting it on first use."""
+    global _pool, _pool_workers
+    workers = text_workers()
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
+
+
+def reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def reader_key(read_page):
+    """Name of a page reader (a function or a partial of one), to file its results under."""
+    if isinstance(read_page, partial):
+        return f"{reader_key(read_page.func)}{read_page.args!r}{sorted(read_page.keywords.items())!r}"
+    return f"{read_page.__module__}.{read_page.__qualname__}"
+
+
+def _known_pages(doc, source, read_page):
+    """Yield the results already known for the leading pages of ``source``, up to the first unknown one.
+
+    A ``PdfSource`` assembled from a chunked upload carries the pages read
+    while its parts were arriving, filed by reader and ``page_digest``.
+    """
+    known = (getattr(source, "known_pages", None) or {}).get(reader_key(read_page))
+    if not known:
+        return
+    memo = {}
+    for page_num in range(doc.page_count):
+        digest = page_digest(doc, doc.load_page(page_num), memo)
+        if digest not in known:
+            return
+        yield known[digest]
+
+
+def iter_pages(source, read_page, parallel=True):
+    """Yield ``read_page(page)`` for every page of a PDF (a path or ``PdfSource``), in order.
+
+    ``read_page`` must be a module level function (or a partial of one) so the
+    pool can pickle it. ``parallel=False`` always reads in this process, for
+    callers that are already one worker of a pool.
+    """
+    with timing.stage("open"):
+        doc = open_pdf(source)
+    try:
+        page_count = doc.page_count
+        start = 0
+        for result in _known_pages(doc, source, read_page):
+            start += 1
+            yield result
+        workers = text_workers()
+        min_pages = getattr(settings, "PDF_TEXT_PARALLEL_MIN_PAGES", DEFAULT_PARALLEL_MIN_PAGES)
+        if not parallel or workers < 2 or page_count - start < max(min_pages, 2):
+            for page_num in range(start, page_count):
+                yield read_page(doc.load_page(page_num))
+            return
+    finally:
+        doc.close()
+
+    pages_per_chunk = getattr(settings, "PDF_TEXT_PAGES_PER_CHUNK", DEFAULT_PAGES_PER_CHUNK)
+    # Keep every worker busy even when the document is only a few chunks long
+    pages_per_chunk = max(1, min(pages_per_chunk, -(-(page_count - start) // workers)))
+    ranges = [(start + first, start + end) for first, end in page_ranges(page_count - start, pages_per_chunk)]
+    if isinstance(source, PdfSource) and source.path is None:
+        # Send the workers a path, not the whole PDF with every chunk
+        source.spill()
+    try:
+        futures = [get_pool().submit(_extract_range, source, first, end, read_page) for first, end in ranges]
+    except (OSError, BrokenProcessPool, NotImplementedError, RuntimeError):
+        # No usable pool on this host (e.g. no /dev/shm on serverless): go serial
+        reset_pool()
+        yield from _extract_range(source, start, page_count, read_page)
+        return
+
+    for index, future in enumerate(futures):
+        try:
+            results = future.result()
+        except BrokenProcessPool:
+            reset_pool()
+            first, _ = ranges[index]
+            yield from _extract_range(source, first, page_count, read_page)
+            return
+        yield from results
+
+
+def iter_page_texts(source, parallel=True):
+    """Yield the text of every page of a PDF (a path or ``PdfSource``), in order."""
+    return iter_pages(source, page_text, parallel)
+
+
+def iter_page_words(source, parallel=True):
+    """Yield the ``page_words`` of every page of a PDF (a path or ``PdfSource``), in order."""
+    return iter_pages(source, page_words, parallel)
+
+
+def extract_page_texts(source, parallel=True):
+    """Return the text of every page of a PDF (a path or ``PdfSource``) as a list."""
+    return list(iter_page_texts(source, parallel))
@@ -0,0 +1,182 @@
+"""Full call profile of one request, for the odd PDF that is slow in production.
+
+``ProfileMiddleware`` profiles a view when asked to:
+
+- ``?profile=pstats`` (or ``=1``) / ``?profile=speedscope`` from a staff user, or
+- an ``X-Label-Profile`` header equal to ``LABEL_PROFILE_TOKEN`` (for scripts;
+  the format still comes from ``?profile=``, default pstats).
+
+Anyone else's ``profile`` parameter is ignored. The view call runs under
+cProfile (``.pstats``, open it with ``python -m pstats`` or snakeviz) or
+pyinstrument (``.speedscope.json`` for https://speedscope.app; needs
+``pip install pyinstrument``, otherwise pstats is written). A streamed
+response is profiled while its content is produced too, and the artifact
+is written once it is done. The artifact goes to ``LABEL_PROFILE_DIR``
+(default: next to the ``LABEL_TIMING_PROFILE_DIR`` profiles, else the system
+temp dir) and its name is returned in ``X-Profile``.
+
+Pages read on the text pool are read in other processes: they show up as
+time waiting on futures. Set ``PDF_TEXT_WORKERS = 1`` to see them.
+
+One request is profiled at a time; a second one asking meanwhile is served
+unprofiled (``X-Profile: busy``). Requests that do not ask cost one lookup
+in their query string and headers.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"1": "pstats", "pstats": "pstats", "speedscope": "speedscope"}
+TOKEN_HEADER = "HTTP_X_LABEL_PROFILE"
+
+_busy = threading.Lock()
+
+
+def profile_dir():
+    return (getattr(settings, "LABEL_PROFILE_DIR", None)
+            or getattr(settings, "LABEL_TIMING_PROFILE_DIR", None)
+            or os.path.join(tempfile.gettempdir(), "label_profiles"))
+
+
+def requested_format(request):
+    """Return the profile format ``request`` may ask for, or None to run it as usual."""
+    token = getattr(settings, "LABEL_PROFILE_TOKEN", None)
+    header = request.META.get(TOKEN_HEADER)
+    if header is not None and token and hmac.compare_digest(header.encode(), token.encode()):
+        return FORMATS.get(request.GET.get("profile", "pstats"))
+    fmt = FORMATS.get(request.GET.get("profile"))
+    user = getattr(request, "user", None)
+    if fmt and user is not None and user.is_staff:
+        return fmt
+    return None
+
+
+class _CProfiler:
+    suffix = ".pstats"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def save(self, path):
+        self.profile.dump_stats(path)
+
+
+class _Pyinstrument:
+    suffix = ".speedscope.json"
+
+    def __init__(self):
+        from pyinstrument import Profiler
+
+        self.profiler = Profiler()
+
+    def start(self):
+        self.profiler.start()
+
+    def stop(self):
+        self.profiler.stop()
+
+    def save(self, path):
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        with open(path, "w") as artifact:
+            artifact.write(self.profiler.output(renderer=SpeedscopeRenderer()))
+
+
+def make_profiler(fmt):
+    if fmt == "speedscope":
+        try:
+            return _Pyinstrument()
+        except ImportError:
+            logger.warning("pyinstrument is not installed, writing a pstats profile instead")
+    return _CProfiler()
+
+
+class ProfileMiddleware:
+    """Profile the view call (and streamed content) of requests that ask for it"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if "profile" not in request.GET and TOKEN_HEADER not in request.META:
+            return None
+        fmt = requested_format(request)
+        if fmt is None:
+            return None
+        if not _busy.acquire(blocking=False):
+            response = view_func(request, *view_args, **view_kwargs)
+            response["X-Profile"] = "busy"
+            return response
+
+        profiler = make_profiler(fmt)
+        name = request.resolver_match.url_name if request.resolver_match else view_func.__name__
+        path = os.path.join(profile_dir(), f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{uuid.uuid4().hex[:8]}{profiler.suffix}")
+        profiler.start()
+        try:
+            response = view_func(request, *view_args, **view_kwargs)
+        except BaseException:
+            profiler.stop()
+            _save(profiler, path)
+            raise
+        profiler.stop()
+
+        if getattr(response, "streaming", False):
+            # Django calls close() when the response is done, iterated or not
+            response.streaming_content = _ProfiledContent(response.streaming_content, profiler, path)
+        else:
+            _save(profiler, path)
+        response["X-Profile"] = os.path.basename(path)
+        return response
+
+
+def _save(profiler, path):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        profiler.save(path)
+        logger.info("🔬 Profile written to %s", path)
+    finally:
+        _busy.release()
+
+
+class _ProfiledContent:
+    """Streamed content, profiled while each chunk is produced; the profile is saved on close"""
+
+    def __init__(self, chunks, profiler, path):
+        self.chunks = iter(chunks)
+        self.profiler = profiler
+        self.path = path
+        self.saved = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.profiler.start()
+        try:
+            return next(self.chunks)
+        finally:
+            self.profiler.stop()
+
+    def close(self):
+        if not self.saved:
+            self.saved = True
+            _save(self.profiler, self.path)
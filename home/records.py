@@ -0,0 +1,119 @@
+"""The one record type every extractor fills.
+
+Before, each module built dicts with its own keys ("AWB Number" vs
+"AWB No.", "Qty" vs "QTY", ...), so every label carried a dict with a dozen
+repeated string keys. A ``LabelRecord`` keeps the fields all marketplaces
+share in slots, and the few marketplace-only values (Flipkart HBD/CPD,
+Amazon invoice amounts) in an ``extras`` tuple whose order is given by
+``EXTRA_COLUMNS``. Records still answer ``record.get(column)`` for every
+column name the marketplaces used, so the exporters and the existing column
+lists keep working unchanged.
+"""
+from dataclasses import dataclass
+from operator import attrgetter
+
+
+# Column names (normalized and per-marketplace) -> LabelRecord field
+COLUMN_FIELDS = {
+    "Marketplace": "marketplace",
+    "Order ID": "order_id",
+    "Order No.": "order_id",
+    "SKU": "sku",
+    "SKU ID": "sku",
+    "Description": "description",
+    "Size": "size",
+    "Color": "color",
+    "Qty": "qty",
+    "QTY": "qty",
+    "Order Date": "order_date",
+    "Invoice Date": "invoice_date",
+    "GSTIN": "gstin",
+    "AWB Number": "awb",
+    "AWB No.": "awb",
+    "Courier": "courier",
+    "Pickup": "courier",
+    "Pickup Partner": "courier",
+    "Customer Address": "customer_address",
+    "Shipping/Customer address": "customer_address",
+    "Address": "customer_address",
+    "Pincode": "pincode",
+}
+
+# Marketplace -> the columns kept in ``extras``, in order
+EXTRA_COLUMNS = {
+    "meesho": (),
+    "myntra": (),
+    "flipkart": ("Print Data", "HBD", "CPD"),
+    "amazon": (
+        "Invoice No", "Buyer Name", "Weight", "SI No", "Unit Price", "Discount",
+        "Net Amount", "Tax Rate", "Tax Type", "Tax Amount", "Total Amount",
+    ),
+}
+_EXTRA_INDEX = {
+    marketplace: {column: index for index, column in enumerate(columns)}
+    for marketplace, columns in EXTRA_COLUMNS.items()
+}
+
+
+@dataclass(slots=True)
+class LabelRecord:
+    """One extracted label (or, for Amazon, one invoice product row)"""
+
+    marketplace: str
+    order_id: str = ""
+    sku: str = ""
+    description: str = ""
+    size: str = ""
+    color: str = ""
+    qty: str = ""
+    order_date: str = ""
+    invoice_date: str = ""
+    gstin: str = ""
+    awb: str = ""
+    courier: str = ""
+    customer_address: str = ""
+    pincode: str = ""
+    extras: tuple = None
+
+    def get(self, column, default=""):
+        """Return the value of ``column`` (any marketplace's name for it), or ``default``."""
+        field = COLUMN_FIELDS.get(column)
+        if field is not None:
+            return getattr(self, field)
+        index = _EXTRA_INDEX[self.marketplace].get(column)
+        if index is None or self.extras is None:
+            return default
+        return self.extras[index]
+
+    def __getitem__(self, column):
+        value = self.get(column, KeyError)
+        if value is KeyError:
+            raise KeyError(column)
+        return value
+
+    def to_dict(self, columns):
+        """Return ``{column: value}`` for ``columns``."""
+        return {column: self.get(column) for column in columns}
+
+    def to_list(self):
+        """Return the field values as a JSON friendly list (see ``from_list``)."""
+        return [getattr(self, field) for field in FIELD_NAMES[:-1]] + [list(self.extras) if self.extras else None]
+
+    @classmethod
+    def from_list(cls, values):
+        *fields, extras = values
+        return cls(*fields, tuple(extras) if extras else None)
+
+
+FIELD_NAMES = LabelRecord.__slots__
+
+
+def column_getter(marketplace, column):
+    """Return a function reading ``column`` from a ``marketplace`` record, for column-wise loops."""
+    field = COLUMN_FIELDS.get(column)
+    if field is not None:
+        return attrgetter(field)
+    index = _EXTRA_INDEX[marketplace].get(column)
+    if index is None:
+        return lambda record: ""
+    return lambda record: record.extras[index] if record.extras else ""
@@ -0,0 +1,215 @@
+"""Timing and a time budget for the label patterns that can backtrack.
+
+A few patterns scan a whole label block with lazy DOTALL groups (the Amazon
+table row, the Flipkart description and address, the Meesho customer
+address). On a malformed block, say with a missing stop word or pages of
+noise, they can backtrack for seconds and stall the worker parsing it.
+
+Those call sites go through ``search`` / ``finditer`` here, under a name.
+Every call is timed (count, total, p99 and max per name, see
+``pattern_stats``). The calls made while one block is parsed (one call of a
+``@budgeted`` parser, or a ``with block_budget()``) share
+``LABEL_REGEX_BLOCK_BUDGET_SECONDS``. Once that is spent a field is given
+up: the call returns no match and a parse warning is recorded, so the label
+comes out with that field empty instead of hanging the request. Rows parsed with a warning are not stored in the result or page
+cache.
+
+A call already running can only be cut short in the main thread, where a
+SIGALRM timer interrupts the regex engine (unless something else already
+handles SIGALRM). In other threads (runserver's
+request threads, background jobs) the budget is checked between calls: the
+call runs to its end, and the block's remaining guarded fields are skipped.
+"""
+import contextlib
+import functools
+import logging
+import signal
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+
+DEFAULT_BLOCK_BUDGET_SECONDS = 0.5
+# Durations kept per pattern for the p99, and parse warnings kept in total
+SAMPLES = 1000
+RECENT_WARNINGS = 50
+
+logger = logging.getLogger(__name__)
+
+_stats = {}
+_warnings = deque(maxlen=RECENT_WARNINGS)
+_stats_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _PatternStats:
+    __slots__ = ("count", "total", "given_up", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.given_up = 0
+        self.samples = deque(maxlen=SAMPLES)
+
+
+def budget_seconds():
+    value = getattr(settings, "LABEL_REGEX_BLOCK_BUDGET_SECONDS", DEFAULT_BLOCK_BUDGET_SECONDS)
+    return value or None
+
+
+def _start_block():
+    previous = getattr(_local, "deadline", None)
+    budget = budget_seconds()
+    _local.deadline = time.perf_counter() + budget if budget else float("inf")
+    return previous
+
+
+@contextlib.contextmanager
+def block_budget():
+    """Share one time budget between the guarded calls made inside the ``with`` block."""
+    previous = _start_block()
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def budgeted(parse):
+    """Decorator: every call of ``parse`` is one block with a budget of its own.
+
+    Same as ``block_budget()``, without a generator per call on the hot path.
+    """
+    @functools.wraps(parse)
+    def wrapper(*args, **kwargs):
+        previous = _start_block()
+        try:
+            return parse(*args, **kwargs)
+        finally:
+            _local.deadline = previous
+    return wrapper
+
+
+def warning_count():
+    """Number of fields given up in this thread so far (compare before and after a parse)."""
+    return getattr(_local, "warnings", 0)
+
+
+def _on_alarm(signum, frame):
+    raise _Timeout()
+
+
+def _interruptible():
+    """Whether a running call can be cut short: main thread, and SIGALRM not used by anyone else.
+
+    Decided once per thread; the main thread takes SIGALRM over the first
+    time it needs it, when no handler is set.
+    """
+    interruptible = getattr(_local, "interruptible", None)
+    if interruptible is None:
+        interruptible = False
+        if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+            handler = signal.getsignal(signal.SIGALRM)
+            if handler is signal.SIG_DFL:
+                signal.signal(signal.SIGALRM, _on_alarm)
+            interruptible = signal.getsignal(signal.SIGALRM) is _on_alarm
+        _local.interruptible = interruptible
+    return interruptible
+
+
+def _call_with_timer(call, text, seconds):
+    """Run ``call(text)``, raising ``_Timeout`` after ``seconds`` (main thread only)."""
+    previous = signal.setitimer(signal.ITIMER_REAL, seconds)
+    if previous[0]:
+        # Someone else's timer was running: put it back and leave it alone
+        signal.setitimer(signal.ITIMER_REAL, *previous)
+        return call(text)
+    try:
+        return call(text)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _run(name, call, text, no_match):
+    deadline = getattr(_local, "deadline", None)
+    if deadline is None:
+        # Outside a block: the call gets a budget of its own
+        budget = budget_seconds()
+        deadline = time.perf_counter() + budget if budget else float("inf")
+
+    start = time.perf_counter()
+    remaining = deadline - start
+    result = no_match
+    given_up = remaining <= 0
+    if not given_up:
+        try:
+            if remaining != float("inf") and _interruptible():
+                result = _call_with_timer(call, text, remaining)
+            else:
+                result = call(text)
+        except _Timeout:
+            given_up = True
+    elapsed = time.perf_counter() - start
+
+    with _stats_lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = _PatternStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.samples.append(elapsed)
+        if given_up:
+            stats.given_up += 1
+            _warnings.append({
+                "pattern": name,
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "block_start": text[:80],
+                "at": time.time(),
+            })
+    if given_up:
+        _local.warnings = warning_count() + 1
+        logger.warning("⏱️ Gave up on %s after %.1f ms, field left empty", name, elapsed * 1000)
+    return result
+
+
+def search(name, pattern, text):
+    """``pattern.search(text)``, timed under ``name``; None when the budget ran out."""
+    return _run(name, pattern.search, text, None)
+
+
+def finditer(name, pattern, text):
+    """``pattern.finditer(text)`` as a list, timed under ``name``; empty when the budget ran out."""
+    return _run(name, lambda text: list(pattern.finditer(text)), text, [])
+
+
+def pattern_stats():
+    """Return the timings of every guarded pattern in this process, and the recent parse warnings."""
+    with _stats_lock:
+        patterns = {}
+        for name, stats in sorted(_stats.items()):
+            samples = sorted(stats.samples)
+            patterns[name] = {
+                "count": stats.count,
+                "total_ms": round(stats.total * 1000, 3),
+                "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 3),
+                "max_ms": round(samples[-1] * 1000, 3),
+                "given_up": stats.given_up,
+            }
+        warnings = list(_warnings)
+    return {
+        "budget_seconds": budget_seconds(),
+        "patterns": patterns,
+        "warnings": warnings,
+    }
+
+
+def reset_stats():
+    """Forget every timing and warning."""
+    with _stats_lock:
+        _stats.clear()
+        _warnings.clear()
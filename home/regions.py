@@ -0,0 +1,110 @@
+"""Read only the parts of a page a parser needs.
+
+An Amazon invoice page carries the seller and billing blocks, the amount in
+words, the signature and a page of legal text besides the order header,
+shipping address and item table the parser reads. A region template lists
+the rectangles worth reading (as fractions of the page, so one template fits
+A4 and Letter), each with the patterns that must be found in it. Every text
+block of the page goes to the first region holding its centre, so a block on
+a boundary is read once, and blocks outside every region are dropped before
+any pattern sees them.
+
+The blocks come from one unclipped ``TextPage``: MuPDF interprets the whole
+content stream either way, ``get_text(clip=...)`` measured slower than
+reading all blocks, and one clip per region reads a line crossing two
+regions twice.
+
+When a region misses one of its patterns (a longer table, another invoice
+layout) the template does not fit that page and its full text is read
+instead; ``RegionReport`` counts how often that happens.
+"""
+import re
+from functools import partial
+
+import fitz  # PyMuPDF
+from django.conf import settings
+
+from home.pdftext import iter_page_texts, iter_pages
+
+
+# Marketplace -> ((region name, (x0, y0, x1, y1) page fractions, required patterns), ...)
+DEFAULT_TEMPLATES = {
+    "amazon": (
+        ("header", (0.0, 0.0, 1.0, 0.45), (r"Order Number:", r"Shipping Address\s*:")),
+        ("items", (0.0, 0.45, 1.0, 0.85), (r"TOTAL:",)),
+    ),
+}
+
+
+class RegionReport:
+    """How many pages of one request were read, and how many fell back to the full text"""
+
+    def __init__(self):
+        self.pages = 0
+        self.fallbacks = 0
+
+    def __str__(self):
+        return f"{self.fallbacks}/{self.pages}"
+
+
+def configured_template(marketplace):
+    """Return the template of ``marketplace`` as configured (patterns not compiled), or None.
+
+    ``LABEL_REGION_TEMPLATES`` overrides ``DEFAULT_TEMPLATES`` per
+    marketplace; mapping a marketplace to None turns clipping off for it.
+    """
+    templates = {**DEFAULT_TEMPLATES, **(getattr(settings, "LABEL_REGION_TEMPLATES", None) or {})}
+    return templates.get(marketplace) or None
+
+
+def region_template(marketplace):
+    """Return the compiled template of ``marketplace``, or None to read whole pages."""
+    template = configured_template(marketplace)
+    if not template:
+        return None
+    return tuple(
+        (name, tuple(rect), tuple(re.compile(pattern) for pattern in required))
+        for name, rect, required in template
+    )
+
+
+def read_regions(page, template):
+    """Return ``(text, True)`` read from the template's regions, or ``(full page text, False)``."""
+    width, height = page.rect.width, page.rect.height
+    rects = [(x0 * width, y0 * height, x1 * width, y1 * height) for _, (x0, y0, x1, y1), _ in template]
+
+    # Same flags as page.get_text(), so the joined blocks are its text
+    blocks = [
+        block for block in page.get_textpage(flags=fitz.TEXTFLAGS_TEXT).extractBLOCKS()
+        if block[6] == 0
+    ]
+    texts = [[] for _ in rects]
+    for x0, y0, x1, y1, text, _, _ in blocks:
+        x, y = (x0 + x1) / 2, (y0 + y1) / 2
+        for region, (left, top, right, bottom) in zip(texts, rects):
+            if left <= x < right and top <= y < bottom:
+                region.append(text)
+                break
+
+    region_texts = ["".join(region) for region in texts]
+    for (_, _, required), text in zip(template, region_texts):
+        if not all(pattern.search(text) for pattern in required):
+            return "".join(block[4] for block in blocks), False
+    return "".join(region_texts), True
+
+
+def iter_region_texts(source, marketplace, report=None, parallel=True):
+    """Yield the text of every page, read through ``marketplace``'s region template when it has one."""
+    report = report if report is not None else RegionReport()
+    template = region_template(marketplace)
+    if template is None:
+        for text in iter_page_texts(source, parallel):
+            report.pages += 1
+            yield text
+        return
+
+    for text, clipped in iter_pages(source, partial(read_regions, template=template), parallel):
+        report.pages += 1
+        if not clipped:
+            report.fallbacks += 1
+        yield text
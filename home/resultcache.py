@@ -0,0 +1,191 @@
+"""Disk cache of extracted rows, keyed on the content of the uploaded PDF.
+
+Staff often upload the same manifest several times. The key is the SHA-256 of
+the PDF bytes, the marketplace, its extractor version and the settings its
+parser reads (region template, couriers), so a repeat upload replays the
+stored rows without opening the PDF at all, and bumping a module's
+``EXTRACTOR_VERSION`` or changing those settings retires its old entries.
+Entries are JSON Lines files (one record per line) in
+``LABEL_RESULT_CACHE_DIR``; the least recently used ones are evicted once the
+directory grows past ``LABEL_RESULT_CACHE_MAX_BYTES``.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+from home import metrics, regexguard, timing
+from home.couriers import configured_couriers
+from home.regions import configured_template
+from home.records import LabelRecord
+from home.uploads import PdfSource
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = ".jsonl"
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+_evict_lock = threading.Lock()
+
+
+def cache_dir():
+    return getattr(settings, "LABEL_RESULT_CACHE_DIR", None) or os.path.join(tempfile.gettempdir(), "label_result_cache")
+
+
+def max_bytes():
+    value = getattr(settings, "LABEL_RESULT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+    return DEFAULT_MAX_BYTES if value is None else value
+
+
+def file_sha256(file_path):
+    """Return the hex SHA-256 of the file at ``file_path``."""
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def source_sha256(source):
+    """Return the hex SHA-256 of a PDF given as a path or ``PdfSource``."""
+    if isinstance(source, PdfSource):
+        return source.sha256()
+    return file_sha256(source)
+
+
+def settings_digest(marketplace):
+    """Short digest of the settings that change ``marketplace``'s rows for the same PDF."""
+    parser_settings = {
+        "regions": configured_template(marketplace),
+        "couriers": configured_couriers(marketplace),
+    }
+    return hashlib.sha256(json.dumps(parser_settings, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def cache_key(digest, marketplace, version):
+    return f"{marketplace}-v{version}-{settings_digest(marketplace)}-{digest}"
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _entries(directory):
+    """Return ``(mtime, size, path)`` for every finished entry."""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _evict(directory, limit):
+    """Remove least recently used entries until the cache fits in ``limit`` bytes."""
+    with _evict_lock:
+        entries = sorted(_entries(directory))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            _count("evictions")
+
+
+def _replay(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield LabelRecord.from_list(json.loads(line))
+
+
+def _record(rows, directory, path, limit):
+    """Yield ``rows`` while writing them to a new entry at ``path``.
+
+    The entry is only kept when every row was produced: an abandoned or
+    failed extraction leaves nothing behind, and neither does one where a
+    field was given up on (``home/regexguard.py``).
+    """
+    warnings = regexguard.warning_count()
+    os.makedirs(directory, exist_ok=True)
+    handle, partial_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    finished = False
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row.to_list(), ensure_ascii=False) + "\n")
+                yield row
+        if regexguard.warning_count() != warnings:
+            return
+        os.replace(partial_path, path)
+        finished = True
+        _count("stores")
+        _evict(directory, limit)
+    finally:
+        if not finished and os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+def cached_rows(source, marketplace, version, extract):
+    """Yield the rows of a PDF (a path or ``PdfSource``), from the cache when possible.
+
+    ``extract(source)`` produces the rows on a miss; they are stored as
+    they stream past. A ``LABEL_RESULT_CACHE_MAX_BYTES`` of 0 turns caching off.
+    """
+    limit = max_bytes()
+    if not limit:
+        yield from extract(source)
+        return
+
+    directory = cache_dir()
+    with timing.stage("hash"):
+        digest = source_sha256(source)
+    path = os.path.join(directory, cache_key(digest, marketplace, version) + ENTRY_SUFFIX)
+    try:
+        # Refresh the mtime: it is the LRU clock
+        os.utime(path)
+    except FileNotFoundError:
+        _count("misses")
+        metrics.CACHE_LOOKUPS.inc("result", marketplace, "miss")
+        yield from _record(extract(source), directory, path, limit)
+        return
+
+    _count("hits")
+    metrics.CACHE_LOOKUPS.inc("result", marketplace, "hit")
+    yield from _replay(path)
+
+
+def cache_stats():
+    """Return the hit/miss counters of this process and the size of the cache."""
+    with _stats_lock:
+        stats = dict(_stats)
+    directory = cache_dir()
+    entries = _entries(directory) if os.path.isdir(directory) else []
+    lookups = stats["hits"] + stats["misses"]
+    stats.update({
+        "hit_ratio": round(stats["hits"] / lookups, 4) if lookups else None,
+        "entries": len(entries),
+        "bytes": sum(size for _, size, _ in entries),
+        "max_bytes": max_bytes(),
+    })
+    return stats
+
+
+def clear_cache():
+    """Remove every entry and reset the counters."""
+    directory = cache_dir()
+    if os.path.isdir(directory):
+        for _, _, path in _entries(directory):
+            os.remove(path)
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
@@ -1,3 +1,879 @@
-from django.test import TestCase
+import contextlib
+import io
+import json
+import os
+import pickle
+import pstats
+import re
+import shutil
+import tempfile
+from datetime import date
 
-# Create your tests here.
+import fitz  # PyMuPDF
+import openpyxl
+
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, override_settings
+
+from home import flipkart, meesho, myntra, patterns, pdftext
+from home.blocks import iter_marker_blocks, iter_pattern_blocks
+from home.export import iter_csv, iter_jsonl, normalize_row, write_parquet, write_xlsx
+from home.couriers import CourierMatcher
+from home.columnar import ColumnarBatch
+from home.records import LabelRecord
+from home.uploads import PdfSource
+from home import chunked, detect, jobs, layout, metrics, mixed, pagecache, regexguard, regions, resultcache, timing
+
+
+MEESHO_BLOCK = (
+    "Customer Address\n"
+    "Asha Patel\n"
+    "12 Ring Road\n"
+    "Surat, Gujarat, 395002\n"
+    "If undelivered, return to:\n"
+    "Seller Pvt Ltd\n"
+    "Delhivery\n"
+    "AWB No: VL0081530070753\n"
+    "Product Details\n"
+    "SKU\nSize\nQty\nColor\nOrder No.\n"
+    "KURTI-12 Free Size 1 Blue 123456789012345_1\n"
+    "\n"
+    "TAX INVOICE\n"
+    "GSTIN: 24ABCDE1234F1Z5\n"
+    "Order Date: 11.07.2025\n"
+    "Invoice Date: 12.07.2025\n"
+)
+
+
+class PatternRegistryTests(SimpleTestCase):
+    def test_registry_is_precompiled(self):
+        for name, value in vars(patterns).items():
+            if name.endswith("_PATTERNS"):
+                for item in value:
+                    pattern = item[1] if isinstance(item, tuple) else item
+                    self.assertIsInstance(pattern, patterns.re.Pattern, name)
+
+    def test_meesho_block_fields(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            awb = meesho.extract_awb_number(MEESHO_BLOCK)
+        self.assertEqual(awb, "VL0081530070753")
+        self.assertEqual(meesho.extract_customer_address(MEESHO_BLOCK), "Asha Patel, 12 Ring Road, Surat, Gujarat, 395002")
+        self.assertEqual(meesho.extract_order_date(MEESHO_BLOCK), "11.07.2025")
+        self.assertEqual(meesho.extract_invoice_date(MEESHO_BLOCK), "12.07.2025")
+        self.assertEqual(meesho.extract_gstin(MEESHO_BLOCK), "24ABCDE1234F1Z5")
+        self.assertEqual(meesho.extract_pickup_partner(MEESHO_BLOCK), "Delhivery")
+        self.assertEqual(meesho.extract_product_info(MEESHO_BLOCK), {
+            "sku": "KURTI-12", "size": "Free Size", "qty": "1", "color": "Blue", "order_no": "123456789012345_1",
+        })
+
+    def test_missing_customer_address_is_empty(self):
+        self.assertEqual(meesho.extract_customer_address("Customer Address"), "")
+
+    def test_myntra_helpers_use_registry(self):
+        self.assertEqual(myntra.extract_gstin(MEESHO_BLOCK), "24ABCDE1234F1Z5")
+        self.assertEqual(myntra.extract_pickup(MEESHO_BLOCK), "Delhivery")
+
+
+class AwbScannerTests(SimpleTestCase):
+    def awb(self, text):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return meesho.extract_awb_number(text)
+
+    def test_labelled_priority_matches_old_cascade(self):
+        # The VL-shaped AWB pattern ran first, so SF codes keep being cut short
+        self.assertEqual(self.awb("AWB No: SF1556751037FPL"), "SF1556751037")
+        self.assertEqual(self.awb("Tracking ID: M00831998289\nAWB 1490810673698592"), "1490810673698592")
+        self.assertEqual(self.awb("Docket No. m00831998289"), "m00831998289")
+
+    def test_standalone_families_in_priority_order(self):
+        text = "ref 1490810673698592 code M00831998289 box SF1556751037FPL"
+        self.assertEqual(self.awb(text), "SF1556751037FPL")
+        self.assertEqual(
+            list(meesho.scan_awb_candidates(text)),
+            [("SF", "SF1556751037FPL", False), ("M", "M00831998289", False), ("numeric", "1490810673698592", False)],
+        )
+
+    def test_no_awb(self):
+        self.assertEqual(self.awb("Order No. 123456789012345678_1 LR"), "")
+
+
+class CourierMatcherTests(SimpleTestCase):
+    def test_priority_not_position_decides(self):
+        matcher = CourierMatcher(["DTDC", "Blue Dart", "DTDC Express"])
+        self.assertEqual(matcher.find("via dtdc express / Blue Dart"), "DTDC")
+        self.assertEqual(matcher.find("BLUE DART and DTDCExpress"), "Blue Dart")
+        self.assertEqual(matcher.find("DTDCX"), "")
+
+    @override_settings(LABEL_COURIERS={"meesho": ["Valmo", "Delhivery"]})
+    def test_couriers_come_from_settings(self):
+        self.assertEqual(meesho.extract_pickup_partner("Delhivery Valmo"), "Valmo")
+
+
+def make_layout_pdf(pages):
+    """Write a PDF with one page per list of ``(x, y, text)`` lines and return its path."""
+    doc = fitz.open()
+    for lines in pages:
+        page = doc.new_page()
+        for x, y, text in lines:
+            page.insert_text((x, y), text, fontsize=8)
+    handle, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+FLIPKART_LABEL = [
+    (36, 40, "OD123456789012345678"),
+    (36, 60, "Shipping/Customer address:"),
+    (36, 72, "Name: Asha Patel,"),
+    (36, 84, "12 Ring Road"),
+    (36, 96, "Surat - 395002, Gujarat"),
+    (36, 120, "HBD: 12 - 07 CPD: 13 - 07"),
+    (36, 132, "Sold By: Seller Pvt Ltd, GSTIN: 24ABCDE1234F1Z5"),
+    (330, 60, "PREPAID"),
+    (330, 72, "AWB No. FMPC1234567890"),
+    (36, 160, "SKU ID | Description"),
+    (520, 160, "QTY"),
+    (524, 172, "2"),
+    (36, 172, "KURTI-12 | Blue cotton kurti"),
+    (36, 200, "Printed at 1203 hrs, 11/07/25"),
+]
+
+
+def make_text_pdf(page_texts):
+    """Write a PDF with one page per text and return its path."""
+    doc = fitz.open()
+    for text in page_texts:
+        doc.new_page().insert_text((36, 48), text, fontsize=8)
+    handle, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(handle)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+class PageTextTests(SimpleTestCase):
+    def setUp(self):
+        self.path = make_text_pdf([f"Page {number}\nCustomer Address" for number in range(7)])
+        self.addCleanup(os.remove, self.path)
+
+    def test_page_ranges(self):
+        self.assertEqual(pdftext.page_ranges(7, 3), [(0, 3), (3, 6), (6, 7)])
+
+    def test_parallel_matches_serial_order(self):
+        with self.settings(PDF_TEXT_WORKERS=1):
+            serial = pdftext.extract_page_texts(self.path)
+        with self.settings(PDF_TEXT_WORKERS=2, PDF_TEXT_PARALLEL_MIN_PAGES=0, PDF_TEXT_PAGES_PER_CHUNK=2):
+            parallel = pdftext.extract_page_texts(self.path)
+        self.assertEqual(len(serial), 7)
+        self.assertTrue(serial[3].startswith("Page 3"))
+        self.assertEqual(parallel, serial)
+
+
+class LabelBlockTests(SimpleTestCase):
+    def test_marker_blocks_match_split_across_pages(self):
+        pages = ["intro Customer Ad", "dress one\nCust", "omer Address two", "", "Customer Address"]
+        full_text = "".join(pages)
+        expected = ["Customer Address" + block for block in full_text.split("Customer Address")[1:]]
+        self.assertEqual(list(iter_marker_blocks(pages, "Customer Address")), expected)
+
+    def test_pattern_blocks_match_re_split_across_pages(self):
+        pages = ["head OD1234567890", "1234567 first\n", "OD12345678901234567890", "\nsecond OD123"]
+        full_text = "".join(pages)
+        parts = patterns.FLIPKART_ORDER_ID_SPLIT.split(full_text)
+        self.assertEqual(
+            list(iter_pattern_blocks(pages, patterns.FLIPKART_ORDER_ID_SPLIT)),
+            list(zip(parts[1::2], parts[2::2])),
+        )
+
+    def test_myntra_accepts_text_or_pages(self):
+        pages = [MEESHO_BLOCK[:40], MEESHO_BLOCK[40:] + MEESHO_BLOCK]
+        self.assertEqual(myntra.extract_myntra_labels(pages), myntra.extract_myntra_labels("".join(pages)))
+        self.assertEqual(len(myntra.extract_myntra_labels(pages)), 2)
+
+    def test_flipkart_labels_stream(self):
+        pages = ["OD123456789012345678\nSKU ID | KURTI-1 | Blue kurti\nQTY 2\n", "AWB No. FMPC123456\n"]
+        [label] = flipkart.iter_flipkart_labels(pages)
+        self.assertEqual(label["Order ID"], "OD123456789012345678")
+        self.assertEqual(label["SKU ID"], "KURTI-1")
+        self.assertEqual(label["QTY"], "2")
+        self.assertEqual(label["AWB No."], "FMPC123456")
+
+
+class ExportTests(SimpleTestCase):
+    def test_write_xlsx_keeps_column_order(self):
+        handle, path = tempfile.mkstemp(suffix=".xlsx")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        rows = iter([{"QTY": "2", "Order ID": "OD1"}, {"Order ID": "OD2", "Extra": "x"}])
+        self.assertEqual(write_xlsx(rows, ["Order ID", "SKU ID", "QTY"], path), 2)
+        sheet = openpyxl.load_workbook(path).active
+        self.assertEqual(
+            [[cell.value for cell in row] for row in sheet.iter_rows()],
+            [["Order ID", "SKU ID", "QTY"], ["OD1", None, "2"], ["OD2", None, None]],
+        )
+
+    def test_normalize_row_types_dates_and_amounts(self):
+        row = {"Order Date": "11.07.2025", "Unit Price": "₹1,299.00", "Tax Rate": "18%", "Qty": "2", "AWB Number": "VL1"}
+        self.assertEqual(
+            normalize_row(row, ["Order Date", "Unit Price", "Tax Rate", "Qty", "AWB Number", "Invoice Date"]),
+            [date(2025, 7, 11), 1299.0, 18.0, 2, "VL1", None],
+        )
+
+    def test_csv_and_jsonl_stream_one_chunk_per_row(self):
+        rows = [{"Order ID": "OD1", "QTY": "2", "Print Data": "01/02/25"}, {"Order ID": "OD2"}]
+        columns = ["Order ID", "QTY", "Print Data"]
+        chunks = list(iter_csv(iter(rows), columns))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(b"".join(chunks).decode(), "Order ID,QTY,Print Data\r\nOD1,2,2025-02-01\r\nOD2,,\r\n")
+        records = [json.loads(line) for line in iter_jsonl(iter(rows), columns)]
+        self.assertEqual(records[0], {"Order ID": "OD1", "QTY": 2, "Print Data": "2025-02-01"})
+        self.assertIsNone(records[1]["QTY"])
+
+    def test_write_parquet_uses_typed_schema(self):
+        pq = __import__("pyarrow.parquet").parquet
+        handle, path = tempfile.mkstemp(suffix=".parquet")
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        rows = iter([{"Order ID": "OD1", "QTY": "3", "Print Data": "05-06-2025"}])
+        self.assertEqual(write_parquet(rows, ["Order ID", "QTY", "Print Data"], path), 1)
+        table = pq.read_table(path)
+        self.assertEqual([str(field.type) for field in table.schema], ["string", "int64", "date32[day]"])
+        self.assertEqual(table.to_pylist(), [{"Order ID": "OD1", "QTY": 3, "Print Data": date(2025, 6, 5)}])
+
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        override = override_settings(LABEL_RESULT_CACHE_DIR=self.cache_dir, LABEL_RESULT_CACHE_MAX_BYTES=10_000)
+        override.enable()
+        self.addCleanup(override.disable)
+        resultcache.clear_cache()
+
+    def make_upload(self, content):
+        handle, path = tempfile.mkstemp(suffix=".pdf", dir=self.cache_dir)
+        with os.fdopen(handle, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_repeat_upload_replays_rows_without_extracting(self):
+        path = self.make_upload(b"%PDF same bytes")
+        calls = []
+
+        def extract(file_path):
+            calls.append(file_path)
+            yield LabelRecord("flipkart", order_id="OD1", qty="2", extras=("", "12-07", ""))
+
+        first = list(resultcache.cached_rows(path, "flipkart", 1, extract))
+        second = list(resultcache.cached_rows(path, "flipkart", 1, extract))
+        self.assertEqual(first, second)
+        self.assertEqual(len(calls), 1)
+        # Another extractor version is another entry
+        list(resultcache.cached_rows(path, "flipkart", 2, extract))
+        self.assertEqual(len(calls), 2)
+        stats = resultcache.cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 2, 2))
+
+    def test_parser_settings_are_part_of_the_key(self):
+        path = self.make_upload(b"%PDF same bytes")
+        calls = []
+
+        def extract(file_path):
+            calls.append(file_path)
+            yield LabelRecord("amazon", order_id="402-1234567-1234567")
+
+        list(resultcache.cached_rows(path, "amazon", 1, extract))
+        with override_settings(LABEL_REGION_TEMPLATES={"amazon": None}):
+            list(resultcache.cached_rows(path, "amazon", 1, extract))
+        with override_settings(LABEL_COURIERS={"amazon": ["Blue Dart"]}):
+            list(resultcache.cached_rows(path, "amazon", 1, extract))
+        list(resultcache.cached_rows(path, "amazon", 1, extract))
+        self.assertEqual(len(calls), 3)
+
+    def test_abandoned_extraction_is_not_stored(self):
+        path = self.make_upload(b"%PDF abandoned")
+        rows = resultcache.cached_rows(path, "meesho", 1, lambda file_path: iter([LabelRecord("meesho", sku="A"), LabelRecord("meesho", sku="B")]))
+        next(rows)
+        rows.close()
+        self.assertEqual(resultcache.cache_stats()["entries"], 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        big_row = LabelRecord("amazon", description="x" * 4000)
+        paths = [self.make_upload(f"%PDF {i}".encode()) for i in range(3)]
+        list(resultcache.cached_rows(paths[0], "amazon", 1, lambda file_path: iter([big_row])))
+        list(resultcache.cached_rows(paths[1], "amazon", 1, lambda file_path: iter([big_row])))
+        # Touch the first entry so the second one is the oldest
+        os.utime(os.path.join(self.cache_dir, resultcache.cache_key(resultcache.file_sha256(paths[1]), "amazon", 1) + ".jsonl"), (1, 1))
+        list(resultcache.cached_rows(paths[0], "amazon", 1, lambda file_path: iter([])))
+        list(resultcache.cached_rows(paths[2], "amazon", 1, lambda file_path: iter([big_row])))
+        stats = resultcache.cache_stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+        self.assertEqual(list(resultcache.cached_rows(paths[0], "amazon", 1, lambda file_path: iter([]))), [big_row])
+
+
+class PageCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        override = override_settings(LABEL_PAGE_CACHE_PATH=os.path.join(cache_dir, "pages.sqlite3"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_flipkart_units_give_the_same_labels(self):
+        pages = [
+            "header\nOD123456789012345678\nQTY\n1\n",
+            "continued\nOD223456789012345678\nQTY\n2\nOD323456789012345678\n",
+            "tail of the last label",
+        ]
+        units = list(flipkart.iter_flipkart_page_units(pages))
+        self.assertEqual(units, [(pages[0], "continued\n"), (pages[1], pages[2])])
+        self.assertEqual(list(flipkart.iter_flipkart_labels_cached(pages)), list(flipkart.iter_flipkart_labels(pages)))
+
+    def test_overlapping_pages_are_parsed_once(self):
+        parsed = []
+
+        def parse(unit):
+            parsed.append(unit)
+            return [LabelRecord("amazon", order_id=unit[0])]
+
+        yesterday = pagecache.PageReuse()
+        list(pagecache.iter_cached_units([("p1",), ("p2",)], "amazon", 1, parse, yesterday))
+        today = pagecache.PageReuse()
+        rows = list(pagecache.iter_cached_units([("p2",), ("p3",)], "amazon", 1, parse, today))
+        self.assertEqual([row.order_id for row in rows], ["p2", "p3"])
+        self.assertEqual(parsed, [("p1",), ("p2",), ("p3",)])
+        self.assertEqual(str(today), "1/2")
+        self.assertEqual(str(yesterday), "0/2")
+
+
+class JobTests(SimpleTestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir, ignore_errors=True)
+        override = override_settings(LABEL_JOB_DIR=self.work_dir, LABEL_RESULT_CACHE_MAX_BYTES=0)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_job_mode_returns_at_once_and_serves_the_file(self):
+        path = make_text_pdf([MEESHO_BLOCK])
+        self.addCleanup(os.remove, path)
+        with open(path, "rb") as f, contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/meesho?mode=job", {"pdf_file": f, "format": "jsonl"})
+            self.assertEqual(response.status_code, 202)
+            job_id = response.json()["id"]
+            self.assertTrue(jobs.get_job(job_id).done.wait(30))
+
+        status = self.client.get(f"/jobs/{job_id}").json()
+        self.assertEqual((status["status"], status["rows"]), ("done", 1))
+        download = self.client.get(status["download_url"])
+        record = json.loads(b"".join(download.streaming_content))
+        self.assertEqual(record["AWB Number"], "VL0081530070753")
+        self.assertEqual(self.client.get("/jobs/unknown").status_code, 404)
+
+
+class ExtractLabelsCommandTests(SimpleTestCase):
+    def test_merged_output_detects_marketplace_per_file(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        for name, text in (("meesho.pdf", MEESHO_BLOCK), ("other.pdf", "Nothing to see here")):
+            os.replace(make_text_pdf([text]), os.path.join(work_dir, name))
+        os.replace(make_layout_pdf([FLIPKART_LABEL]), os.path.join(work_dir, "flipkart.pdf"))
+        output = os.path.join(work_dir, "labels.jsonl")
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command("extract_labels", work_dir, "--output", output, "--workers", "1", stdout=stdout, stderr=stderr)
+
+        with open(output, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(r["Source File"], r["Marketplace"], r["AWB Number"]) for r in records],
+                         [("flipkart.pdf", "flipkart", "FMPC1234567890"), ("meesho.pdf", "meesho", "VL0081530070753")])
+        # One column per field: no "AWB No." / "Order No." aliases next to the normalized ones
+        self.assertEqual(list(records[0]), ["Source File"] + mixed.NORMALIZED_COLUMNS)
+        self.assertIn("marketplace not recognised", stderr.getvalue())
+        self.assertIn("2/3 files, 3 pages, 2 labels", stdout.getvalue())
+
+
+class DetectTests(SimpleTestCase):
+    def test_fingerprints_pick_the_marketplace(self):
+        self.assertEqual(detect.detect_text_marketplace(MEESHO_BLOCK), "meesho")
+        self.assertEqual(detect.detect_text_marketplace("Myntra\n" + MEESHO_BLOCK), "myntra")
+        self.assertEqual(detect.detect_text_marketplace("OD123456789012345678\nShipping/Customer address:"), "flipkart")
+        self.assertEqual(detect.detect_text_marketplace("Order Number: 408-1234567-1234567"), "amazon")
+        # "Customer Address" alone could be Meesho or Myntra
+        self.assertIsNone(detect.detect_text_marketplace("Customer Address"))
+
+    def test_upload_endpoint_dispatches_to_the_detected_parser(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir, ignore_errors=True)
+        path = os.path.join(work_dir, "detect-manifest.pdf")
+        os.replace(make_text_pdf([MEESHO_BLOCK]), path)
+        with override_settings(LABEL_RESULT_CACHE_MAX_BYTES=0), open(path, "rb") as f, \
+                contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/upload", {"pdf_file": f, "format": "csv"})
+            body = b"".join(response.streaming_content).decode()
+        self.assertEqual(response["X-Marketplace"], "meesho")
+        self.assertIn("VL0081530070753", body)
+
+
+class MixedDocumentTests(SimpleTestCase):
+    FLIPKART_PAGE = "OD123456789012345678\nShipping/Customer address:\nQTY\n2\n"
+
+    def test_pages_are_grouped_into_runs(self):
+        pages = ["cover sheet", MEESHO_BLOCK, "continued", self.FLIPKART_PAGE, MEESHO_BLOCK]
+        self.assertEqual(mixed.classify_pages(pages), ["meesho", "meesho", "meesho", "flipkart", "meesho"])
+        self.assertEqual([(marketplace, len(texts)) for marketplace, texts in mixed.page_runs(pages)],
+                         [("meesho", 3), ("flipkart", 1), ("meesho", 1)])
+
+    @override_settings(PDF_TEXT_WORKERS=1)
+    def test_sheet_per_marketplace(self):
+        path = make_text_pdf([MEESHO_BLOCK, self.FLIPKART_PAGE])
+        self.addCleanup(os.remove, path)
+        with open(path, "rb") as f, contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/mixed", {"pdf_file": f})
+        self.assertEqual(response["X-Marketplace-Pages"], "meesho=1; flipkart=1")
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(workbook.sheetnames, ["meesho", "flipkart"])
+        self.assertEqual(workbook["flipkart"]["A2"].value, "OD123456789012345678")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows, _ = mixed.extract_mixed([MEESHO_BLOCK, self.FLIPKART_PAGE])
+        table = list(mixed.normalize_rows(rows))
+        self.assertEqual([(row["Marketplace"], row["AWB Number"] or row["Order ID"]) for row in table],
+                         [("meesho", "VL0081530070753"), ("flipkart", "OD123456789012345678")])
+
+
+class LabelRecordTests(SimpleTestCase):
+    def test_every_marketplace_column_name_reads_the_shared_field(self):
+        record = LabelRecord("flipkart", order_id="OD1", awb="FMPC1", qty="2", extras=("11/07/25", "12-07", ""))
+        self.assertEqual([record.get(c) for c in ("Order ID", "Order No.", "AWB No.", "AWB Number", "QTY", "Qty")],
+                         ["OD1", "OD1", "FMPC1", "FMPC1", "2", "2"])
+        self.assertEqual((record["Print Data"], record["HBD"]), ("11/07/25", "12-07"))
+        self.assertEqual(record.get("Tax Amount", None), None)
+        with self.assertRaises(KeyError):
+            record["Tax Amount"]
+
+    def test_round_trips(self):
+        record = LabelRecord("amazon", order_id="408-1", extras=tuple(str(i) for i in range(11)))
+        self.assertEqual(LabelRecord.from_list(json.loads(json.dumps(record.to_list()))), record)
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertFalse(hasattr(record, "__dict__"))
+
+
+class ColumnarBatchTests(SimpleTestCase):
+    COLUMNS = ["Order ID", "Order Date", "Qty", "Courier"]
+
+    def batch(self):
+        rows = [LabelRecord("meesho", order_id=f"O{i}", order_date="11.07.2025", qty=str(i % 2 + 1), courier="Delhivery")
+                for i in range(4)]
+        return ColumnarBatch(self.COLUMNS).extend(rows + [{"Order ID": "O9", "Qty": "", "Courier": "Shadowfax"}])
+
+    def test_to_arrow_types_and_dictionary_encodes(self):
+        table = self.batch().to_arrow()
+        self.assertEqual(str(table.schema.field("Order Date").type), "date32[day]")
+        self.assertEqual(str(table.schema.field("Qty").type), "int64")
+        self.assertEqual(str(table.schema.field("Courier").type), "dictionary<values=string, indices=int32, ordered=0>")
+        self.assertEqual(str(table.schema.field("Order ID").type), "string")
+        self.assertEqual(table.column("Qty").to_pylist(), [1, 2, 1, 2, None])
+        self.assertEqual(table.column("Courier").to_pylist(), ["Delhivery"] * 4 + ["Shadowfax"])
+
+    def test_to_pandas(self):
+        frame = self.batch().to_pandas()
+        self.assertEqual(str(frame["Courier"].dtype), "category")
+        self.assertEqual(list(frame["Order ID"]), ["O0", "O1", "O2", "O3", "O9"])
+        self.assertEqual(frame["Order Date"][0], date(2025, 7, 11))
+
+
+@override_settings(LABEL_RESULT_CACHE_MAX_BYTES=0)
+class UploadSourceTests(SimpleTestCase):
+    def post(self, path):
+        with open(path, "rb") as f, contextlib.redirect_stdout(io.StringIO()):
+            response = self.client.post("/meesho", {"pdf_file": f, "format": "jsonl"})
+        return [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_in_memory_and_spooled_uploads_read_in_place(self):
+        path = make_text_pdf([MEESHO_BLOCK])
+        self.addCleanup(os.remove, path)
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0):
+            spooled = self.post(path)
+        self.assertEqual(self.post(path), spooled)
+        self.assertEqual(spooled[0]["AWB Number"], "VL0081530070753")
+        # The views used to save the upload as <tempdir>/<its name>: this very file
+        self.assertTrue(os.path.exists(path))
+
+    def test_pool_workers_get_the_path_or_the_bytes(self):
+        path = make_text_pdf([MEESHO_BLOCK])
+        self.addCleanup(os.remove, path)
+        mapped = pickle.loads(pickle.dumps(PdfSource.from_path(path)))
+        with open(path, "rb") as f:
+            in_memory = pickle.loads(pickle.dumps(PdfSource(f.read())))
+        self.assertEqual(mapped.path, path)
+        self.assertEqual((in_memory.path, in_memory.sha256()), (None, mapped.sha256()))
+        self.assertEqual(pdftext.extract_page_texts(in_memory, parallel=False),
+                         pdftext.extract_page_texts(path, parallel=False))
+
+    def test_detached_source_has_a_file_of_its_own(self):
+        path = make_text_pdf([MEESHO_BLOCK])
+        source = PdfSource.from_path(path).detach()
+        # Django removes its spooled file at the end of the request
+        os.remove(path)
+        spill_path = source.path
+        self.assertNotEqual(spill_path, path)
+        self.assertIn("Customer Address", pdftext.extract_page_texts(source, parallel=False)[0])
+        # Pool workers are sent the path, not the PDF
+        self.assertLess(len(pickle.dumps(source)), 500)
+        del source
+        self.assertFalse(os.path.exists(spill_path))
+
+    def test_in_memory_upload_is_spilled_before_going_to_the_pool(self):
+        path = make_text_pdf([f"Page {number}\nCustomer Address" for number in range(6)])
+        self.addCleanup(os.remove, path)
+        with open(path, "rb") as f:
+            source = PdfSource(f.read())
+        with self.settings(PDF_TEXT_WORKERS=2, PDF_TEXT_PARALLEL_MIN_PAGES=0, PDF_TEXT_PAGES_PER_CHUNK=2):
+            texts = pdftext.extract_page_texts(source)
+        self.assertIsNotNone(source.path)
+        self.assertEqual(texts, pdftext.extract_page_texts(path, parallel=False))
+
+
+class FlipkartLayoutTests(SimpleTestCase):
+    def test_layout_parser_reads_what_the_regexes_read(self):
+        path = make_layout_pdf([FLIPKART_LABEL])
+        self.addCleanup(os.remove, path)
+        [label] = flipkart.iter_flipkart_labels_layout(pdftext.iter_page_words(path, parallel=False))
+        self.assertEqual([label], list(flipkart.iter_flipkart_labels(pdftext.extract_page_texts(path, parallel=False))))
+        self.assertEqual((label.sku, label.description, label.qty, label.awb), ("KURTI-12", "Blue cotton kurti", "2", "FMPC1234567890"))
+        self.assertEqual((label.customer_address, label.pincode), ("Asha Patel,, 12 Ring Road, Surat - 395002", "395002"))
+        self.assertEqual(label.extras, ("11/07/25", "12-07", "13-07"))
+
+        with override_settings(FLIPKART_PARSER="layout", LABEL_RESULT_CACHE_MAX_BYTES=0, LABEL_PAGE_CACHE_MAX_BYTES=0), \
+                open(path, "rb") as f:
+            response = self.client.post("/flipkart", {"pdf_file": f, "format": "jsonl"})
+        self.assertEqual(json.loads(b"".join(response.streaming_content).splitlines()[0])["AWB No."], "FMPC1234567890")
+
+    def test_address_without_stop_lines_ends_at_the_sku_table(self):
+        words = []
+        for x, y, text in FLIPKART_LABEL:
+            if not text.startswith(("HBD", "Sold")):
+                for word in text.split():
+                    words.append((x, y - 8, x + 4 * len(word), y, word))
+                    x += 4 * len(word) + 2
+        rows = layout.page_rows(words)
+        [(order_id, region)] = flipkart.flipkart_regions(rows)
+        label = flipkart.extract_flipkart_label_layout(order_id, region)
+        self.assertEqual(label.customer_address, "Asha Patel,, 12 Ring Road, Surat - 395002")
+        self.assertEqual(flipkart.extract_flipkart_label(order_id, "\n".join(row.text for row in region)).customer_address, "")
+
+    def test_heading_glued_to_another_word_goes_to_the_text_parser(self):
+        words = []
+        for x, y, text in FLIPKART_LABEL:
+            text = text.replace("Shipping/Customer", "(Shipping/Customer")
+            for word in text.split():
+                words.append((x, y - 8, x + 4 * len(word), y, word))
+                x += 4 * len(word) + 2
+        [(order_id, region)] = flipkart.flipkart_regions(layout.page_rows(words))
+        self.assertIsNone(flipkart.read_address(region, layout.find_row(region, patterns.FLIPKART_ADDRESS_ANCHOR)[0]))
+        label = flipkart.extract_flipkart_label_layout(order_id, region)
+        self.assertEqual(label, flipkart.extract_flipkart_label(order_id, "\n".join(row.text for row in region)))
+
+
+
+AMAZON_INVOICE = [
+    (36, 88, "GST Registration No: 24ABCDE1234F1Z5"),
+    (320, 136, "Shipping Address :"),
+    (320, 148, "Asha Patel"),
+    (320, 160, "Surat, GUJARAT, 395002"),
+    (36, 250, "Order Number: 402-1234567-1234567"),
+    (36, 420, "1 Blue cotton kurti | B0ABC12345 ( KURTI-12 ) HSN:6204"),
+    (36, 440, "TOTAL: 1,299.00"),
+    (36, 780, "This is a computer generated invoice and does not need a signature."),
+]
+
+
+class RegionTests(SimpleTestCase):
+    def read(self, lines):
+        path = make_layout_pdf([lines])
+        self.addCleanup(os.remove, path)
+        report = regions.RegionReport()
+        [text] = regions.iter_region_texts(path, "amazon", report, parallel=False)
+        return text, report, path
+
+    def test_template_reads_the_regions_once_and_skips_the_rest(self):
+        text, report, _ = self.read(AMAZON_INVOICE)
+        self.assertEqual(str(report), "0/1")
+        self.assertEqual(text.count("Order Number: 402-1234567-1234567"), 1)
+        self.assertIn("Shipping Address :\nAsha Patel", text)
+        self.assertIn("TOTAL: 1,299.00", text)
+        self.assertNotIn("computer generated", text)
+
+    def test_pages_that_do_not_fit_are_read_in_full(self):
+        # The item table ran out of the items region
+        lines = [line for line in AMAZON_INVOICE if not line[2].startswith("TOTAL")] + [(36, 760, "TOTAL: 1,299.00")]
+        text, report, path = self.read(lines)
+        self.assertEqual(str(report), "1/1")
+        self.assertEqual(text, pdftext.extract_page_texts(path, parallel=False)[0])
+
+    @override_settings(LABEL_REGION_TEMPLATES={"amazon": None})
+    def test_template_can_be_turned_off(self):
+        self.assertIsNone(regions.region_template("amazon"))
+        text, report, _ = self.read(AMAZON_INVOICE)
+        self.assertIn("computer generated", text)
+        self.assertEqual(str(report), "0/1")
+
+
+# Nested quantifier: backtracks for ages on a run of "a" not followed by the end
+CATASTROPHIC = re.compile(r"(a+)+$")
+
+
+@override_settings(LABEL_REGEX_BLOCK_BUDGET_SECONDS=0.05)
+class RegexGuardTests(SimpleTestCase):
+    def setUp(self):
+        regexguard.reset_stats()
+        self.addCleanup(regexguard.reset_stats)
+
+    def test_calls_are_timed_per_pattern(self):
+        flipkart.extract_flipkart_label("OD123456789012345678", "Description: kurti\nQTY 1\n")
+        stats = regexguard.pattern_stats()["patterns"]
+        self.assertEqual(stats["flipkart.description"]["count"], 1)
+        self.assertEqual(stats["flipkart.description"]["given_up"], 0)
+        self.assertGreaterEqual(stats["flipkart.description"]["max_ms"], stats["flipkart.description"]["p99_ms"])
+
+    def test_a_runaway_pattern_gives_up_the_field(self):
+        before = regexguard.warning_count()
+        with self.assertLogs("home.regexguard", "WARNING") as logs, regexguard.block_budget():
+            self.assertIsNone(regexguard.search("test.runaway", CATASTROPHIC, "a" * 64 + "!"))
+            # The block's budget is spent: the next field is not even tried
+            self.assertEqual(regexguard.finditer("test.cheap", re.compile("a"), "aaa"), [])
+        self.assertEqual(regexguard.warning_count(), before + 2)
+        self.assertIn("Gave up on test.runaway", logs.output[0])
+        stats = regexguard.pattern_stats()
+        self.assertLess(stats["patterns"]["test.runaway"]["max_ms"], 1000)
+        self.assertEqual([warning["pattern"] for warning in stats["warnings"]], ["test.runaway", "test.cheap"])
+        # A new block starts with a new budget
+        with regexguard.block_budget():
+            self.assertEqual(regexguard.search("test.cheap", re.compile("a"), "aaa").group(), "a")
+        self.assertEqual(self.client.get("/debug/patterns").json()["patterns"]["test.cheap"]["count"], 2)
+
+    def test_units_with_a_given_up_field_are_not_cached(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        parsed = []
+
+        def parse(unit):
+            parsed.append(unit)
+            regexguard.search("test.runaway", CATASTROPHIC, unit[0])
+            return [LabelRecord("amazon", order_id="x")]
+
+        with override_settings(LABEL_PAGE_CACHE_PATH=os.path.join(cache_dir, "pages.sqlite3")), \
+                self.assertLogs("home.regexguard", "WARNING"):
+            for _ in range(2):
+                list(pagecache.iter_cached_units([("a" * 64 + "!",)], "amazon", 1, parse))
+        self.assertEqual(len(parsed), 2)
+
+
+class InstrumentTests(SimpleTestCase):
+    @override_settings(LABEL_RESULT_CACHE_MAX_BYTES=0)
+    def test_one_summary_line_per_extraction(self):
+        path = make_text_pdf([MEESHO_BLOCK, MEESHO_BLOCK.replace("AWB No: VL0081530070753\n", "")])
+        self.addCleanup(os.remove, path)
+        with open(path, "rb") as f, self.assertLogs("home.extraction", "INFO") as logs:
+            response = self.client.post("/meesho", {"pdf_file": f, "format": "csv"})
+            b"".join(response.streaming_content)
+        [line] = logs.records
+        summary = json.loads(line.getMessage().split(" ", 1)[1])
+        self.assertEqual((summary["pages"], summary["blocks"], summary["rows"]), (2, 2, 2))
+        self.assertEqual(summary["fields_missing"], {"awb": 1})
+
+    def test_block_text_is_only_logged_for_sampled_failures(self):
+        block = MEESHO_BLOCK.replace("AWB No: VL0081530070753\n", "")
+        with override_settings(LABEL_LOG_FAILED_BLOCKS_EVERY=1), self.assertLogs("home.meesho", "INFO") as logs:
+            self.assertEqual(meesho.extract_awb_number(block), "")
+        self.assertIn("awb not found", logs.output[0])
+        self.assertIn("Customer Address", logs.output[0])
+        with override_settings(LABEL_LOG_FAILED_BLOCKS_EVERY=0), self.assertNoLogs("home.meesho", "INFO"):
+            meesho.extract_awb_number(block)
+            meesho.extract_awb_number(MEESHO_BLOCK)
+
+
+class StageTimerTests(SimpleTestCase):
+    def test_nested_stages_are_not_counted_twice(self):
+        timer = timing.StageTimer("test")
+
+        def rows(texts):
+            for text in texts:
+                with timing.stage("hash"):
+                    pass
+                yield text.upper()
+
+        self.assertEqual(list(timer.iter(rows(timer.iter(["a", "b"], "text")), "parse")), ["A", "B"])
+        self.assertEqual(set(timer.stages), {"text", "hash", "parse"})
+        self.assertLessEqual(sum(timer.stages.values()), timer.as_dict()["total_ms"] / 1000)
+        # No timer outside a timed iteration: the stage does nothing
+        self.assertIsNone(timing.current_timer())
+        with timing.stage("hash"):
+            pass
+
+    def test_upload_response_carries_server_timing_and_profile(self):
+        path = make_text_pdf([MEESHO_BLOCK])
+        self.addCleanup(os.remove, path)
+        profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, profile_dir, ignore_errors=True)
+        with override_settings(LABEL_RESULT_CACHE_MAX_BYTES=0, LABEL_TIMING_PROFILE_DIR=profile_dir), \
+                open(path, "rb") as f, self.assertLogs("home.extraction", "INFO"):
+            response = self.client.post("/meesho", {"pdf_file": f})
+            b"".join(response.streaming_content)
+            response.close()
+        stages = [part.split(";")[0] for part in response["Server-Timing"].split(", ")]
+        self.assertEqual(stages, ["open", "text", "parse", "export", "total"])
+        [profile_name] = os.listdir(profile_dir)
+        with open(os.path.join(profile_dir, profile_name)) as profile_file:
+            profile = json.load(profile_file)
+        self.assertEqual(profile["summary"]["rows"], 1)
+        self.assertIn("export", profile["stages_ms"])
+
+        with override_settings(LABEL_RESULT_CACHE_MAX_BYTES=0, LABEL_SERVER_TIMING=False), open(path, "rb") as f, \
+                self.assertLogs("home.extraction", "INFO"):
+            response = self.client.post("/meesho", {"pdf_file": f, "format": "csv"})
+            b"".join(response.streaming_content)
+        self.assertNotIn("Server-Timing", response)
+
+
+class ProfileMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.path = make_text_pdf([MEESHO_BLOCK])
+        self.addCleanup(os.remove, self.path)
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+
+    def post(self, **extra):
+        with override_settings(LABEL_RESULT_CACHE_MAX_BYTES=0, LABEL_PROFILE_DIR=self.profile_dir,
+                               LABEL_PROFILE_TOKEN="s3cret"), \
+                open(self.path, "rb") as f, self.assertLogs("home", "INFO"):
+            response = self.client.post("/meesho?profile=pstats", {"pdf_file": f, "format": "csv"}, **extra)
+            b"".join(response.streaming_content)
+            response.close()
+        return response
+
+    def test_streamed_upload_is_profiled_to_the_end(self):
+        response = self.post(headers={"X-Label-Profile": "s3cret"})
+        self.assertEqual(os.listdir(self.profile_dir), [response["X-Profile"]])
+        stats = pstats.Stats(os.path.join(self.profile_dir, response["X-Profile"]))
+        self.assertIn("extract_meesho_label", {function for _, _, function in stats.stats})
+
+    def test_profile_parameter_is_ignored_without_staff_user_or_token(self):
+        for extra in ({}, {"headers": {"X-Label-Profile": "guess"}}):
+            response = self.post(**extra)
+            self.assertNotIn("X-Profile", response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+
+class MetricsTests(SimpleTestCase):
+    def test_uploads_show_up_in_the_scrape(self):
+        metrics.reset()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        path = make_text_pdf([MEESHO_BLOCK, MEESHO_BLOCK.replace("AWB No: VL0081530070753\n", "")])
+        self.addCleanup(os.remove, path)
+        with override_settings(LABEL_RESULT_CACHE_DIR=cache_dir), self.assertLogs("home", "INFO"):
+            for _ in range(2):
+                with open(path, "rb") as f:
+                    response = self.client.post("/meesho", {"pdf_file": f, "format": "csv"})
+                    b"".join(response.streaming_content)
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        lines = response.content.decode().splitlines()
+        self.assertIn("# TYPE label_upload_duration_seconds histogram", lines)
+        self.assertIn('label_upload_labels_count{marketplace="meesho"} 2', lines)
+        # The repeat upload came from the result cache and read no pages
+        self.assertIn('label_upload_pages_count{marketplace="meesho"} 1', lines)
+        self.assertIn('label_upload_pages_bucket{marketplace="meesho",le="1"} 0', lines)
+        self.assertIn('label_upload_pages_bucket{marketplace="meesho",le="5"} 1', lines)
+        self.assertIn('label_upload_pages_bucket{marketplace="meesho",le="+Inf"} 1', lines)
+        self.assertIn('label_fields_missing_total{marketplace="meesho",field="awb"} 2', lines)
+        self.assertIn('label_cache_lookups_total{cache="result",marketplace="meesho",result="hit"} 1', lines)
+        self.assertIn('label_cache_lookups_total{cache="result",marketplace="meesho",result="miss"} 1', lines)
+
+
+class ChunkedUploadTests(SimpleTestCase):
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir, ignore_errors=True)
+        override = override_settings(
+            LABEL_CHUNKED_UPLOAD_DIR=self.upload_dir, LABEL_CHUNKED_PART_BYTES=1024,
+            LABEL_CHUNKED_READ_AHEAD=False, LABEL_RESULT_CACHE_MAX_BYTES=0, PDF_TEXT_WORKERS=1,
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        path = make_text_pdf([MEESHO_BLOCK.replace("0753", f"075{number}") for number in range(8)])
+        with open(path, "rb") as f:
+            self.data = f.read()
+        os.remove(path)
+
+    def put(self, upload_id, number, data=None):
+        start = number * 1024
+        return self.client.put(f"/chunked/{upload_id}/parts/{number}", data if data is not None else self.data[start:start + 1024],
+                               content_type="application/octet-stream")
+
+    def test_parts_read_ahead_and_complete_like_a_direct_upload(self):
+        response = self.client.post("/chunked", {"size": len(self.data), "marketplace": "meesho"})
+        self.assertEqual(response.status_code, 201)
+        info = response.json()
+        upload_id, parts = info["id"], info["parts"]
+        self.assertGreater(parts, 2)
+        self.assertEqual(self.put(upload_id, 0, b"short").status_code, 400)
+        for number in range(parts // 2):
+            self.assertEqual(self.put(upload_id, number).status_code, 200)
+        chunked._read_ahead(upload_id)
+        first = chunked.get_upload(upload_id).read_ahead()
+        for number in range(parts // 2, parts - 1):
+            self.assertEqual(self.put(upload_id, number).status_code, 200)
+        response = self.client.post(f"/chunked/{upload_id}/complete", {"format": "csv"})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["missing"], [parts - 1])
+
+        # Every page but those cut off by the missing part is read already,
+        # the second time from where the first one stopped
+        chunked._read_ahead(upload_id)
+        upload = chunked.get_upload(upload_id)
+        state = upload.read_ahead()
+        self.assertGreater(state["pages"], first["pages"])
+        self.assertGreater(state["next_page"], first["next_page"])
+        with open(upload.pages_path, encoding="utf-8") as pages_file:
+            self.assertLessEqual(len(pages_file.readlines()), state["pages"] + 1)
+
+        self.put(upload_id, parts - 1)
+        with self.assertLogs("home", "INFO"):
+            response = self.client.post(f"/chunked/{upload_id}/complete", {"format": "csv"})
+            chunked_csv = b"".join(response.streaming_content)
+            self.assertEqual(response["X-Marketplace"], "meesho")
+            direct = self.client.post("/meesho", {"pdf_file": io.BytesIO(self.data), "format": "csv"})
+            self.assertEqual(chunked_csv, b"".join(direct.streaming_content))
+        self.assertEqual(chunked_csv.count(b"VL008153007"), 8)
+        # The upload is removed once its answer is out
+        self.assertFalse(os.path.isdir(upload.directory))
+        self.assertEqual(self.client.post(f"/chunked/{upload_id}/complete").status_code, 404)
+
+    def test_state_is_private_json(self):
+        upload = chunked.create_upload(len(self.data), "flipkart")
+        self.assertEqual(os.stat(upload.directory).st_mode & 0o777, 0o700)
+        upload.save_known_pages(pdftext.reader_key(pdftext.page_words), {"ab": [(1.0, 2.0, 3.0, 4.0, "OD1", 0, 0, 0)]}, 1024, 1, 0)
+        self.assertEqual(sorted(os.listdir(upload.directory)), ["data.pdf", "meta.json", "pages.jsonl", "read_ahead.json"])
+        # Words come back as tuples, as page_words reads them
+        pages = chunked.get_upload(upload.id).known_pages()
+        self.assertEqual(pages[pdftext.reader_key(pdftext.page_words)]["ab"], [(1.0, 2.0, 3.0, 4.0, "OD1", 0, 0, 0)])
+
+    def test_parts_need_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertEqual(client.post("/chunked", {"size": len(self.data)}).status_code, 403)
+        upload = chunked.create_upload(len(self.data), "meesho")
+        response = client.put(f"/chunked/{upload.id}/parts/0", self.data[:1024], content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 403)
+        token = client.get("/upload").cookies["csrftoken"].value
+        response = client.put(f"/chunked/{upload.id}/parts/0", self.data[:1024], content_type="application/octet-stream",
+                              headers={"X-CSRFToken": token})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_upload_is_not_found(self):
+        self.assertEqual(self.client.get(f"/chunked/{'0' * 32}").status_code, 404)
+        self.assertEqual(self.client.post("/chunked", {"size": "-1"}).status_code, 400)
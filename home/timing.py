@@ -0,0 +1,139 @@
+"""Where the time of one upload goes, as a ``Server-Timing`` header.
+
+The stages of an upload do not run one after the other: the Excel writer
+pulls rows, a row pulls page texts, and the first page text opens the PDF.
+A ``StageTimer`` therefore adds up, per stage, the time spent inside it
+minus the time spent in the stages nested in it, across every row:
+
+- ``hash``: the SHA-256 of the upload, for the result cache lookup
+- ``open``: ``fitz.open`` of the document
+- ``text``: reading page texts (or words, or regions), on the pool or not
+- ``parse``: everything else it takes to produce the rows (block splitting,
+  regexes, the result and page caches)
+- ``export``: writing the rows out
+
+``timer.iter`` times the items of an iterator and makes the timer the
+thread's current one while each item is produced, so code further down
+(``pdftext``, ``resultcache``) reports its stage with ``timing.stage(...)``
+without the timer being passed to it. Outside a timed request that is one
+thread-local lookup.
+
+The overhead is two ``perf_counter`` calls per page and per row. The header
+is sent unless ``LABEL_SERVER_TIMING`` is False; with
+``LABEL_TIMING_PROFILE_DIR`` set, every upload also leaves a JSON profile
+there. Streamed exports send the stages done before the first row went
+out, and write their profile once the last one has.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+_local = threading.local()
+_DONE = object()
+
+
+def current_timer():
+    """The ``StageTimer`` whose items this thread is producing, if any."""
+    return getattr(_local, "timer", None)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Count the ``with`` block as stage ``name`` of the current timer, if there is one."""
+    timer = getattr(_local, "timer", None)
+    if timer is None:
+        yield
+        return
+    timer.enter(name)
+    try:
+        yield
+    finally:
+        timer.exit()
+
+
+class StageTimer:
+    """Exclusive time per stage of one upload"""
+
+    def __init__(self, marketplace):
+        self.marketplace = marketplace
+        self.stages = {}
+        self.started = time.perf_counter()
+        self._open = []
+
+    def enter(self, name):
+        self._open.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, nested = self._open.pop()
+        elapsed = time.perf_counter() - start
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+        if self._open:
+            self._open[-1][2] += elapsed
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Count the ``with`` block as stage ``name``."""
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def iter(self, items, name):
+        """Yield ``items``, counting the time it takes to produce each one as stage ``name``."""
+        items = iter(items)
+        while True:
+            previous = getattr(_local, "timer", None)
+            _local.timer = self
+            self.enter(name)
+            try:
+                item = next(items, _DONE)
+            finally:
+                self.exit()
+                _local.timer = previous
+            if item is _DONE:
+                return
+            yield item
+
+    def as_dict(self):
+        return {
+            "marketplace": self.marketplace,
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+        }
+
+    def header(self):
+        """The ``Server-Timing`` value: every stage so far, then the total."""
+        timings = self.as_dict()
+        parts = [f"{name};dur={ms}" for name, ms in timings["stages_ms"].items()]
+        parts.append(f"total;dur={timings['total_ms']}")
+        return ", ".join(parts)
+
+    def add_header(self, response):
+        """Set ``Server-Timing`` on ``response`` (unless ``LABEL_SERVER_TIMING`` is False) and return it."""
+        if getattr(settings, "LABEL_SERVER_TIMING", True):
+            response["Server-Timing"] = self.header()
+        return response
+
+    def write_profile(self, summary=None):
+        """Write the timings (and ``summary``'s counts) to ``LABEL_TIMING_PROFILE_DIR``, when set."""
+        directory = getattr(settings, "LABEL_TIMING_PROFILE_DIR", None)
+        if not directory:
+            return None
+        profile = self.as_dict()
+        if summary is not None:
+            profile["summary"] = summary.as_dict()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory,
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{self.marketplace}-{uuid.uuid4().hex[:8]}.json",
+        )
+        with open(path, "w") as profile_file:
+            json.dump(profile, profile_file)
+        return path
@@ -0,0 +1,117 @@
+"""Uploaded PDFs, read where Django already keeps them.
+
+Django holds small uploads (up to ``FILE_UPLOAD_MAX_MEMORY_SIZE``) in memory
+and spools bigger ones to a temp file of its own. The views used to copy
+either one chunk by chunk into another temp file (for Meesho and Myntra
+under the client's file name, so two uploads of ``labels.pdf`` overwrote each
+other) before opening it. A ``PdfSource`` instead hands the in-memory bytes to
+``fitz.open(stream=...)`` and opens Django's spooled file by its path (memory
+mapped for hashing): nothing is written to disk a second time, and nothing is
+named after the client.
+
+Pool workers are sent the path, never the bytes (each chunk of pages would
+pickle the whole PDF again). A source without a path of its own (an
+in-memory upload read on the pool, or one ``detach()``-ed for a background
+job) is first ``spill()``-ed to a private temp file, removed once the source
+is garbage collected.
+
+``stream=`` gets ``bytes`` only: the PyMuPDF in requirements.txt (1.23.7)
+rejects a ``memoryview`` or ``mmap``.
+"""
+import contextlib
+import hashlib
+import mmap
+import os
+import tempfile
+import weakref
+
+import fitz  # PyMuPDF
+
+
+class PdfSource:
+    """The bytes of one PDF, plus the path they live at when there is one"""
+
+    def __init__(self, data, path=None):
+        self.data = memoryview(data)
+        self.path = path
+        self._spill = None
+        # {reader_key: {page_digest: result}} of pages read before the
+        # upload was complete (home/chunked.py); stays in this process
+        self.known_pages = None
+
+    @classmethod
+    def from_path(cls, path):
+        """Memory-map the PDF at ``path`` (read only)."""
+        with open(path, "rb") as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty file: nothing to map
+                data = b""
+        return cls(data, path)
+
+    @classmethod
+    def from_upload(cls, uploaded_file):
+        """Wrap a Django ``UploadedFile`` without writing it to disk again."""
+        if hasattr(uploaded_file, "temporary_file_path"):
+            source = cls.from_path(uploaded_file.temporary_file_path())
+            source.known_pages = getattr(uploaded_file, "known_pages", None)
+            return source
+        if hasattr(uploaded_file.file, "getvalue"):
+            # A buffer view would stop Django from closing the BytesIO at
+            # the end of the request; one copy in memory is cheap at this size
+            return cls(uploaded_file.file.getvalue())
+        uploaded_file.seek(0)
+        return cls(uploaded_file.read())
+
+    def __len__(self):
+        return self.data.nbytes
+
+    def __reduce__(self):
+        # Pool workers re-map the file when there is one (iter_pages spills
+        # in-memory uploads first)
+        if self.path is not None:
+            return PdfSource.from_path, (self.path,)
+        return PdfSource, (self.data.tobytes(),)
+
+    def open(self):
+        """Return a ``fitz.Document``: MuPDF reads the file itself when there is one."""
+        if self.path is not None:
+            return fitz.open(self.path)
+        return fitz.open(stream=self.data.obj, filetype="pdf")
+
+    def sha256(self):
+        return hashlib.sha256(self.data).hexdigest()
+
+    def spill(self):
+        """Copy the bytes to a private temp file and read from there from now on."""
+        handle, path = tempfile.mkstemp(prefix="label_upload_", suffix=".pdf")
+        with os.fdopen(handle, "wb") as spill_file:
+            spill_file.write(self.data)
+        spilled = PdfSource.from_path(path)
+        self.data, self.path = spilled.data, path
+        self._spill = weakref.finalize(self, _remove_spill, path)
+        return self
+
+    def detach(self):
+        """Stop depending on Django's upload, for holders that outlive the request (background jobs).
+
+        Django deletes its spooled file when the request is closed, so the
+        PDF is spilled to a file of the source's own.
+        """
+        if self._spill is None:
+            self.spill()
+        return self
+
+
+def _remove_spill(path):
+    # Windows refuses while a mapping is still open; the temp dir is cleaned eventually
+    with contextlib.suppress(OSError):
+        os.remove(path)
+
+
+def open_pdf(source):
+    """Open a ``PdfSource`` or a PDF path."""
+    if isinstance(source, PdfSource):
+        return source.open()
+    return fitz.open(source)
@@ -5,11 +5,23 @@ from home.meesho import meeshoindex
 from home.amazon import amazonindex
 from home.flipkart import flipkartindex
 from home.myntra import myntraindex
+from home.mixed import mixedindex
 
 urlpatterns = [
    path("", views.index, name='home'),
+   path("upload", views.upload, name='home-upload'),
    path("meesho", meeshoindex, name='home-meesho'),
    path("amazon", amazonindex, name='home-amazon'),
    path("flipkart",flipkartindex, name='home-flipkart'),
    path("myntra/", myntraindex, name="myntra_index"),
+   path("mixed", mixedindex, name="home-mixed"),
+   path("cache/stats", views.result_cache_stats, name="result-cache-stats"),
+   path("debug/patterns", views.regex_stats, name="regex-stats"),
+   path("metrics", views.extraction_metrics, name="metrics"),
+   path("jobs/<str:job_id>", views.job_status, name="job-status"),
+   path("jobs/<str:job_id>/download", views.job_download, name="job-download"),
+   path("chunked", views.chunked_upload_init, name="chunked-init"),
+   path("chunked/<str:upload_id>", views.chunked_upload_status, name="chunked-status"),
+   path("chunked/<str:upload_id>/parts/<int:number>", views.chunked_upload_part, name="chunked-part"),
+   path("chunked/<str:upload_id>/complete", views.chunked_upload_complete, name="chunked-complete"),
    ]
@@ -1,11 +1,155 @@
 from django.shortcuts import render
-from django.core.files.storage import default_storage
-import fitz  # PyMuPDF
-import pandas as pd
-import re
-import os
-from datetime import datetime
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse, JsonResponse
+from django.utils.datastructures import MultiValueDict
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
+from home import chunked, metrics
+from home.jobs import get_job
+from home.detect import detect_upload_marketplace
+from home.resultcache import cache_stats
+from home.regexguard import pattern_stats
+from home.meesho import meeshoindex
+from home.amazon import amazonindex
+from home.flipkart import flipkartindex
+from home.myntra import myntraindex
+
+MARKETPLACE_VIEWS = {
+    "meesho": meeshoindex,
+    "myntra": myntraindex,
+    "flipkart": flipkartindex,
+    "amazon": amazonindex,
+}
+
 
 def index(request):
     return render(request, "index.html",{})
 
+
+def upload(request):
+    """One upload for every marketplace: the first page tells which parser to run"""
+    if request.method == "POST" and request.FILES.get("pdf_file"):
+        try:
+            marketplace = detect_upload_marketplace(request.FILES["pdf_file"])
+        except Exception as e:
+            return render(request, "upload_file.html", {"message": f"❌ Invalid or corrupted PDF file: {str(e)}"})
+        if marketplace is None:
+            return render(request, "upload_file.html", {
+                "message": "❌ Could not tell which marketplace this PDF is from, please use its own page."
+            })
+        response = MARKETPLACE_VIEWS[marketplace](request)
+        response["X-Marketplace"] = marketplace
+        return response
+    return render(request, "upload_file.html", {})
+
+
+def result_cache_stats(request):
+    """Result cache hit/miss counters (this process) and disk usage"""
+    return JsonResponse(cache_stats())
+
+
+def regex_stats(request):
+    """Timings of the guarded label patterns (this process) and the recent parse warnings"""
+    return JsonResponse(pattern_stats())
+
+
+def extraction_metrics(request):
+    """Extraction metrics of this process, in the Prometheus text format"""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def job_status(request, job_id):
+    """Status of a background extraction job"""
+    job = get_job(job_id)
+    if job is None:
+        raise Http404("Unknown or expired job")
+    return JsonResponse(job.as_dict())
+
+
+def job_download(request, job_id):
+    """Output file of a finished background job"""
+    job = get_job(job_id)
+    if job is None:
+        raise Http404("Unknown or expired job")
+    if job.status != "done":
+        return JsonResponse(job.as_dict(), status=409)
+    return FileResponse(open(job.output_path, "rb"), as_attachment=True, filename=job.filename)
+
+
+def _chunked_upload(upload_id):
+    upload = chunked.get_upload(upload_id)
+    if upload is None:
+        raise Http404("Unknown or expired upload")
+    return upload
+
+
+@require_POST
+def chunked_upload_init(request):
+    """Start a chunked upload (see home/chunked.py)"""
+    try:
+        upload = chunked.create_upload(request.POST.get("size"), request.POST.get("marketplace"),
+                                       request.POST.get("sha256"))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(upload.as_dict(), status=201)
+
+
+@require_GET
+def chunked_upload_status(request, upload_id):
+    """Parts received and missing, for a client resuming an upload"""
+    return JsonResponse(_chunked_upload(upload_id).as_dict())
+
+
+@require_http_methods(["PUT"])
+def chunked_upload_part(request, upload_id, number):
+    """Store one part; the pages of the parts received so far are read in the background"""
+    upload = _chunked_upload(upload_id)
+    try:
+        upload.write_part(number, request, int(request.META.get("CONTENT_LENGTH") or 0))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    chunked.read_ahead(upload)
+    return JsonResponse(upload.as_dict())
+
+
+def _upload_request(request, uploaded_file):
+    """A POST of ``uploaded_file`` as ``pdf_file``, with the form fields (format, mode) of ``request``"""
+    upload_request = HttpRequest()
+    upload_request.method = "POST"
+    upload_request.path = request.path
+    upload_request.path_info = request.path_info
+    upload_request.META = request.META
+    upload_request.COOKIES = request.COOKIES
+    upload_request.GET = request.GET
+    upload_request.POST = request.POST
+    upload_request.FILES = MultiValueDict({"pdf_file": [uploaded_file]})
+    return upload_request
+
+
+@require_POST
+def chunked_upload_complete(request, upload_id):
+    """Extract the assembled upload: same answer as posting the file to its marketplace view"""
+    upload = _chunked_upload(upload_id)
+    missing = upload.missing_parts()
+    if missing:
+        return JsonResponse({**upload.as_dict(), "error": f"{len(missing)} parts missing"}, status=409)
+    try:
+        upload.verify()
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # The views read the assembled file by its path: the handle is only for detection
+    with upload.as_uploaded_file() as uploaded_file:
+        marketplace = upload.marketplace
+        if marketplace is None:
+            try:
+                marketplace = detect_upload_marketplace(uploaded_file)
+            except Exception as e:
+                return JsonResponse({"error": f"Invalid or corrupted PDF file: {e}"}, status=400)
+            if marketplace is None:
+                return JsonResponse({"error": "Could not tell which marketplace this PDF is from, "
+                                              "start the upload again with its marketplace"}, status=400)
+        response = MARKETPLACE_VIEWS[marketplace](_upload_request(request, uploaded_file))
+    response["X-Marketplace"] = marketplace
+    if response.status_code < 400:
+        # Done with: the parts are not needed once the answer is out
+        chunked.remove_when_sent(upload, response)
+    return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -38,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'home',
 ]
 
 MIDDLEWARE = [
@@ -48,6 +50,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # After AuthenticationMiddleware: it needs request.user
+    'home.profiling.ProfileMiddleware',
 ]
 
 ROOT_URLCONF = 'label.urls'
@@ -130,3 +134,107 @@ STATICFILES_DIRS = [
 ]
 
 
+# Pickup couriers per marketplace, in priority order (first match on a label
+# wins). Marketplaces left out use the defaults in home/couriers.py, e.g.
+# {"meesho": ["Delhivery", "XpressBees", "Valmo", ...]}
+LABEL_COURIERS = {}
+
+# PDF text extraction (home/pdftext.py): documents with at least
+# PDF_TEXT_PARALLEL_MIN_PAGES pages are split into chunks of
+# PDF_TEXT_PAGES_PER_CHUNK pages and read on a pool of PDF_TEXT_WORKERS
+# processes (None = one per CPU). Smaller documents are read serially.
+PDF_TEXT_WORKERS = None
+PDF_TEXT_PARALLEL_MIN_PAGES = 50
+PDF_TEXT_PAGES_PER_CHUNK = 25
+
+# Extracted rows are cached on disk by PDF content (home/resultcache.py) so
+# repeat uploads skip PyMuPDF. None = a folder in the system temp dir; the
+# least recently used entries are evicted above LABEL_RESULT_CACHE_MAX_BYTES
+# (0 turns the cache off).
+LABEL_RESULT_CACHE_DIR = None
+LABEL_RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Parsed rows of individual Flipkart/Amazon pages (home/pagecache.py), so an
+# upload that overlaps an earlier manifest only parses its new pages. None =
+# a SQLite file in the system temp dir; 0 bytes turns it off.
+LABEL_PAGE_CACHE_PATH = None
+LABEL_PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Background jobs (home/jobs.py): uploads posted with mode=job are extracted
+# on a pool of LABEL_JOB_WORKERS threads; outputs are kept in LABEL_JOB_DIR
+# (None = a folder in the system temp dir) for LABEL_JOB_TTL_SECONDS.
+LABEL_JOB_WORKERS = 2
+LABEL_JOB_DIR = None
+LABEL_JOB_TTL_SECONDS = 3600
+
+# Flipkart parser for the /flipkart upload: "text" matches regexes against
+# the page text; "layout" reads the fields from word positions (address
+# column, SKU table), one label per order id on a page. See
+# benchmarks/bench_flipkart_layout.py for the trade-off.
+FLIPKART_PARSER = "text"
+
+# Per-marketplace page regions to read instead of the whole page, as
+# {marketplace: ((name, (x0, y0, x1, y1) page fractions, (required regexes...)), ...)}.
+# Overrides home/regions.py DEFAULT_TEMPLATES (Amazon); None for a marketplace
+# reads its pages in full. A template must cover every field the parser reads:
+# pages missing a required pattern fall back to the full text, other fields
+# outside the regions just come out empty.
+LABEL_REGION_TEMPLATES = None
+
+# Time budget (seconds) shared by the backtracking-prone patterns while one
+# label block is parsed (home/regexguard.py). Past it a field is left empty
+# and a parse warning recorded, see /debug/patterns. None turns it off.
+LABEL_REGEX_BLOCK_BUDGET_SECONDS = 0.5
+
+# Logging (home/instrument.py). Every module of the app logs to its own
+# "home.<module>" logger; raise or lower one by adding it under "loggers",
+# e.g. "home.meesho": {"level": "DEBUG"} traces every AWB lookup. One JSON
+# line per extraction (pages, blocks, rows, empty fields, elapsed) goes to
+# "home.extraction".
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        "home": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+# A parser that cannot find a field logs the block text (its first
+# LABEL_LOG_BLOCK_CHARS characters, at INFO) for one failure in this many;
+# 0 never logs block texts.
+LABEL_LOG_FAILED_BLOCKS_EVERY = 100
+LABEL_LOG_BLOCK_CHARS = 500
+
+# Server-Timing header on the upload responses (home/timing.py): time spent
+# hashing, opening, reading text, parsing and exporting. With
+# LABEL_TIMING_PROFILE_DIR set, every upload also writes its timings and
+# extraction counts there as one JSON file.
+LABEL_SERVER_TIMING = True
+LABEL_TIMING_PROFILE_DIR = None
+
+# Profiling one request (home/profiling.py): a staff user adds ?profile=pstats
+# (or =speedscope, with pyinstrument installed) to an upload; scripts send the
+# X-Label-Profile header set to LABEL_PROFILE_TOKEN (None: no header accepted).
+# Profiles are written to LABEL_PROFILE_DIR (None = LABEL_TIMING_PROFILE_DIR,
+# else a folder in the system temp dir).
+LABEL_PROFILE_TOKEN = os.environ.get("LABEL_PROFILE_TOKEN") or None
+LABEL_PROFILE_DIR = None
+
+# Chunked, resumable uploads (home/chunked.py): POST /chunked, PUT
+# /chunked/<id>/parts/<n>, POST /chunked/<id>/complete. Parts of
+# LABEL_CHUNKED_PART_BYTES go into one file per upload in
+# LABEL_CHUNKED_UPLOAD_DIR (kept out of the shared temp dir, readable by this
+# user only) up to LABEL_CHUNKED_MAX_BYTES; uploads idle for
+# LABEL_CHUNKED_TTL_SECONDS are removed. With LABEL_CHUNKED_READ_AHEAD the
+# pages of the parts received so far are read while the rest is still arriving.
+LABEL_CHUNKED_UPLOAD_DIR = BASE_DIR / "media" / "chunked_uploads"
+LABEL_CHUNKED_PART_BYTES = 8 * 1024 * 1024
+LABEL_CHUNKED_MAX_BYTES = 512 * 1024 * 1024
+LABEL_CHUNKED_TTL_SECONDS = 24 * 3600
+LABEL_CHUNKED_READ_AHEAD = True